@@ -0,0 +1,103 @@
+# benchmark_pipeline.py
+"""
+Compare end-to-end latency of the "agents" and "direct" documentation pipelines.
+
+    python benchmark_pipeline.py 42 --audio sample.webm --runs 5
+    python benchmark_pipeline.py 42 --transcript-file visit.txt
+
+Runs alternate between pipelines so drift in model latency hits both equally.
+Every run writes a real transcript and SOAP note for the given visit, so point
+it at a test visit. A JSON report (per-stage milestones, p50/p95 per pipeline)
+is written to stdout.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+
+from services.agent_service import PIPELINES, AgentService
+from services.database_service import DatabaseService
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_once(agent_service, visit_id, pipeline, audio, transcript):
+    """Return the elapsed_ms at which each milestone of one run was reached"""
+    thread_id = await agent_service.create_documentation_session(visit_id)
+    milestones = {}
+    async for event in agent_service.stream_conversation(
+        thread_id, visit_id, audio_file=audio, transcript=transcript, pipeline=pipeline
+    ):
+        if event["type"] == "message":
+            milestones.setdefault(f"{event['stage']}_ms", event["elapsed_ms"])
+        elif event["type"] == "retry":
+            milestones["retries"] = milestones.get("retries", 0) + 1
+        elif event["type"] == "done":
+            milestones["total_ms"] = event["elapsed_ms"]
+    return milestones
+
+
+def summarize(runs):
+    summary = {}
+    for key in sorted({key for run in runs for key in run if key.endswith("_ms")}):
+        values = [run[key] for run in runs if key in run]
+        summary[key] = {
+            "p50": percentile(values, 0.5),
+            "p95": percentile(values, 0.95),
+            "mean": round(statistics.mean(values)),
+            "samples": len(values),
+        }
+    return summary
+
+
+async def run(args):
+    transcript = None
+    if args.transcript_file:
+        with open(args.transcript_file, "r", encoding="utf-8") as f:
+            transcript = f.read()
+
+    database_service = DatabaseService.get_instance()
+    await database_service.open()
+    agent_service = await AgentService.get_instance()
+    try:
+        runs = {pipeline: [] for pipeline in args.pipelines}
+        for index in range(args.runs):
+            for pipeline in args.pipelines:
+                milestones = await run_once(agent_service, args.visit_id, pipeline, args.audio, transcript)
+                runs[pipeline].append(milestones)
+                print(f"run {index + 1} {pipeline}: {milestones}", file=sys.stderr)
+        return {
+            "runs": runs,
+            "summary": {pipeline: summarize(results) for pipeline, results in runs.items()},
+        }
+    finally:
+        await agent_service.cleanup()
+        await database_service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark documentation pipeline latency")
+    parser.add_argument("visit_id", type=int, help="Visit to document (results are saved to it)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--audio", help="Audio file to transcribe on every run")
+    source.add_argument("--transcript-file", help="Text file used as the supplied transcript")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per pipeline")
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=list(PIPELINES))
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    for pipeline, summary in report["summary"].items():
+        if "total_ms" in summary:
+            print(f"{pipeline}: p50 {summary['total_ms']['p50']}ms, p95 {summary['total_ms']['p95']}ms",
+                  file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmark_rows.py
+"""
+Compare the old and new ways of turning a visit list into a response body.
+
+    python benchmark_rows.py
+    python benchmark_rows.py --rows 100000 --runs 5
+
+Both paths read the same rows, shaped like GET /api/visits results, from an
+in-memory SQLite database through the production SqliteConnection:
+
+- "generic": column names rebuilt per query, dict(zip(...)) per row, then
+  FastAPI's jsonable_encoder and a JSONResponse, as routes returning a dict do;
+- "fast": services.row_mapping, then FastJSONResponse.
+
+Materializing and serializing are timed separately. A JSON report (best and
+median milliseconds per step, and the speed-up) is written to stdout. Both
+paths must produce identical JSON, or the run fails.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import statistics
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from services.fast_json import FastJSONResponse
+from services.row_mapping import fetch_all
+from services.sqlite_pool import SqliteConnection
+
+QUERY = """
+SELECT VisitID, PatientID, ProviderID, VisitDate, VisitType, Status, Reason,
+       CreatedDate, UpdatedDate, FirstName, LastName
+FROM BenchVisits
+"""
+
+
+async def create_rows(conn, count):
+    await conn.execute("""
+    CREATE TABLE BenchVisits (
+        VisitID INTEGER PRIMARY KEY, PatientID INTEGER, ProviderID INTEGER, VisitDate TIMESTAMP,
+        VisitType TEXT, Status TEXT, Reason TEXT, CreatedDate TIMESTAMP, UpdatedDate TIMESTAMP,
+        FirstName TEXT, LastName TEXT
+    )""")
+    start = datetime.datetime(2024, 1, 1, 8, 30)
+    rows = [
+        (n, 1 + n % 5000, 1 + n % 5, start + datetime.timedelta(minutes=17 * n), "Follow-up",
+         "Completed" if n % 7 else "In Progress", "Routine check", start, start, f"Patient{n}", f"Family{n % 97}")
+        for n in range(1, count + 1)
+    ]
+    conn.autocommit = False
+    for offset in range(0, count, 2000):
+        chunk = rows[offset:offset + 2000]
+        await conn.execute(
+            "INSERT INTO BenchVisits VALUES " + ", ".join("(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)" for _ in chunk),
+            [value for row in chunk for value in row],
+        )
+    await conn.commit()
+    conn.autocommit = True
+
+
+async def materialize_generic(conn):
+    async with conn.cursor() as cursor:
+        await cursor.execute(QUERY)
+        columns = [column[0] for column in cursor.description]
+        rows = await cursor.fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+
+async def materialize_fast(conn):
+    async with conn.cursor() as cursor:
+        await cursor.execute(QUERY)
+        return await fetch_all(cursor)
+
+
+def serialize_generic(visits):
+    return JSONResponse(jsonable_encoder({"visits": visits, "next_cursor": None})).body
+
+
+def serialize_fast(visits):
+    return FastJSONResponse({"visits": visits, "next_cursor": None}).body
+
+
+def summarize(samples):
+    return {"best_ms": round(min(samples), 1), "median_ms": round(statistics.median(samples), 1)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = await SqliteConnection.connect(":memory:")
+    try:
+        await create_rows(conn, args.rows)
+        paths = {
+            "generic": (materialize_generic, serialize_generic),
+            "fast": (materialize_fast, serialize_fast),
+        }
+        timings = {name: {"materialize": [], "serialize": [], "total": []} for name in paths}
+        bodies = {}
+        for _ in range(args.runs):
+            # Alternate paths so drift affects both equally
+            for name, (materialize, serialize) in paths.items():
+                started = time.perf_counter()
+                visits = await materialize(conn)
+                materialized = time.perf_counter()
+                bodies[name] = serialize(visits)
+                finished = time.perf_counter()
+                timings[name]["materialize"].append((materialized - started) * 1000)
+                timings[name]["serialize"].append((finished - materialized) * 1000)
+                timings[name]["total"].append((finished - started) * 1000)
+    finally:
+        await conn.close()
+
+    if json.loads(bodies["generic"]) != json.loads(bodies["fast"]):
+        print("generic and fast paths produced different JSON", file=sys.stderr)
+        return 1
+
+    report = {
+        "rows": args.rows,
+        "runs": args.runs,
+        "response_bytes": len(bodies["fast"]),
+        "paths": {
+            name: {step: summarize(samples) for step, samples in steps.items()}
+            for name, steps in timings.items()
+        },
+    }
+    report["speedup"] = {
+        step: round(min(timings["generic"][step]) / min(timings["fast"][step]), 1)
+        for step in ("materialize", "serialize", "total")
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,414 @@
+# load_test.py
+"""
+Drive every API route against offline stand-ins for Azure and report latency.
+
+    python load_test.py --concurrency 16 --requests 100
+    python load_test.py --routes "GET /api/patients" "POST /api/documentation/process" \
+        --agent-latency-ms 400 --error-rate 0.02 --rate-limit-rate 0.01
+
+Agents, Whisper and Azure SQL are replaced by the fakes in loadtest/ (Azure SQL by
+the SQLite backend, seeded with synthetic patients and visits), so nothing leaves
+the machine and no credentials are needed. Each route is loaded in turn with
+`--requests` requests from `--concurrency` concurrent clients. A JSON report
+(throughput and p50/p95/p99 per route, plus fault counters) is written to
+stdout; exit status is 1 if any route failed more than `--max-error-rate`.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import itertools
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+import wave
+
+SAMPLE_RATE = 16000
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def synthetic_pcm(seconds=6.0):
+    """Bursts of tone separated by pauses, so live segmentation finds boundaries"""
+    samples = []
+    for n in range(int(seconds * SAMPLE_RATE)):
+        voiced = (n // SAMPLE_RATE) % 2 == 0 or n % SAMPLE_RATE < SAMPLE_RATE // 5
+        samples.append(int(4000 * math.sin(2 * math.pi * 220 * n / SAMPLE_RATE)) if voiced else 0)
+    return b"".join(sample.to_bytes(2, "little", signed=True) for sample in samples)
+
+
+def wav_bytes(pcm):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class Context:
+    """IDs and payloads shared by the request builders"""
+
+    def __init__(self, patients, visits):
+        self.patients = patients
+        self.visits = visits
+        self.pcm = synthetic_pcm()
+        self.wav = wav_bytes(self.pcm)
+        self.job_ids = []
+        self.documented_visits = []
+
+    def patient_id(self, i):
+        return 1 + i % self.patients
+
+    def visit_id(self, i):
+        return 1 + (i * 7919) % self.visits
+
+    def documented_visit(self, i):
+        return self.documented_visits[i % len(self.documented_visits)] if self.documented_visits else 1
+
+    def import_csv(self, i, rows=100):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["first_name", "last_name", "dob", "gender"])
+        for n in range(rows):
+            writer.writerow([f"Imported{i}", f"Row{n}", "1980-05-17", "F"])
+        return out.getvalue().encode()
+
+
+async def new_session(client, visit_id):
+    response = await client.post("/api/documentation/sessions", data={"visit_id": visit_id})
+    return response.json()["thread_id"]
+
+
+def transcript_for(i):
+    from loadtest.fakes import sample_transcript
+    return sample_transcript(i)
+
+
+# Each route: (name, prepare) where prepare(client, ctx, i) returns the
+# httpx request arguments. Preparation (e.g. opening a session) is not timed.
+async def _system(path):
+    return {"method": "GET", "url": path}
+
+
+ROUTES = {}
+
+
+def route(name):
+    def register(prepare):
+        ROUTES[name] = prepare
+        return prepare
+    return register
+
+
+for _path in ("db-pool", "transcription-cache", "rate-limits", "sessions", "verification", "agents"):
+    route(f"GET /api/system/{_path}")(lambda client, ctx, i, path=_path: _system(f"/api/system/{path}"))
+route("GET /metrics")(lambda client, ctx, i: _system("/metrics"))
+
+
+@route("GET /api/patients")
+async def _(client, ctx, i):
+    return {"method": "GET", "url": "/api/patients", "params": {"limit": 50, "name": f"Family{i % 97}"}}
+
+
+@route("GET /api/patients/{patient_id}")
+async def _(client, ctx, i):
+    return {"method": "GET", "url": f"/api/patients/{ctx.patient_id(i)}"}
+
+
+@route("POST /api/patients")
+async def _(client, ctx, i):
+    return {"method": "POST", "url": "/api/patients",
+            "json": {"first_name": f"Load{i}", "last_name": "Test", "dob": "1975-03-02", "gender": "M"}}
+
+
+@route("POST /api/visits")
+async def _(client, ctx, i):
+    return {"method": "POST", "url": "/api/visits", "json": {
+        "patient_id": ctx.patient_id(i), "visit_type": "Follow-up", "reason_for_visit": "Load test",
+        "visit_date": "2025-01-15T09:30:00", "status": "In Progress", "provider_id": 1,
+    }}
+
+
+@route("GET /api/visits")
+async def _(client, ctx, i):
+    return {"method": "GET", "url": "/api/visits", "params": {"limit": 50, "status": "Completed"}}
+
+
+@route("GET /api/visits/{visit_id}")
+async def _(client, ctx, i):
+    return {"method": "GET", "url": f"/api/visits/{ctx.visit_id(i)}"}
+
+
+@route("POST /api/visits/{visit_id}/update")
+async def _(client, ctx, i):
+    return {"method": "POST", "url": f"/api/visits/{ctx.visit_id(i)}/update", "data": {
+        "patient_id": str(ctx.patient_id(i)), "visit_date": "2025-01-15T09:30:00", "visit_type": "Follow-up",
+        "reason": "Updated by load test", "status": "In Progress", "provider_id": "1",
+    }}
+
+
+@route("POST /api/visits/{visit_id}/update-status")
+async def _(client, ctx, i):
+    return {"method": "POST", "url": f"/api/visits/{ctx.visit_id(i)}/update-status", "data": {"status": "Completed"}}
+
+
+@route("GET /api/providers/{provider_id}/visits")
+async def _(client, ctx, i):
+    return {"method": "GET", "url": f"/api/providers/{1 + i % 5}/visits"}
+
+
+@route("POST /api/import/{entity}")
+async def _(client, ctx, i):
+    return {"method": "POST", "url": "/api/import/patients",
+            "files": {"file": (f"patients-{i}.csv", ctx.import_csv(i), "text/csv")}}
+
+
+@route("POST /api/documentation/sessions")
+async def _(client, ctx, i):
+    return {"method": "POST", "url": "/api/documentation/sessions", "data": {"visit_id": ctx.visit_id(i)}}
+
+
+@route("POST /api/documentation/save-transcript")
+async def _(client, ctx, i):
+    ctx.documented_visits.append(ctx.visit_id(i))
+    return {"method": "POST", "url": "/api/documentation/save-transcript",
+            "data": {"visit_id": ctx.visit_id(i), "transcript_text": transcript_for(i)}}
+
+
+@route("POST /api/documentation/save-soap")
+async def _(client, ctx, i):
+    ctx.documented_visits.append(ctx.visit_id(i))
+    return {"method": "POST", "url": "/api/documentation/save-soap", "data": {
+        "visit_id": ctx.visit_id(i), "subjective": "Headache for 3 days", "objective": "BP 150/95",
+        "assessment": "Hypertension", "treatment_plan": "Increase lisinopril to 20 mg",
+    }}
+
+
+@route("GET /api/documentation/transcript/{visit_id}")
+async def _(client, ctx, i):
+    return {"method": "GET", "url": f"/api/documentation/transcript/{ctx.documented_visit(i)}"}
+
+
+@route("GET /api/documentation/soap/{visit_id}")
+async def _(client, ctx, i):
+    return {"method": "GET", "url": f"/api/documentation/soap/{ctx.documented_visit(i)}"}
+
+
+@route("POST /api/documentation/process")
+async def _(client, ctx, i):
+    visit_id = ctx.visit_id(i)
+    # Alternate both pipelines and both transcript sources
+    data = {"thread_id": await new_session(client, visit_id), "visit_id": visit_id,
+            "pipeline": ("agents", "direct")[i % 2]}
+    if i % 4 < 2:
+        data["transcript"] = transcript_for(i)
+        return {"method": "POST", "url": "/api/documentation/process", "data": data}
+    return {"method": "POST", "url": "/api/documentation/process", "data": data,
+            "files": {"audio": ("visit.wav", ctx.wav, "audio/wav")}}
+
+
+@route("POST /api/documentation/process?background=true")
+async def _(client, ctx, i):
+    visit_id = ctx.visit_id(i)
+    return {"method": "POST", "url": "/api/documentation/process", "data": {
+        "thread_id": await new_session(client, visit_id), "visit_id": visit_id,
+        "transcript": transcript_for(i), "background": "true", "pipeline": "direct",
+    }}
+
+
+@route("GET /api/documentation/jobs/{job_id}")
+async def _(client, ctx, i):
+    if not ctx.job_ids:
+        request = await ROUTES["POST /api/documentation/process?background=true"](client, ctx, i)
+        ctx.job_ids.append((await client.request(**request)).json()["job_id"])
+    return {"method": "GET", "url": f"/api/documentation/jobs/{ctx.job_ids[i % len(ctx.job_ids)]}"}
+
+
+@route("POST /api/documentation/process/stream")
+async def _(client, ctx, i):
+    visit_id = ctx.visit_id(i)
+    return {"method": "POST", "url": "/api/documentation/process/stream", "stream": True, "data": {
+        "thread_id": await new_session(client, visit_id), "visit_id": visit_id,
+        "transcript": transcript_for(i), "pipeline": ("agents", "direct")[i % 2],
+    }}
+
+
+@route("WS /api/documentation/live")
+async def _(client, ctx, i):
+    return {"websocket": "/api/documentation/live", "frames": [
+        ctx.pcm[start:start + SAMPLE_RATE // 2 * 2] for start in range(0, len(ctx.pcm), SAMPLE_RATE // 2 * 2)
+    ]}
+
+
+async def run_websocket(app, path, frames):
+    """Run one live-transcription session straight through the ASGI app"""
+    incoming = asyncio.Queue()
+    sent = []
+    incoming.put_nowait({"type": "websocket.connect"})
+    for frame in frames:
+        incoming.put_nowait({"type": "websocket.receive", "bytes": frame})
+    incoming.put_nowait({"type": "websocket.receive", "text": json.dumps({"type": "stop"})})
+
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "websocket.close":
+            incoming.put_nowait({"type": "websocket.disconnect", "code": message.get("code", 1000)})
+
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [], "subprotocols": [],
+        "server": ("loadtest", 80), "client": ("127.0.0.1", 0),
+    }
+    await app(scope, incoming.get, send)
+    return any('"complete"' in (message.get("text") or "") for message in sent)
+
+
+async def send(client, app, ctx, request):
+    """Issue one prepared request; True if it succeeded"""
+    if "websocket" in request:
+        return await run_websocket(app, request["websocket"], request["frames"])
+    if request.pop("stream", False):
+        async with client.stream(**request) as response:
+            body = "".join([chunk async for chunk in response.aiter_text()])
+        return response.status_code < 400 and "event: error" not in body and "event: done" in body
+    response = await client.request(**request)
+    if response.status_code == 202:
+        ctx.job_ids.append(response.json()["job_id"])
+    return response.status_code < 400
+
+
+async def load_route(name, client, app, ctx, requests, concurrency):
+    prepare = ROUTES[name]
+    latencies, failures = [], 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal failures
+        while (i := next(counter)) < requests:
+            request = await prepare(client, ctx, i)
+            started = time.perf_counter()
+            try:
+                ok = await send(client, app, ctx, request)
+            except Exception as e:
+                print(f"{name}: {type(e).__name__}: {e}", file=sys.stderr)
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": failures,
+        "error_rate": round(failures / requests, 4),
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.5), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+async def wait_for_jobs(client, job_ids, timeout=120.0):
+    """Let queued background jobs finish before the app shuts down"""
+    deadline = time.monotonic() + timeout
+    pending = set(job_ids)
+    while pending and time.monotonic() < deadline:
+        for job_id in list(pending):
+            job = (await client.get(f"/api/documentation/jobs/{job_id}")).json()
+            if job.get("status") in ("succeeded", "failed"):
+                pending.discard(job_id)
+        if pending:
+            await asyncio.sleep(0.2)
+    if pending:
+        print(f"{len(pending)} background jobs still running at shutdown", file=sys.stderr)
+
+
+async def run(args, directory):
+    import httpx
+
+    from loadtest.fakes import Faults
+    from loadtest.harness import install
+    import main
+
+    def faults(latency_ms):
+        return Faults(latency_ms=latency_ms, jitter_ms=latency_ms * args.jitter, error_rate=args.error_rate,
+                      rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed)
+
+    agent_faults, whisper_faults = faults(args.agent_latency_ms), faults(args.whisper_latency_ms)
+    db_faults = Faults(latency_ms=args.db_latency_ms, jitter_ms=args.db_latency_ms * args.jitter,
+                       error_rate=args.db_error_rate, seed=args.seed)
+    await install(directory, agent_faults, whisper_faults, db_faults, patients=args.patients)
+    ctx = Context(patients=args.patients, visits=args.patients * 3)
+
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            for name in args.routes:
+                results[name] = await load_route(name, client, main.app, ctx, args.requests, args.concurrency)
+                print(f"{name}: {results[name]['throughput_rps']} req/s, p50 {results[name]['p50_ms']}ms, "
+                      f"p99 {results[name]['p99_ms']}ms, errors {results[name]['errors']}", file=sys.stderr)
+            await wait_for_jobs(client, ctx.job_ids)
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "routes"},
+        "routes": results,
+        "faults": {"agents": agent_faults.stats(), "whisper": whisper_faults.stats(), "sql": db_faults.stats()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against offline Azure stand-ins")
+    parser.add_argument("--routes", nargs="+", choices=list(ROUTES), default=list(ROUTES),
+                        help="Routes to load, in order (default: all)")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients per route")
+    parser.add_argument("--patients", type=int, default=500, help="Synthetic patients to seed (3 visits each)")
+    parser.add_argument("--agent-latency-ms", type=float, default=150, help="Latency of each agent turn and call")
+    parser.add_argument("--whisper-latency-ms", type=float, default=250, help="Latency of each Whisper request")
+    parser.add_argument("--db-latency-ms", type=float, default=2, help="Latency of each SQL statement")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Extra uniform latency, as a fraction of base")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Agent and Whisper 5xx probability")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Agent and Whisper 429 probability")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--db-error-rate", type=float, default=0.0, help="SQL statement failure probability")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency jitter and error injection")
+    parser.add_argument("--max-error-rate", type=float, default=1.0,
+                        help="Exit with status 1 if any route's error rate is above this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="medscribeai-loadtest-") as directory:
+        # Read by the services at import time, so set before anything imports them
+        os.environ.update({
+            "UPLOAD_TEMP_DIR": os.path.join(directory, "uploads"),
+            "JOB_STORE_PATH": os.path.join(directory, "jobs.sqlite3"),
+            "JOB_AUDIO_DIR": os.path.join(directory, "job_audio"),
+            "TRANSCRIPT_CACHE_DIR": os.path.join(directory, "transcripts"),
+            "TRANSCRIPT_CACHE_ENABLED": os.getenv("TRANSCRIPT_CACHE_ENABLED", "false"),
+        })
+        report = asyncio.run(run(args, directory))
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    failed = [name for name, result in report["routes"].items() if result["error_rate"] > args.max_error_rate]
+    if failed:
+        print(f"Error rate above {args.max_error_rate} on: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Offline stand-ins for the Azure services the backend talks to.
+
+Each fake injects latency (a base delay plus uniform jitter) and, with the
+configured probabilities, raises errors that look like the real SDKs' to the
+code under test: a 429 that is_rate_limit_error() recognizes and a generic
+5xx service error. Nothing here opens a network connection.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import re
+import types
+import wave
+
+from services.audio_transcoder import TranscodingError
+
+
+class FakeServiceError(Exception):
+    status_code = 500
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=1.0):
+        super().__init__(f"Rate limit is exceeded. Try again in {retry_after:g} seconds.")
+        self.response = types.SimpleNamespace(status_code=429, headers={"retry-after": str(retry_after)})
+
+
+class Faults:
+    """Latency and error injection for one fake service"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0,
+                 seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    async def hit(self, operation):
+        """Wait out one call's latency, then maybe fail it"""
+        self.calls += 1
+        delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            self.rate_limited += 1
+            raise FakeRateLimitError(self.retry_after)
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.errors += 1
+            raise FakeServiceError(f"Injected failure in {operation}")
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors, "rate_limited": self.rate_limited}
+
+
+# Visits the fakes "hear"; they mention medications, vitals and figures so the
+# documentation and verification stages have something to check
+SAMPLE_TRANSCRIPTS = (
+    "Doctor: What brings you in today? Patient: I've had a headache for 3 days and I take lisinopril 10 mg. "
+    "Doctor: Your blood pressure is 150/95 and pulse 88. Let's increase the lisinopril to 20 mg.",
+    "Doctor: How is the cough? Patient: It started 5 days ago, I've been taking ibuprofen. "
+    "Doctor: Temperature is 100.4 and oxygen saturation 96 percent. I'll prescribe amoxicillin 500 mg.",
+    "Doctor: How is your blood sugar? Patient: Around 180 in the mornings on metformin 1000 mg. "
+    "Doctor: Blood pressure 128/82, weight 210. We'll add sitagliptin and recheck in 3 months.",
+)
+
+
+def sample_transcript(key) -> str:
+    """A deterministic sample transcript for any bytes or string key"""
+    data = key if isinstance(key, (bytes, bytearray, memoryview)) else str(key).encode()
+    index = int.from_bytes(hashlib.sha256(bytes(data)).digest()[:4], "big") % len(SAMPLE_TRANSCRIPTS)
+    return SAMPLE_TRANSCRIPTS[index]
+
+
+class _RawTranscription:
+    def __init__(self, text):
+        self.headers = {}
+        self._text = text
+
+    def parse(self):
+        return self._text
+
+
+class FakeOpenAIClient:
+    """Just enough of AsyncAzureOpenAI for TranscriptionPlugin: audio transcriptions and close()"""
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        raw = types.SimpleNamespace(create=self._create)
+        self.audio = types.SimpleNamespace(transcriptions=types.SimpleNamespace(with_raw_response=raw))
+
+    async def _create(self, file, model=None, response_format=None, **kwargs):
+        await self.faults.hit("whisper")
+        return _RawTranscription(sample_transcript(file[1]))
+
+    async def close(self):
+        pass
+
+
+class WavTranscoder:
+    """
+    Stands in for AudioTranscoder where ffmpeg isn't installed. Only PCM WAV
+    input is supported, which is what the load test uploads.
+    """
+
+    async def to_pcm(self, input_path) -> bytes:
+        def read():
+            with wave.open(input_path, "rb") as f:
+                return f.readframes(f.getnframes())
+
+        try:
+            return await asyncio.to_thread(read)
+        except (wave.Error, EOFError) as e:
+            raise TranscodingError(f"Not a PCM WAV file: {input_path}: {e}") from e
+
+
+class FakeAgentsClient:
+    """Agent and thread management calls used by AgentRegistry, SessionManager and AzureAIAgentThread"""
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        self._ids = itertools.count(1)
+        self.stored_agents = {}
+        self.threads = set()
+        self.agents = types.SimpleNamespace(
+            list_agents=self._list_agents,
+            create_agent=self._create_agent,
+            update_agent=self._update_agent,
+            delete_agent=self._delete_agent,
+            create_thread=self._create_thread,
+            delete_thread=self._delete_thread,
+            # Newer SDKs nest thread operations
+            threads=types.SimpleNamespace(create=self._create_thread, delete=self._delete_thread),
+        )
+
+    async def _list_agents(self, limit=100, order="desc", after=None):
+        await self.faults.hit("list_agents")
+        return types.SimpleNamespace(data=list(self.stored_agents.values())[::-1], has_more=False, last_id=None)
+
+    async def _create_agent(self, model, name, instructions, metadata=None):
+        await self.faults.hit("create_agent")
+        agent = types.SimpleNamespace(id=f"asst_{next(self._ids)}", model=model, name=name,
+                                      instructions=instructions, metadata=metadata or {})
+        self.stored_agents[agent.id] = agent
+        return agent
+
+    async def _update_agent(self, agent_id, model, name, instructions, metadata=None):
+        await self.faults.hit("update_agent")
+        agent = self.stored_agents[agent_id]
+        agent.model, agent.name, agent.instructions, agent.metadata = model, name, instructions, metadata or {}
+        return agent
+
+    async def _delete_agent(self, agent_id):
+        await self.faults.hit("delete_agent")
+        self.stored_agents.pop(agent_id, None)
+
+    async def _create_thread(self, **kwargs):
+        await self.faults.hit("create_thread")
+        thread = types.SimpleNamespace(id=f"thread_{next(self._ids)}")
+        self.threads.add(thread.id)
+        return thread
+
+    async def _delete_thread(self, thread_id):
+        await self.faults.hit("delete_thread")
+        self.threads.discard(thread_id)
+
+    async def close(self):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, name, content, role="assistant"):
+        self.name = name
+        self.content = content
+        self.role = role
+
+
+_VISIT_ID = re.compile(r"visit ID (\d+)")
+_AUDIO = re.compile(r"audio file: (\S+)")
+_PROVIDED = re.compile(r"(?:provided transcript|Additional conversation transcript|Transcript): (.*?)"
+                       r"(?: Clinician request:|\n\nSOAP note:|$)", re.DOTALL)
+
+
+class FakeAgent:
+    """
+    A model-free agent that plays one role of the three-agent protocol:
+    TranscriptionAgent transcribes (through the transcription plugin) and saves
+    the transcript, DocumentationAgent writes a SOAP note from the transcript in
+    the chat and saves it through its plugin (or returns JSON when it has
+    none), and VerificationAgent signs it off.
+    """
+
+    def __init__(self, definition, plugins=None, faults=None, structured=False):
+        self.definition = definition
+        self.name = definition.name
+        self.id = definition.id
+        self.plugins = plugins or []
+        self.faults = faults or Faults()
+        self.structured = structured
+
+    def _plugin(self, method):
+        return next((plugin for plugin in self.plugins if hasattr(plugin, method)), None)
+
+    async def respond(self, history) -> str:
+        await self.faults.hit(self.name)
+        request = "\n".join(str(m.content) for m in history if m.role == "user")
+        match = _VISIT_ID.search(request)
+        visit_id = int(match.group(1)) if match else 0
+        if self.name == "TranscriptionAgent":
+            return await self._transcribe(request, visit_id)
+        if self.name == "DocumentationAgent":
+            return await self._document(history, request, visit_id)
+        return "All four SOAP sections are present and consistent with the transcript. Documentation complete."
+
+    async def _transcribe(self, request, visit_id):
+        audio = _AUDIO.search(request)
+        provided = _PROVIDED.search(request)
+        transcriber = self._plugin("listen_and_transcribe")
+        if audio and transcriber:
+            text = await transcriber.listen_and_transcribe(audio.group(1))
+        else:
+            text = provided.group(1).strip() if provided else sample_transcript(request)
+        saver = self._plugin("save_transcript")
+        if saver:
+            await saver.save_transcript(visit_id, text)
+        return text
+
+    async def _document(self, history, request, visit_id):
+        transcribed = [m.content for m in history if m.name == "TranscriptionAgent"]
+        provided = _PROVIDED.search(request)
+        transcript = transcribed[-1] if transcribed else (provided.group(1).strip() if provided else "")
+        patient = " ".join(re.findall(r"Patient: (.*?)(?= Doctor:|$)", transcript)) or transcript
+        doctor = " ".join(re.findall(r"Doctor: (.*?)(?= Patient:|$)", transcript)) or transcript
+        sections = {
+            "subjective": patient,
+            "objective": doctor,
+            "assessment": "Findings as discussed during the visit.",
+            "plan": f"Follow the plan discussed with the patient. {doctor}",
+        }
+        if self.structured:
+            return json.dumps(sections)
+        saver = self._plugin("save_soap_note")
+        if saver:
+            await saver.save_soap_note(visit_id, sections["subjective"], sections["objective"],
+                                       sections["assessment"], sections["plan"])
+        return "\n\n".join(f"**{key.capitalize()}:**\n{value}" for key, value in sections.items())
+
+
+class FakeGroupChat:
+    """
+    AgentGroupChat stand-in that drives FakeAgents with the real selection and
+    termination strategies, so turn order, quota waits and early termination
+    behave as they do against Azure.
+    """
+    MAX_TURNS = 10
+    STREAM_CHUNK_CHARS = 24
+
+    def __init__(self, agents, selection_strategy, termination_strategy, faults=None):
+        self.agents = agents
+        self.selection_strategy = selection_strategy
+        self.termination_strategy = termination_strategy
+        self.faults = faults or Faults()
+        self.history = []
+        self.is_complete = False
+
+    async def add_chat_message(self, message):
+        self.history.append(FakeMessage("user", message, role="user"))
+
+    async def _turns(self):
+        for _ in range(self.MAX_TURNS):
+            agent = await self.selection_strategy.select_agent(self.agents, self.history)
+            message = FakeMessage(agent.name, await agent.respond(self.history))
+            self.history.append(message)
+            yield message
+            if await self.termination_strategy.should_agent_terminate(agent, self.history):
+                self.is_complete = True
+                return
+
+    async def invoke(self):
+        async for message in self._turns():
+            yield message
+
+    async def invoke_stream(self):
+        async for message in self._turns():
+            for start in range(0, len(message.content), self.STREAM_CHUNK_CHARS):
+                yield FakeMessage(message.name, message.content[start:start + self.STREAM_CHUNK_CHARS])
+                await asyncio.sleep(0)
+
+    async def reset(self):
+        await self.faults.hit("reset")
+        self.history.clear()
+        self.is_complete = False
@@ -0,0 +1,78 @@
+"""
+Wires the FastAPI app in main.py to the offline stand-ins.
+
+install() must run before the app's lifespan starts: it replaces the
+AgentService and DatabaseService singletons, which main.py then picks up
+unchanged. Environment variables the services read at import time (upload,
+job and cache directories) should be set before this module is imported;
+load_test.py does that.
+"""
+import os
+import types
+
+from loadtest.fakes import FakeAgent, FakeAgentsClient, FakeGroupChat, FakeOpenAIClient, Faults, WavTranscoder
+from loadtest.local_sql import LocalSqlitePool, seed
+from services.agent_service import STRUCTURED_SOAP_OUTPUT, AgentService
+from services.database_service import DatabaseService
+from services.db_backends import SqliteBackend
+from services.sqlite_pool import SqlitePool
+from services.transcription_plugin import TranscriptionPlugin
+from strategies.medical import MedicalSelectionStrategy, MedicalTerminationStrategy
+
+
+class OfflineAgentService(AgentService):
+    """AgentService whose agents, threads, chats and Whisper calls are all local fakes"""
+
+    def __init__(self, agent_faults=None, whisper_faults=None):
+        self.agent_faults = agent_faults or Faults()
+        self.whisper_faults = whisper_faults or Faults()
+
+    def _create_client(self):
+        self.ai_agent_settings = types.SimpleNamespace(model_deployment_name="offline-model")
+        return FakeAgentsClient(self.agent_faults)
+
+    def _create_agent(self, definition, plugins=None):
+        structured = STRUCTURED_SOAP_OUTPUT and definition.name == "DocumentationAgent"
+        return FakeAgent(definition, plugins, self.agent_faults, structured=structured)
+
+    def _create_transcription_plugin(self):
+        client = FakeOpenAIClient(self.whisper_faults)
+        plugin = TranscriptionPlugin(client=client, whisper_client=client)
+        plugin.transcoder = WavTranscoder()
+        return plugin
+
+    def _create_chat(self, agents, precheck=None):
+        return FakeGroupChat(
+            agents,
+            selection_strategy=MedicalSelectionStrategy(),
+            termination_strategy=MedicalTerminationStrategy(precheck=precheck),
+            faults=self.agent_faults,
+        )
+
+
+async def install(directory, agent_faults=None, whisper_faults=None, db_faults=None, patients=200):
+    """
+    Point the service singletons at the fakes, with DatabaseService on a
+    seeded SQLite backend in directory. Returns the backend.
+    """
+    path = os.path.join(directory, "medscribeai.sqlite3")
+    database_service = DatabaseService.get_instance()
+    pool = database_service.backend.pool
+
+    # Create and seed the database without fault injection
+    database_service.backend = SqliteBackend(SqlitePool(path, min_size=0, max_size=1), bootstrap=True)
+    await database_service.open()
+    try:
+        await seed(database_service, patients=patients)
+    finally:
+        await database_service.close()
+
+    database_service.backend = SqliteBackend(LocalSqlitePool(
+        path, db_faults, min_size=pool.min_size, max_size=pool.max_size, acquire_timeout=pool.acquire_timeout,
+        recycle=pool.recycle, max_idle=pool.max_idle, ping_after=pool.ping_after,
+    ))
+
+    agent_service = OfflineAgentService(agent_faults, whisper_faults)
+    await agent_service.initialize()
+    AgentService._instance = agent_service
+    return database_service.backend
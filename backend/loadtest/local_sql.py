@@ -0,0 +1,62 @@
+"""
+Fault injection for the SQLite backend.
+
+The load test runs DatabaseService on the real SqliteBackend, so queries,
+transactions and pool behaviour are the production code paths. LocalSqlitePool
+only adds the configured latency and errors to every connect and statement.
+"""
+import datetime
+
+from loadtest.fakes import Faults
+from services.sqlite_pool import SqliteConnection, SqlitePool
+
+
+class _FaultyConnection(SqliteConnection):
+    faults = None
+
+    async def execute(self, query, params=()):
+        await self.faults.hit("sql")
+        return await super().execute(query, params)
+
+
+class LocalSqlitePool(SqlitePool):
+    """SqlitePool whose connections inject latency and errors; sizing, waits and stats behave as in production"""
+    connection_class = _FaultyConnection
+
+    def __init__(self, path, faults=None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.faults = faults or Faults()
+
+    async def _connect(self):
+        await self.faults.hit("connect")
+        pc = await super()._connect()
+        pc.conn.faults = self.faults
+        return pc
+
+
+async def seed(database_service, patients=200, visits_per_patient=3, providers=5):
+    """Fill an empty database with synthetic patients, providers and visits"""
+    async with database_service.get_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT COUNT(*) FROM Patients")
+            if (await cursor.fetchone())[0]:
+                return
+
+    now = datetime.datetime.now().replace(microsecond=0)
+    async with database_service.transaction() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                "INSERT INTO Providers (FirstName, LastName, Specialty) VALUES "
+                + ", ".join("(?, ?, ?)" for _ in range(providers)),
+                [value for n in range(1, providers + 1) for value in (f"Provider{n}", f"Clinic{n}", "Family Medicine")],
+            )
+        patient_ids = await database_service.insert_patients_batch(conn, [
+            (f"Patient{n}", f"Family{n % 97}", datetime.date(1950 + n % 60, 1 + n % 12, 1 + n % 28),
+             "F" if n % 2 else "M", None, None, None, None, None)
+            for n in range(1, patients + 1)
+        ])
+        await database_service.insert_visits_batch(conn, [
+            (patient_id, 1 + (patient_id + n) % providers, now - datetime.timedelta(hours=patient_id * 7 + n),
+             "Follow-up", "In Progress" if n == 0 else "Completed", "Routine check")
+            for patient_id in patient_ids for n in range(visits_per_patient)
+        ])
@@ -1,23 +1,43 @@
 # main.py
 import uvicorn
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Body
+from fastapi import FastAPI, HTTPException, Depends, Request, UploadFile, File, Form, Body, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import asyncio
 import os
 from contextlib import asynccontextmanager
-import aioodbc
 import datetime
+import json
 
-from services.agent_service import AgentService
+from services.agent_service import PIPELINES, AgentService, ConversationFailedError
+from services.session_manager import SessionMismatchError
 from services.database_service import DatabaseService
+from services import metrics, structured_logging
+from services.bulk_import import DEFAULT_BATCH_SIZE, BulkImporter, detect_format, iter_records
+from services.fast_json import FastJSONResponse
+from services.job_queue import JOB_AUDIO_DIR, DocumentationJobQueue
+from services.live_transcription import MAX_LIVE_FRAME_BYTES, LiveTranscriptionSession
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError
+from services.rate_limiter import RateLimiter
+from services.transcription_cache import TranscriptionCache
+from services.uploads import UPLOAD_DIR, UploadTooLargeError, remove_file, spool_upload
+
+structured_logging.configure_logging()
+log = structured_logging.get_logger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global agent_service, database_service
+    global agent_service, database_service, job_queue
     agent_service = await AgentService.get_instance()
     database_service = DatabaseService.get_instance()
+    await database_service.open()
+    job_queue = DocumentationJobQueue.get_instance()
+    await job_queue.start(agent_service.process_conversation)
     yield
+    await job_queue.stop()
     await agent_service.cleanup()
+    await database_service.close()
+    structured_logging.stop_logging()
     
 app = FastAPI(lifespan=lifespan, title="Medical Documentation System API")
 
@@ -29,28 +49,97 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so route latency includes CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.gauge(
+    "medscribeai_db_pool_connections", "Database connections by state", ("state",),
+    lambda: {(state,): database_service.pool_stats()[state] for state in ("in_use", "idle", "waiting")},
+)
+metrics.gauge(
+    "medscribeai_rate_limit_queue_depth", "Requests waiting for quota, by quota", ("quota",),
+    lambda: {(name,): stats["queue_depth"] for name, stats in RateLimiter.all_stats().items()},
+)
+
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/system/db-pool")
+async def get_db_pool_stats():
+    return database_service.pool_stats()
+
+@app.get("/api/system/etag-cache")
+async def get_etag_cache_stats():
+    return database_service.etags.stats()
+
+@app.get("/api/system/transcription-cache")
+async def get_transcription_cache_stats():
+    return TranscriptionCache.get_instance().stats()
+
+@app.get("/api/system/rate-limits")
+async def get_rate_limit_stats():
+    return RateLimiter.all_stats()
 
+@app.get("/api/system/sessions")
+async def get_session_stats():
+    return agent_service.sessions.stats()
 
+@app.get("/api/system/verification")
+async def get_verification_stats():
+    return agent_service.verifier.stats()
+
+@app.get("/api/system/logging")
+async def get_logging_stats():
+    return structured_logging.stats()
+
+@app.get("/api/system/agents")
+async def get_agent_startup_stats():
+    return {
+        "startup_seconds": agent_service.startup_seconds,
+        "registry": agent_service.agent_registry_timings,
+        "agents": {
+            definition.name: definition.id
+            for definition in (
+                agent_service.transcription_agent_def,
+                agent_service.documentation_agent_def,
+                agent_service.verification_agent_def,
+            )
+        },
+    }
 
 @app.get("/api/patients")
-async def get_patients():
+async def get_patients(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    name: str = Query(None, description="First or last name prefix")
+):
     try:
         # Add timeout and retry logic
         for attempt in range(3):
             try:
-                patients = await asyncio.wait_for(
-                    database_service.get_all_patients(),
+                patients, next_cursor = await asyncio.wait_for(
+                    database_service.list_patients(limit=limit, cursor=cursor, name_prefix=name),
                     timeout=5.0  # 5 second timeout
                 )
-                return {"patients": patients}
+                return FastJSONResponse({"patients": patients, "next_cursor": next_cursor})
             except asyncio.TimeoutError:
                 if attempt == 2:  # Last attempt
                     raise
+                metrics.RETRIES.inc("get_patients", "timeout")
                 await asyncio.sleep(1)  # Wait before retry
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Error fetching patients: {e}")
+        log.error("Error fetching patients", error=str(e))
         return {"error": str(e)}
     
+@app.get("/api/stats")
+async def get_stats():
+    return await database_service.get_counts()
+
 @app.post("/api/visits")
 async def create_visit(
     patient_id: int = Body(...),
@@ -65,32 +154,39 @@ async def create_visit(
         visit_id = await database_service.create_visit(
             patient_id, provider_id, formatted_date, visit_type, status, reason_for_visit
         )
-        print(f"Visit created with ID: {visit_id}, type: {type(visit_id)}")
+        log.info("Visit created", visit_id=visit_id, patient_id=patient_id)
         return {"visit_id": visit_id, "message": "Visit created successfully"}
     except Exception as e:
-        print(f"Error in create_visit: {str(e)}")
+        log.error("Error creating visit", patient_id=patient_id, error=str(e))
         raise
 
 @app.get("/api/visits/{visit_id}")
-async def get_visit(visit_id: int):
-    visit = await database_service.get_visit(visit_id)
-    if not visit:
+async def get_visit(visit_id: int, request: Request):
+    response = await database_service.etags.respond(
+        request, "visit", visit_id, lambda: database_service.get_visit(visit_id)
+    )
+    if response is None:
         raise HTTPException(status_code=404, detail="Visit not found")
-    return visit
+    return response
 
 @app.get("/api/visits")
-async def get_all_visits():
-    async with database_service.get_connection() as conn:
-        async with conn.cursor() as cursor:
-            query = """
-            SELECT v.*, p.FirstName, p.LastName 
-            FROM Visits v JOIN Patients p ON v.PatientID = p.PatientID 
-            ORDER BY v.VisitDate DESC
-            """
-            await cursor.execute(query)
-            columns = [column[0] for column in cursor.description]
-            rows = await cursor.fetchall()
-            return [dict(zip(columns, row)) for row in rows]
+async def get_all_visits(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    date_from: datetime.date = Query(None),
+    date_to: datetime.date = Query(None),
+    status: str = Query(None),
+    provider_id: int = Query(None),
+    name: str = Query(None, description="Patient first or last name prefix")
+):
+    try:
+        visits, next_cursor = await database_service.list_visits(
+            limit=limit, cursor=cursor, date_from=date_from, date_to=date_to,
+            status=status, provider_id=provider_id, name_prefix=name
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({"visits": visits, "next_cursor": next_cursor})
         
 @app.post("/api/patients")
 async def create_patient(
@@ -113,73 +209,223 @@ async def create_patient(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create patient: {str(e)}")
 
+@app.post("/api/import/{entity}")
+async def bulk_import(
+    entity: str,
+    file: UploadFile = File(...),
+    format: str = Form(None),  # csv or ndjson; inferred from the file name if omitted
+    batch_size: int = Form(DEFAULT_BATCH_SIZE)
+):
+    if entity not in BulkImporter.ENTITIES:
+        raise HTTPException(status_code=404, detail=f"Unknown import entity: {entity}")
+    try:
+        fmt = detect_format(file.filename, file.content_type, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    importer = BulkImporter(database_service, batch_size=batch_size)
+    return await importer.run(entity, iter_records(file.file, fmt))
+
 @app.get("/api/patients/{patient_id}")
-async def get_patient(patient_id: int):
-    return await database_service.get_patient(patient_id)
+async def get_patient(patient_id: int, request: Request):
+    response = await database_service.etags.respond(
+        request, "patient", patient_id, lambda: database_service.get_patient(patient_id)
+    )
+    if response is None:
+        return FastJSONResponse(None)
+    return response
 
 @app.get("/api/providers/{provider_id}/visits")
 async def get_provider_visits(provider_id: int):
-    return await database_service.get_active_visits(provider_id)
+    return FastJSONResponse(await database_service.get_active_visits(provider_id))
 
 @app.post("/api/documentation/sessions")
 async def create_documentation_session(visit_id: int = Form(...)):
     thread_id = await agent_service.create_documentation_session(visit_id)
     return {"thread_id": thread_id}
 
+def check_documentation_request(thread_id, visit_id, audio, transcript, instructions):
+    """Reject a request its session can't serve before any upload or agent work starts"""
+    session = agent_service.sessions.peek(thread_id)
+    if session is not None and session.visit_id != visit_id:
+        raise HTTPException(409, f"Thread {thread_id} belongs to visit {session.visit_id}, not {visit_id}")
+    if audio or transcript:
+        return
+    if not instructions:
+        raise HTTPException(400, "Either audio file, transcript or instructions must be provided")
+    # Instructions revise an earlier note, so there has to be one in this session
+    if session is None or not session.runs:
+        raise HTTPException(400, "Instructions alone need an earlier run in this session; send audio or a transcript")
+
 @app.post("/api/documentation/process")
 async def process_documentation(
     thread_id: str = Form(...),
     visit_id: int = Form(...),
     audio: UploadFile = File(None),
-    transcript: str = Form(None)
+    transcript: str = Form(None),
+    background: bool = Form(False),
+    pipeline: str = Form(None),
+    instructions: str = Form(None)
 ):
-    print(f"Backend received process request - thread_id: {thread_id}, visit_id: {visit_id}")
-    print(f"Audio file: {audio.filename if audio else 'None'}, Transcript: {transcript}")
-    if not audio and not transcript:
-        raise HTTPException(400, "Either audio file or transcript must be provided")
+    log.info("Documentation request received", thread_id=thread_id, visit_id=visit_id,
+             audio=audio.filename if audio else None, transcript=transcript, background=background)
+    check_documentation_request(thread_id, visit_id, audio, transcript, instructions)
+    if pipeline and pipeline not in PIPELINES:
+        raise HTTPException(400, f"pipeline must be one of: {', '.join(PIPELINES)}")
     
-    # If audio provided, save temporarily
+    # If audio provided, spool it to a unique temporary file
     audio_path = None
     if audio:
-        os.makedirs("temp", exist_ok=True)
-        audio_path = f"temp/{audio.filename}"
-        with open(audio_path, "wb") as f:
-            content = await audio.read()
-            f.write(content)
+        try:
+            audio_path = await spool_upload(audio, directory=JOB_AUDIO_DIR if background else UPLOAD_DIR)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    
+    if background:
+        # The job owns the audio file from here on and deletes it when it finishes
+        job_id = await job_queue.submit(
+            visit_id, thread_id=thread_id, audio_path=audio_path, transcript=transcript, pipeline=pipeline,
+            instructions=instructions
+        )
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
     
     try:
         # Process with our agent service
-        print(f"Processing request with thread_id: {thread_id}, visit_id: {visit_id}")
         responses = await agent_service.process_conversation(
             thread_id=thread_id,
             visit_id=visit_id,
             audio_file=audio_path,
-            transcript=transcript
+            transcript=transcript,
+            pipeline=pipeline,
+            instructions=instructions
         )
-        print(f"Agent responses: {responses}")
+        log.info("Documentation processed", thread_id=thread_id, visit_id=visit_id,
+                 agents=[response["agent"] for response in responses])
         return {"responses": responses}
+    except ConversationFailedError as e:
+        log.error("Documentation failed", thread_id=thread_id, visit_id=visit_id, error=str(e))
+        raise HTTPException(status_code=502, detail=str(e))
+    except SessionMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        print(f"Error processing documentation: {e}")
+        log.error("Error processing documentation", thread_id=thread_id, visit_id=visit_id, error=str(e))
         raise
     finally:
         # Clean up temporary files
-        if audio_path and os.path.exists(audio_path):
-            os.remove(audio_path)
+        await remove_file(audio_path)
             
+def sse_event(event):
+    """Format an event dict as a Server-Sent Events frame"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.post("/api/documentation/process/stream")
+async def stream_documentation(
+    thread_id: str = Form(...),
+    visit_id: int = Form(...),
+    audio: UploadFile = File(None),
+    transcript: str = Form(None),
+    stream_tokens: bool = Form(True),
+    pipeline: str = Form(None),
+    instructions: str = Form(None)
+):
+    check_documentation_request(thread_id, visit_id, audio, transcript, instructions)
+    if pipeline and pipeline not in PIPELINES:
+        raise HTTPException(400, f"pipeline must be one of: {', '.join(PIPELINES)}")
+    
+    audio_path = None
+    if audio:
+        try:
+            audio_path = await spool_upload(audio)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    
+    async def events():
+        try:
+            async for event in agent_service.stream_conversation(
+                thread_id=thread_id,
+                visit_id=visit_id,
+                audio_file=audio_path,
+                transcript=transcript,
+                stream_tokens=stream_tokens,
+                pipeline=pipeline,
+                instructions=instructions
+            ):
+                yield sse_event(event)
+        except Exception as e:
+            log.error("Error streaming documentation", thread_id=thread_id, visit_id=visit_id, error=str(e))
+            yield sse_event({"type": "error", "error": str(e)})
+        finally:
+            await remove_file(audio_path)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/documentation/live")
+async def live_transcription(websocket: WebSocket):
+    """
+    Live in-room transcription. The client sends binary frames of 16kHz mono
+    16-bit PCM and a {"type": "stop"} text message when the visit ends; the
+    server pushes "partial" and "final" segments, then one "complete" message
+    with the full transcript. "incomplete" in that message is true when some
+    segments could not be transcribed ("failed_segments"); the transcript then
+    has gaps, and the client should submit its recording instead.
+    """
+    await websocket.accept()
+    session = LiveTranscriptionSession(agent_service.transcription_plugin.transcribe_wav, websocket.send_json)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                if len(message["bytes"]) > MAX_LIVE_FRAME_BYTES:
+                    await websocket.close(code=1009, reason="Audio frame too large")
+                    return
+                await session.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    command = json.loads(message["text"])
+                except ValueError:
+                    command = None
+                if not isinstance(command, dict):
+                    await websocket.send_json({"type": "error", "error": "Control messages must be JSON objects"})
+                    continue
+                if command.get("type") == "stop":
+                    transcript = await session.finish()
+                    failed = sorted(session.failed_segments)
+                    if failed:
+                        log.warning("Live transcript incomplete", failed_segments=failed)
+                    await websocket.send_json({
+                        "type": "complete", "transcript": transcript,
+                        "incomplete": bool(failed), "failed_segments": failed,
+                    })
+                    await websocket.close()
+                    return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
+
+@app.get("/api/documentation/jobs/{job_id}")
+async def get_documentation_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.post("/api/documentation/save-transcript")
 async def save_transcript(
     visit_id: int = Form(...),
     transcript_text: str = Form(...)
 ):
     try:
-        print(f"Saving transcript for visit_id: {visit_id}, length: {len(transcript_text)} chars")
         transcript_id = await database_service.save_transcript(visit_id, transcript_text)
-        print(f"Saved transcript with ID: {transcript_id}")
+        log.info("Transcript saved", visit_id=visit_id, transcript_id=transcript_id, transcript=transcript_text)
         return {"transcript_id": transcript_id, "message": "Transcript saved successfully"}
     except Exception as e:
-        import traceback
-        print(f"Error saving transcript: {str(e)}")
-        print(traceback.format_exc())
+        log.error("Error saving transcript", visit_id=visit_id, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to save transcript: {str(e)}")
 
 @app.post("/api/documentation/save-soap")
@@ -225,7 +471,7 @@ async def update_visit(
         )
         return {"message": "Visit updated successfully"}
     except Exception as e:
-        print(f"Error updating visit: {str(e)}")
+        log.error("Error updating visit", visit_id=visit_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to update visit: {str(e)}")
     
 @app.post("/api/visits/{visit_id}/update-status")
@@ -240,22 +486,26 @@ async def update_visit_status(
         raise HTTPException(status_code=500, detail=f"Failed to update visit status: {str(e)}")
     
 @app.get("/api/documentation/transcript/{visit_id}")
-async def get_transcript(visit_id: int):
+async def get_transcript(visit_id: int, request: Request):
     try:
-        transcript = await database_service.get_transcript_for_visit(visit_id)
-        if transcript:
-            return transcript
+        response = await database_service.etags.respond(
+            request, "transcript", visit_id, lambda: database_service.get_transcript_for_visit(visit_id)
+        )
+        if response is not None:
+            return response
         else:
             raise HTTPException(status_code=404, detail="No transcript found for this visit")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch transcript: {str(e)}")
 
 @app.get("/api/documentation/soap/{visit_id}")
-async def get_soap_note(visit_id: int):
+async def get_soap_note(visit_id: int, request: Request):
     try:
-        soap_note = await database_service.get_soap_note_for_visit(visit_id)
-        if soap_note:
-            return soap_note
+        response = await database_service.etags.respond(
+            request, "soap", visit_id, lambda: database_service.get_soap_note_for_visit(visit_id)
+        )
+        if response is not None:
+            return response
         else:
             raise HTTPException(status_code=404, detail="No SOAP note found for this visit")
     except Exception as e:
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import inspect
+import os
+import time
+
+from .rate_limiter import RateLimiter
+from .structured_logging import get_logger
+
+log = get_logger(__name__)
+
+# Metadata keys written on every agent the registry creates
+REGISTRY_MARKER_KEY = "registry"
+REGISTRY_MARKER = "medscribeai"
+DEFINITION_HASH_KEY = "definition_sha256"
+# Unix time a process last resolved the agent; refreshed while the process runs
+RESOLVED_AT_KEY = "resolved_at"
+
+LIST_PAGE_SIZE = 100
+
+
+def definition_hash(model: str, instructions: str) -> str:
+    """Fingerprint of everything that makes an agent definition reusable"""
+    digest = hashlib.sha256()
+    digest.update(model.encode())
+    digest.update(b"\0")
+    digest.update(instructions.strip().encode())
+    return digest.hexdigest()
+
+
+class AgentRegistry:
+    """
+    Resolves named agent definitions against the agents already stored in the
+    Azure AI project.
+
+    An existing agent is reused when its name matches and its metadata carries
+    the same definition hash, so a restart with unchanged instructions costs a
+    single list call. A changed definition gets a new agent rather than
+    updating the stored one, since other processes (a rolling deploy, workers
+    on a different SOAP_OUTPUT_FORMAT) may still be running chats on it.
+
+    Every process stamps the agents it uses with `resolved_at`, at startup and
+    every `heartbeat` seconds after. With `prune` set, agents of the same name
+    whose definition differs from ours are deleted once no process has stamped
+    them for `grace` seconds, so only definitions nobody runs any more go.
+    """
+
+    def __init__(self, client, prune=None, grace=None, heartbeat=None):
+        self.client = client
+        self.limiter = RateLimiter.get("management")
+        self.prune = prune if prune is not None else os.getenv("AGENT_REGISTRY_PRUNE", "false").lower() == "true"
+        self.grace = grace if grace is not None else float(os.getenv("AGENT_REGISTRY_PRUNE_GRACE_SECONDS", "86400"))
+        self.heartbeat = heartbeat if heartbeat is not None else float(
+            os.getenv("AGENT_REGISTRY_HEARTBEAT_SECONDS", "3600")
+        )
+        self.timings = {}
+        self.resolved = {}  # name -> (agent, spec) for the definitions this process runs
+        self._stamper = None
+
+    async def start(self):
+        """Keep stamping the resolved agents, so other processes never prune them"""
+        if self._stamper is None and self.heartbeat > 0:
+            self._stamper = asyncio.create_task(self._stamp_forever())
+
+    async def close(self):
+        if self._stamper:
+            self._stamper.cancel()
+            try:
+                await self._stamper
+            except asyncio.CancelledError:
+                pass
+            self._stamper = None
+
+    async def resolve(self, definitions):
+        """
+        definitions: {name: {"model": ..., "instructions": ...}}
+        Returns {name: agent definition} in the same order.
+        """
+        started = time.monotonic()
+        existing = await self._list_agents()
+        self.timings = {"list_ms": round((time.monotonic() - started) * 1000)}
+
+        by_name = {}
+        for agent in existing:
+            if agent.name in definitions:
+                by_name.setdefault(agent.name, []).append(agent)
+
+        actions = {}
+        resolved = await asyncio.gather(*(
+            self._resolve_one(name, spec, by_name.get(name, []), actions)
+            for name, spec in definitions.items()
+        ))
+        self.timings["total_ms"] = round((time.monotonic() - started) * 1000)
+        self.timings["actions"] = actions
+        self.resolved = {
+            name: (agent, spec) for (name, spec), agent in zip(definitions.items(), resolved)
+        }
+        return dict(zip(definitions, resolved))
+
+    async def _resolve_one(self, name, spec, candidates, actions):
+        expected = definition_hash(spec["model"], spec["instructions"])
+
+        match = next((a for a in candidates if self._metadata(a).get(DEFINITION_HASH_KEY) == expected), None)
+        if match is None:
+            agent = await self.limiter.call(lambda: self.client.agents.create_agent(
+                model=spec["model"], name=name, instructions=spec["instructions"], metadata=self._stamp(expected)
+            ))
+            actions[name] = "created"
+        else:
+            agent = match
+            actions[name] = "reused"
+            if time.time() - self._resolved_at(agent) > self.heartbeat:
+                # Nobody has stamped it within a heartbeat; claim it before anyone prunes it
+                agent = await self._refresh(name, agent, spec)
+
+        if self.prune:
+            now = time.time()
+            stale = [
+                a for a in candidates
+                if a.id != agent.id
+                and self._metadata(a).get(REGISTRY_MARKER_KEY) == REGISTRY_MARKER
+                and self._metadata(a).get(DEFINITION_HASH_KEY) != expected
+                and now - self._resolved_at(a) > self.grace
+            ]
+            results = await asyncio.gather(
+                *(self.limiter.call(lambda agent_id=a.id: self.client.agents.delete_agent(agent_id)) for a in stale),
+                return_exceptions=True
+            )
+            for a, result in zip(stale, results):
+                if isinstance(result, Exception):
+                    log.warning("Could not delete stale agent", agent_id=a.id, agent=name, error=str(result))
+            if stale:
+                actions[name] += f", pruned {len(stale)}"
+        return agent
+
+    async def _refresh(self, name, agent, spec):
+        """Re-stamp agent's resolved_at; its definition is rewritten unchanged"""
+        expected = definition_hash(spec["model"], spec["instructions"])
+        return await self.limiter.call(lambda: self.client.agents.update_agent(
+            agent.id, model=spec["model"], name=name, instructions=spec["instructions"], metadata=self._stamp(expected)
+        ))
+
+    async def _stamp_forever(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for name, (agent, spec) in list(self.resolved.items()):
+                try:
+                    await self._refresh(name, agent, spec)
+                except Exception as e:
+                    log.warning("Could not refresh agent", agent_id=agent.id, agent=name, error=str(e))
+
+    @staticmethod
+    def _stamp(expected):
+        return {
+            REGISTRY_MARKER_KEY: REGISTRY_MARKER,
+            DEFINITION_HASH_KEY: expected,
+            RESOLVED_AT_KEY: str(int(time.time())),
+        }
+
+    @classmethod
+    def _resolved_at(cls, agent) -> float:
+        """When a process last used agent, falling back to its creation time"""
+        stamp = cls._metadata(agent).get(RESOLVED_AT_KEY)
+        if stamp:
+            try:
+                return float(stamp)
+            except ValueError:
+                pass
+        created_at = getattr(agent, "created_at", None)
+        if hasattr(created_at, "timestamp"):
+            return created_at.timestamp()
+        if isinstance(created_at, (int, float)):
+            return float(created_at)
+        # Unknown age: treat it as in use
+        return time.time()
+
+    @staticmethod
+    def _metadata(agent):
+        return getattr(agent, "metadata", None) or {}
+
+    async def _list_agents(self):
+        """Every agent in the project, newest first"""
+        await self.limiter.acquire()
+        result = self.client.agents.list_agents(limit=LIST_PAGE_SIZE, order="desc")
+        if inspect.isawaitable(result):
+            result = await result
+        if not hasattr(result, "data"):
+            # Newer SDKs return an async pager that follows pages itself
+            return [agent async for agent in result]
+
+        agents = list(result.data)
+        while result.has_more:
+            last_id = result.last_id
+            result = await self.limiter.call(
+                lambda: self.client.agents.list_agents(limit=LIST_PAGE_SIZE, order="desc", after=last_id)
+            )
+            agents.extend(result.data)
+        return agents
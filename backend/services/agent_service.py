@@ -1,44 +1,55 @@
 from .transcription_plugin import TranscriptionPlugin
 from .database_plugin import DatabasePlugin
+from .agent_registry import AgentRegistry
+from .rate_limiter import RateLimiter, is_rate_limit_error
+from .session_manager import SessionManager
+from .soap_note import SOAP_NOTE_SCHEMA, SoapNoteValidationError, parse_soap_note
+from .soap_verifier import SoapVerifier
+from .metrics import AGENT_TURN_SECONDS, RETRIES
+from .structured_logging import debug_sampled, get_logger
+from .checkpoints import (
+    SOAP_NOTE, STAGE_AGENTS, TRANSCRIPT, VERIFICATION, ConversationCheckpoint,
+    activate as activate_checkpoint, deactivate as deactivate_checkpoint,
+)
 import asyncio
+import os
+import time
 from azure.identity.aio import DefaultAzureCredential
 from semantic_kernel.agents import AzureAIAgent, AzureAIAgentSettings, AzureAIAgentThread, AgentGroupChat
 from semantic_kernel.functions import kernel_function
 from strategies.medical import MedicalSelectionStrategy, MedicalTerminationStrategy
 
+log = get_logger(__name__)
 
-class AgentService:
-    _instance  = None
 
-    @classmethod
-    async def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = AgentService()
-            await cls._instance.initialize()
-        return cls._instance
-    
-    async def initialize(self):
-        """Initialize the agents once during application startup"""
-        self.ai_agent_settings = AzureAIAgentSettings()
-        
-        # Create connection to Azure AI service
-        self.credential = DefaultAzureCredential()
-        self.client =  AzureAIAgent.create_client(credential=self.credential)
-        
-        # Create agents (only once)
-        print("Initializing agents...")
-        await self._initialize_agents()
-        print("Agents initialized successfully")
-    
-    async def _initialize_agents(self):
-        """Create the agent definitions and instances once"""
-        
-        
-        # transcirption agent
-        self.transcription_agent_def = await self.client.agents.create_agent(
-            model=self.ai_agent_settings.model_deployment_name,
-            name="TranscriptionAgent",
-            instructions="""You are a medical transcription specialist.
+class ConversationFailedError(Exception):
+    """Raised when a documentation run still fails after its last retry"""
+
+
+# Stage names reported to streaming clients for each agent's turn
+AGENT_STAGES = {
+    "TranscriptionAgent": "transcription",
+    "DocumentationAgent": "documentation",
+    "VerificationAgent": "verification",
+}
+# Checkpoint stage completed by each agent's turn
+AGENT_CHECKPOINTS = {agent_name: stage for stage, agent_name in STAGE_AGENTS.items()}
+
+# "agents" lets TranscriptionAgent drive transcription through a tool call;
+# "direct" transcribes and saves in the backend and starts at DocumentationAgent
+AGENTS_PIPELINE = "agents"
+DIRECT_PIPELINE = "direct"
+PIPELINES = (AGENTS_PIPELINE, DIRECT_PIPELINE)
+DEFAULT_PIPELINE = os.getenv("AGENT_PIPELINE", AGENTS_PIPELINE)
+
+# "json" has DocumentationAgent return a SoapNote object that the backend validates
+# and saves together with the transcript, instead of a markdown note plus a tool call
+STRUCTURED_SOAP_OUTPUT = os.getenv("SOAP_OUTPUT_FORMAT", "markdown").lower() == "json"
+
+# Rule-based SOAP checks that let a clearly complete note skip VerificationAgent's turn (opt-in)
+LOCAL_VERIFICATION = os.getenv("LOCAL_VERIFICATION", "false").lower() == "true"
+
+TRANSCRIPTION_INSTRUCTIONS = """You are a medical transcription specialist.
         Your job is to convert audio files of medical conversations into text.
 
         When you see a message containing an audio file path, you must call the transcribe_file function. Do not write out any transcript yourself.
@@ -49,14 +60,8 @@ class AgentService:
         {"name":"transcribe_file","arguments":{"audio_path":"<path>"}}
 After that function returns, you may write follow-up clarification messages, tagging speakers as “Doctor” and “Patient.”
             """
-        )
-        await asyncio.sleep(1)
-    
-        # Documentation Agent
-        self.documentation_agent_def = await self.client.agents.create_agent(
-            model=self.ai_agent_settings.model_deployment_name,
-            name="DocumentationAgent",
-            instructions="""You are a clinical documentation assistant.
+
+DOCUMENTATION_INSTRUCTIONS = """You are a clinical documentation assistant.
     Given a transcript of a doctor-patient conversation, generate a SOAP note in this format:
     
     **Subjective:**  
@@ -78,14 +83,22 @@ After that function returns, you may write follow-up clarification messages, tag
     - assessment: The assessment section text
     - treatment_plan: The plan section text
             """
-        )
-        await asyncio.sleep(1)
-        
-        # verification agent
-        self.verification_agent_def = await self.client.agents.create_agent(
-            model=self.ai_agent_settings.model_deployment_name,
-            name="VerificationAgent",
-            instructions="""You are a medical documentation reviewer.
+
+DOCUMENTATION_JSON_INSTRUCTIONS = f"""You are a clinical documentation assistant.
+    Given a transcript of a doctor-patient conversation, write a SOAP note.
+    
+    Respond with one JSON object and nothing else (no markdown, no code fences) matching this JSON schema:
+    {SOAP_NOTE_SCHEMA}
+    
+    - subjective: Patient-reported symptoms
+    - objective: Doctor observations, vitals
+    - assessment: Clinical diagnosis
+    - plan: Treatment plan or next steps
+    
+    Use an empty string for a section the conversation does not cover. The note is saved for you; do not call any functions.
+            """
+
+VERIFICATION_INSTRUCTIONS = """You are a medical documentation reviewer.
             Your task is to verify the completeness and accuracy of SOAP notes.
             Check for:
             1. Missing information from the transcript
@@ -94,103 +107,444 @@ After that function returns, you may write follow-up clarification messages, tag
             4. Appropriate level of detail in each section
             If the documentation meets all criteria, conclude with 'Documentation complete.'
             If issues are found, identify them specifically then conclude with 'complete.'."""
-        )
-        await asyncio.sleep(1)
-        
+
+
+class AgentService:
+    _instance  = None
+
+    @classmethod
+    async def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = AgentService()
+            await cls._instance.initialize()
+        return cls._instance
+    
+    async def initialize(self):
+        """Initialize the agents once during application startup"""
+        # Create connection to Azure AI service
+        self.client = self._create_client()
         
-        self.transcription_plugin = TranscriptionPlugin()
-        self.database_plugin = DatabasePlugin()
+        # Reuse stored agents where the definition is unchanged
+        log.info("Initializing agents")
+        started = time.monotonic()
+        await self._initialize_agents()
+        self.startup_seconds = round(time.monotonic() - started, 3)
+        log.info("Agents initialized", seconds=self.startup_seconds, registry=self.agent_registry_timings)
         
-        self.transcription_agent = AzureAIAgent(
-            client=self.client,
-            definition=self.transcription_agent_def,
-            plugins=[self.transcription_plugin]
+        # Live threads and chats, so follow-up requests on a visit keep their context
+        self.sessions = SessionManager(self.client)
+        self.verifier = SoapVerifier()
+        await self.sessions.start()
+        await self.agent_registry.start()
+    
+    def _create_client(self):
+        self.ai_agent_settings = AzureAIAgentSettings()
+        self.credential = DefaultAzureCredential()
+        return AzureAIAgent.create_client(credential=self.credential)
+
+    def _create_agent(self, definition, plugins=None):
+        return AzureAIAgent(client=self.client, definition=definition, plugins=plugins)
+
+    def _create_transcription_plugin(self):
+        return TranscriptionPlugin()
+
+    def _create_chat(self, agents, precheck=None):
+        return AgentGroupChat(
+            agents=agents,
+            selection_strategy=MedicalSelectionStrategy(),
+            termination_strategy=MedicalTerminationStrategy(precheck=precheck)
         )
+
+    async def _initialize_agents(self):
+        """Resolve the agent definitions (reusing stored ones) and build the agent instances"""
+        model = self.ai_agent_settings.model_deployment_name
+        self.agent_registry = registry = AgentRegistry(self.client)
+        definitions = await registry.resolve({
+            "TranscriptionAgent": {"model": model, "instructions": TRANSCRIPTION_INSTRUCTIONS},
+            "DocumentationAgent": {
+                "model": model,
+                "instructions": DOCUMENTATION_JSON_INSTRUCTIONS if STRUCTURED_SOAP_OUTPUT else DOCUMENTATION_INSTRUCTIONS,
+            },
+            "VerificationAgent": {"model": model, "instructions": VERIFICATION_INSTRUCTIONS},
+        })
+        self.agent_registry_timings = registry.timings
+        self.transcription_agent_def = definitions["TranscriptionAgent"]
+        self.documentation_agent_def = definitions["DocumentationAgent"]
+        self.verification_agent_def = definitions["VerificationAgent"]
         
-        self.documentation_agent = AzureAIAgent(
-            client=self.client,
-            definition=self.documentation_agent_def,
-            plugins=[self.database_plugin]
-        )
+        self.transcription_plugin = self._create_transcription_plugin()
+        self.database_plugin = DatabasePlugin()
         
-        self.verification_agent = AzureAIAgent(
-            client=self.client,
-            definition=self.verification_agent_def
+        self.transcription_agent = self._create_agent(self.transcription_agent_def, [self.transcription_plugin])
+        # Structured notes are saved by the backend, so the agent needs no tools
+        self.documentation_agent = self._create_agent(
+            self.documentation_agent_def, [] if STRUCTURED_SOAP_OUTPUT else [self.database_plugin]
         )
+        self.verification_agent = self._create_agent(self.verification_agent_def)
         
     async def create_documentation_session(self, visit_id):
         """Create a new thread for a documentation session"""
-        thread = await self.client.agents.create_thread()
-        return thread.id
+        session = await self.sessions.create(visit_id)
+        return session.thread_id
     
-    async def process_conversation(self, thread_id, visit_id, audio_file=None, transcript=None):
-        """Process a doctor-patient conversation"""
-        print(f"Starting agent conversation with audio_file: {audio_file}")
-        print(f"AgentService - Starting conversation for thread_id: {thread_id}, visit_id: {visit_id}")
-        print(f"AgentService - Audio: {audio_file}, Transcript: {transcript}")
-        
-        # Create agent group chat with existing agents (reusing them)
-        chat = AgentGroupChat(
-            agents=[self.transcription_agent, self.documentation_agent, self.verification_agent],
-            selection_strategy=MedicalSelectionStrategy(),
-            termination_strategy=MedicalTerminationStrategy()
-        )
+    async def process_conversation(self, thread_id, visit_id, audio_file=None, transcript=None, on_response=None,
+                                   pipeline=None, checkpoint=None, on_checkpoint=None, instructions=None):
+        """
+        Process a doctor-patient conversation.
+        on_response, if given, is awaited with each agent response as it arrives.
+        checkpoint is the saved state of an earlier, interrupted run of the same
+        job (see ConversationCheckpoint); on_checkpoint is awaited with the new
+        state after every stage so the caller can persist it.
+        """
+        checkpoint = ConversationCheckpoint(checkpoint, on_change=on_checkpoint)
+        async for event in self.stream_conversation(thread_id, visit_id, audio_file=audio_file, transcript=transcript,
+                                                    pipeline=pipeline, checkpoint=checkpoint,
+                                                    instructions=instructions):
+            if event["type"] == "message":
+                entry = {
+                    "agent": event["agent"],
+                    "content": event["content"]
+                }
+                for key in ("soap_note", "verification"):
+                    if key in event:
+                        entry[key] = event[key]
+                if on_response:
+                    await on_response(entry)
         
-        # Add context message to thread with visit information
-        message = f"Process documentation for visit ID {visit_id}."
-        if audio_file:
-            message += f" Record and transcribe the audio file: {audio_file}"
-        elif transcript:
-            message += f" Use the provided transcript: {transcript}"
-        
-        await chat.add_chat_message(message)
+        # Includes responses delivered by earlier runs of a resumed checkpoint
+        responses = checkpoint.responses
+        log.info("Conversation finished", thread_id=thread_id, visit_id=visit_id, messages=len(responses))
+        return responses
+
+    async def stream_conversation(self, thread_id, visit_id, audio_file=None, transcript=None, stream_tokens=False,
+                                  pipeline=None, checkpoint=None, instructions=None):
+        """
+        Process a doctor-patient conversation, yielding events as they happen.
+
+        Every event is a dict with a "type" and "elapsed_ms" since the start:
+        "stage" marks the run or an agent turn starting, "delta" carries token
+        chunks (only with stream_tokens, where the SDK supports streaming),
+        "message" carries an agent's complete response, "retry" reports a failed
+        attempt that is about to be retried, and "done" ends the stream. A run
+        that still fails after its last retry raises ConversationFailedError
+        instead of ending with "done".
+
+        pipeline selects who transcribes (see PIPELINES); None uses DEFAULT_PIPELINE.
+        Finished stages are recorded in checkpoint, and a retry resumes after the
+        last one without repeating its messages.
+
+        A request on a thread that already completed a run is a follow-up: only
+        the new transcript and the clinician's instructions are added to the
+        session's existing group chat, which picks up at DocumentationAgent.
+        """
+        pipeline = pipeline or DEFAULT_PIPELINE
+        if pipeline not in PIPELINES:
+            raise ValueError(f"Unknown pipeline: {pipeline}")
+        checkpoint = checkpoint or ConversationCheckpoint()
+        started = time.monotonic()
+
+        def event(event_type, **fields):
+            return {"type": event_type, "elapsed_ms": round((time.monotonic() - started) * 1000), **fields}
+
+        async def complete(agent_name, content, **fields):
+            response = {"agent": agent_name, "content": content, **fields}
+            if agent_name == "DocumentationAgent" and STRUCTURED_SOAP_OUTPUT:
+                # An invalid note raises here, so the turn is retried like any other failure
+                note = parse_soap_note(content)
+                await self._save_structured_note(visit_id, checkpoint, transcript, note)
+                response = {"agent": agent_name, "content": note.to_markdown(), "soap_note": note.model_dump()}
+            # Record the finished turn before the caller sees it
+            await checkpoint.add_response(response)
+            stage = AGENT_CHECKPOINTS.get(agent_name)
+            if stage:
+                await checkpoint.record(stage, message=response["content"])
+            return event("message", stage=AGENT_STAGES.get(agent_name, agent_name), **response)
+
+        local_verification = None
+
+        def verify_locally(content=None):
+            """Check the SOAP note with the rule-based verifier; True if the model's turn can be skipped"""
+            nonlocal local_verification
+            if checkpoint.done(SOAP_NOTE):
+                note = self._stage_output(SOAP_NOTE, checkpoint, transcript)
+            elif STRUCTURED_SOAP_OUTPUT:
+                try:
+                    note = parse_soap_note(content).to_markdown()
+                except SoapNoteValidationError:
+                    return False
+            else:
+                note = content
+            text = self._stage_output(TRANSCRIPT, checkpoint, transcript)
+            if follow_up:
+                # The updated note covers the whole session, not just this request
+                text = "\n".join(part for part in (session.transcript, text) if part)
+            local_verification = self.verifier.check(note, text)
+            # Issues name transcript findings, so only the scores are logged
+            log.info("Local verification", visit_id=visit_id, confidence=round(local_verification.confidence, 3),
+                     skip=local_verification.skip, checks=local_verification.to_dict()["checks"])
+            return local_verification.skip
+
+        async def verified_locally():
+            """Finish the verification stage without the model if the note passed the local checks"""
+            if not LOCAL_VERIFICATION or checkpoint.next_stage != VERIFICATION:
+                return None
+            if local_verification is None:
+                verify_locally()
+            if not local_verification.skip:
+                return None
+            return await complete("VerificationAgent", local_verification.report(),
+                                  verification=local_verification.to_dict())
+
+        log.info("Conversation started", thread_id=thread_id, visit_id=visit_id, audio_file=audio_file,
+                 transcript=transcript, pipeline=pipeline, resume_from=checkpoint.next_stage)
         
-        # Process with retry for rate limiting
-        responses = []
-        max_retries = 3
-        retry_count = 0
+        session = await self.sessions.get(thread_id, visit_id) if thread_id else None
+        if session:
+            await session.lock.acquire()
+        follow_up = bool(session and session.runs and not checkpoint.stages)
         
-        while retry_count < max_retries:
-            try:
-                print(f"AgentService - Starting chat.invoke() (attempt {retry_count + 1})")
-                async for response in chat.invoke():
-                    print(f"AgentService - Got response from agent: {response.name}")
-                    if response:
-                        responses.append({
-                            "agent": response.name,
-                            "content": response.content
-                        })
-                        print(f"AgentService - Added response from {response.name}")
-                break  # Success, exit the retry loop
-            except Exception as e:
-                retry_count += 1
-                print(f"AgentService - Error in processing (attempt {retry_count}): {str(e)}")
-                
-                if "Rate limit is exceeded" in str(e):
-                    # Parse the wait time from the error message
-                    import re
-                    wait_seconds = 3  # Default
-                    match = re.search(r'Try again in (\d+) seconds', str(e))
-                    if match:
-                        wait_seconds = int(match.group(1))
+        # Lets the plugins record what they save against this run
+        token = activate_checkpoint(checkpoint)
+        try:
+            yield event("stage", stage="started", pipeline=pipeline, resume_from=checkpoint.next_stage,
+                        follow_up=follow_up)
+            
+            # Process with retry for rate limiting
+            message_count = 0
+            max_retries = 3
+            retry_count = 0
+            failure = None
+            chat, chat_stage = None, None
+            
+            while retry_count < max_retries:
+                try:
+                    if follow_up and not checkpoint.get(TRANSCRIPT, "follow_up"):
+                        # Only the new part of the visit is transcribed; the chat already has the rest
+                        text = checkpoint.get(TRANSCRIPT, "text") or transcript or ""
+                        if not text and audio_file:
+                            yield event("stage", stage=AGENT_STAGES["TranscriptionAgent"], agent="TranscriptionAgent")
+                            text = await self.transcription_plugin.listen_and_transcribe(audio_file)
+                        fields = {"text": text, "follow_up": True}
+                        if text and pipeline == DIRECT_PIPELINE and not STRUCTURED_SOAP_OUTPUT:
+                            fields["transcript_id"] = await self.database_plugin.db_service.save_transcript(visit_id, text)
+                        await checkpoint.record(TRANSCRIPT, **fields)
+                    elif pipeline == DIRECT_PIPELINE and not checkpoint.get(TRANSCRIPT, "ready"):
+                        # Transcribe and save here instead of spending a model turn on the tool call
+                        yield event("stage", stage=AGENT_STAGES["TranscriptionAgent"], agent="TranscriptionAgent")
+                        text = checkpoint.get(TRANSCRIPT, "text") or transcript
+                        if not text:
+                            text = await self.transcription_plugin.listen_and_transcribe(audio_file)
+                        fields = {"text": text, "ready": True}
+                        # Structured notes save the transcript in the same transaction as the note
+                        if not STRUCTURED_SOAP_OUTPUT and not checkpoint.get(TRANSCRIPT, "transcript_id"):
+                            fields["transcript_id"] = await self.database_plugin.db_service.save_transcript(visit_id, text)
+                        await checkpoint.record(TRANSCRIPT, **fields)
                     
-                    print(f"Rate limit exceeded. Waiting {wait_seconds} seconds before retry...")
-                    await asyncio.sleep(wait_seconds + 5)  # Add a buffer
-                elif retry_count >= max_retries:
-                    print("Max retries reached. Giving up.")
-                    break
+                    # Stages can finish without their agent's message reaching the caller
+                    # (e.g. the SOAP note was saved, then the turn failed); hand over what was stored
+                    for stage, agent_name in STAGE_AGENTS.items():
+                        content = self._stage_output(stage, checkpoint, transcript)
+                        if content and checkpoint.done(stage) and not checkpoint.delivered(agent_name):
+                            message_count += 1
+                            yield await complete(agent_name, content)
+                    
+                    local_event = await verified_locally()
+                    if local_event:
+                        message_count += 1
+                        yield local_event
+                    
+                    if checkpoint.next_stage is None:
+                        break
+                    chat_stage = checkpoint.next_stage
+                    chat = await self._resume_chat(
+                        checkpoint, visit_id, audio_file, transcript, instructions,
+                        session=session if follow_up else None, reuse_session_chat=retry_count == 0,
+                        precheck=verify_locally if LOCAL_VERIFICATION else None,
+                    )
+                    use_streaming = stream_tokens and hasattr(chat, "invoke_stream")
+                    
+                    if use_streaming:
+                        log.debug("Invoking group chat", visit_id=visit_id, attempt=retry_count + 1, streaming=True)
+                        agent_name, parts = None, []
+                        # A turn's time is only the time spent waiting for its chunks, excluding the
+                        # consumer's handling of the events yielded in between
+                        turn_seconds, waiting_since = 0.0, time.perf_counter()
+                        async for chunk in chat.invoke_stream():
+                            waited = time.perf_counter() - waiting_since
+                            name = getattr(chunk, "name", None) or agent_name
+                            if name != agent_name:
+                                # A new agent took the turn; the previous one is finished
+                                if agent_name and parts:
+                                    AGENT_TURN_SECONDS.observe(turn_seconds, agent_name)
+                                    message_count += 1
+                                    yield await complete(agent_name, "".join(parts))
+                                agent_name, parts, turn_seconds = name, [], 0.0
+                                yield event("stage", stage=AGENT_STAGES.get(name, name), agent=name)
+                            turn_seconds += waited
+                            if chunk.content:
+                                parts.append(chunk.content)
+                                yield event("delta", agent=agent_name, content=chunk.content)
+                            waiting_since = time.perf_counter()
+                        if agent_name and parts:
+                            turn_seconds += time.perf_counter() - waiting_since
+                            AGENT_TURN_SECONDS.observe(turn_seconds, agent_name)
+                            message_count += 1
+                            yield await complete(agent_name, "".join(parts))
+                    else:
+                        log.debug("Invoking group chat", visit_id=visit_id, attempt=retry_count + 1, streaming=False)
+                        # Turns are timed from the previous turn's end, excluding the consumer's handling of it
+                        turn_started = time.perf_counter()
+                        async for response in chat.invoke():
+                            AGENT_TURN_SECONDS.observe(time.perf_counter() - turn_started, response.name)
+                            debug_sampled(log, "Agent turn finished", visit_id=visit_id, agent=response.name,
+                                          seconds=round(time.perf_counter() - turn_started, 3))
+                            if response:
+                                message_count += 1
+                                yield await complete(response.name, response.content)
+                            turn_started = time.perf_counter()
+                    
+                    # The chat ends after DocumentationAgent when the note passed the local checks
+                    local_event = await verified_locally()
+                    if local_event:
+                        message_count += 1
+                        yield local_event
+                    break  # Success, exit the retry loop
+                except Exception as e:
+                    retry_count += 1
+                    log.warning("Conversation attempt failed", visit_id=visit_id, attempt=retry_count, error=str(e))
+                    rate_limited = is_rate_limit_error(e)
+                    if rate_limited:
+                        # Hold every run on this quota, not just ours; the next turn's
+                        # selection waits in the shared limiter until the hold passes
+                        wait_seconds = RateLimiter.get("agents").on_rate_limit(e, retry_count)
+                        log.warning("Agent quota rate limited", visit_id=visit_id, wait_seconds=round(wait_seconds, 1))
+                    if retry_count >= max_retries:
+                        log.error("Conversation failed after retries", visit_id=visit_id, attempts=retry_count)
+                        failure = e
+                        break
+                    resume = {
+                        "resume_from": checkpoint.next_stage,
+                        "completed": [response["agent"] for response in checkpoint.responses],
+                    }
+                    
+                    if rate_limited:
+                        RETRIES.inc("conversation", "rate_limit")
+                        yield event("retry", attempt=retry_count, wait_seconds=round(wait_seconds, 1), error=str(e),
+                                    **resume)
+                    else:
+                        # For other errors, use exponential backoff
+                        wait_time = 2 ** retry_count
+                        RETRIES.inc("conversation", "error")
+                        log.info("Retrying conversation", visit_id=visit_id, wait_seconds=wait_time)
+                        yield event("retry", attempt=retry_count, wait_seconds=wait_time, error=str(e), **resume)
+                        await asyncio.sleep(wait_time)
+            
+            if session:
+                if checkpoint.next_stage is None:
+                    # Keep the chat for follow-ups if it still has the documentation agent in it
+                    await self.sessions.finish_run(
+                        session, chat if chat_stage != VERIFICATION else None,
+                        self._stage_output(TRANSCRIPT, checkpoint, transcript), follow_up,
+                        checkpoint.get(SOAP_NOTE, "message"),
+                    )
                 else:
-                    # For other errors, use exponential backoff
-                    wait_time = 2 ** retry_count
-                    print(f"Retrying in {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
+                    await self.sessions.discard_chat(session)
+            if failure is not None:
+                # Whatever the finished stages produced is in the checkpoint for a resumed run
+                raise ConversationFailedError(
+                    f"Documentation failed after {retry_count} attempts at stage "
+                    f"{checkpoint.next_stage}: {failure}"
+                ) from failure
+            yield event("done", messages=message_count)
+        finally:
+            deactivate_checkpoint(token)
+            if session:
+                session.lock.release()
         
-        print(f"AgentService - Total responses collected: {len(responses)}")
-        return responses
+    async def _resume_chat(self, checkpoint, visit_id, audio_file, transcript, instructions=None,
+                           session=None, reuse_session_chat=False, precheck=None):
+        """
+        Build a group chat that starts at the checkpoint's first unfinished stage.
+        For a follow-up (session given) the session's chat is reused when possible,
+        so only the new transcript and instructions are sent. precheck is handed
+        to the termination strategy to end the chat before VerificationAgent.
+        """
+        stage = checkpoint.next_stage
+        text = self._stage_output(TRANSCRIPT, checkpoint, transcript)
+        request = f" Clinician request: {instructions}" if instructions else ""
+        if session is not None and session.chat is not None and reuse_session_chat:
+            chat = session.chat
+            chat.is_complete = False
+            chat.termination_strategy.precheck = precheck
+            message = f"Follow-up for visit ID {visit_id}."
+            if text:
+                message += f" Additional conversation transcript: {text}"
+            message += f"{request} Update the SOAP note accordingly and save it."
+            await chat.add_chat_message(message)
+            return chat
+        if session is not None:
+            # The session chat can't be reused (e.g. it failed mid-run): resend the whole context
+            text = "\n".join(part for part in (session.transcript, text) if part)
+            if session.soap_note:
+                request = f" Previous SOAP note:\n{session.soap_note}\n{request}"
         
+        if stage == TRANSCRIPT:
+            agents = [self.transcription_agent, self.documentation_agent, self.verification_agent]
+            # Add context message to thread with visit information
+            message = f"Process documentation for visit ID {visit_id}."
+            if audio_file:
+                message += f" Record and transcribe the audio file: {audio_file}"
+            elif transcript:
+                message += f" Use the provided transcript: {transcript}"
+        elif stage == SOAP_NOTE:
+            agents = [self.documentation_agent, self.verification_agent]
+            message = (f"Process documentation for visit ID {visit_id}. The transcript is complete; "
+                       f"create the SOAP note from it. Transcript: {text}")
+        else:
+            agents = [self.verification_agent]
+            message = (f"Verify the SOAP note already saved for visit ID {visit_id}. Transcript: {text}\n\n"
+                       f"SOAP note:\n{self._stage_output(SOAP_NOTE, checkpoint, transcript)}")
+        
+        # Create agent group chat with existing agents (reusing them)
+        chat = self._create_chat(agents, precheck)
+        await chat.add_chat_message(message + request)
+        return chat
+
+    async def _save_structured_note(self, visit_id, checkpoint, transcript, note):
+        """Save a validated note, and the run's transcript if it isn't saved yet, in one transaction"""
+        if checkpoint.get(SOAP_NOTE, "note_id"):
+            return
+        saved_transcript_id = checkpoint.get(TRANSCRIPT, "transcript_id")
+        text = None if saved_transcript_id else (self._stage_output(TRANSCRIPT, checkpoint, transcript) or None)
+        transcript_id, note_id = await self.database_plugin.db_service.save_documentation(
+            visit_id, note.subjective, note.objective, note.assessment, note.plan, transcript_text=text
+        )
+        if transcript_id:
+            await checkpoint.record(TRANSCRIPT, transcript_id=transcript_id)
+        await checkpoint.record(SOAP_NOTE, note_id=note_id, sections={
+            "subjective": note.subjective, "objective": note.objective,
+            "assessment": note.assessment, "treatment_plan": note.plan,
+        })
+
+    @staticmethod
+    def _stage_output(stage, checkpoint, transcript=None):
+        """The stored output of a finished stage, as an agent message would present it"""
+        if stage == TRANSCRIPT:
+            return checkpoint.get(TRANSCRIPT, "text") or transcript or checkpoint.get(TRANSCRIPT, "message", "")
+        if stage == SOAP_NOTE and checkpoint.get(SOAP_NOTE, "message") is None:
+            sections = checkpoint.get(SOAP_NOTE, "sections", {})
+            return "\n\n".join(
+                f"**{title}:**\n{sections.get(key, '')}"
+                for key, title in (("subjective", "Subjective"), ("objective", "Objective"),
+                                   ("assessment", "Assessment"), ("treatment_plan", "Plan"))
+            )
+        return checkpoint.get(stage, "message", "")
         
     async def cleanup(self):
         """Clean up resources when application shuts down"""
+        await self.sessions.close()
+        await self.agent_registry.close()
+        await self.transcription_plugin.close()
         if hasattr(self.client, 'close') and callable(self.client.close):
             await self.client.close()
         elif hasattr(self.client, '__aexit__'):
@@ -0,0 +1,87 @@
+import re
+from array import array
+
+from services.audio_transcoder import SAMPLE_RATE, SAMPLE_WIDTH
+
+FRAME_MS = 30
+# Only every Nth sample is used to estimate loudness; plenty for finding pauses
+_ENERGY_STRIDE = 4
+
+
+def _frame_energy(samples, start, length):
+    """Mean absolute amplitude of samples[start:start + length]"""
+    window = samples[start:start + length:_ENERGY_STRIDE]
+    return sum(map(abs, window)) / len(window) if window else 0
+
+
+def split_pcm(pcm, target_seconds=60.0, max_seconds=90.0, overlap_seconds=1.5, search_seconds=10.0):
+    """
+    Split 16kHz mono s16le PCM into (start_byte, end_byte) segments.
+
+    Each cut lands on the quietest frame within `search_seconds` of the target
+    length (never beyond `max_seconds`), and the next segment starts
+    `overlap_seconds` before the cut so words spoken across it are not lost.
+    """
+    samples = array("h")
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % SAMPLE_WIDTH])
+    total = len(samples)
+
+    target = int(target_seconds * SAMPLE_RATE)
+    longest = int(max_seconds * SAMPLE_RATE)
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    search = int(search_seconds * SAMPLE_RATE)
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+
+    segments = []
+    start = 0
+    while total - start > longest:
+        low = start + max(target - search, overlap + frame)
+        high = min(start + target + search, start + longest) - frame
+        if high < low:
+            cut = start + target
+        else:
+            cut = min(
+                range(low, high + 1, frame),
+                key=lambda position: _frame_energy(samples, position, frame),
+            ) + frame // 2
+        segments.append((start * SAMPLE_WIDTH, cut * SAMPLE_WIDTH))
+        start = cut - overlap
+    segments.append((start * SAMPLE_WIDTH, total * SAMPLE_WIDTH))
+    return segments
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_transcripts(parts, max_overlap_words=25, max_offset=3):
+    """
+    Join segment transcripts in order, dropping words repeated across overlaps.
+
+    For each boundary, the longest run of words that ends the previous text and
+    appears within the first few words of the next one is treated as duplicated.
+    """
+    words = []
+    for text in parts:
+        incoming = text.split()
+        if not incoming:
+            continue
+        if words:
+            tail = [_normalize(word) for word in words[-max_overlap_words:]]
+            head = [_normalize(word) for word in incoming[:max_overlap_words + max_offset]]
+            drop = 0
+            for size in range(min(len(tail), len(head)), 0, -1):
+                suffix = tail[-size:]
+                match = next(
+                    (offset for offset in range(min(max_offset, len(head) - size) + 1)
+                     if head[offset:offset + size] == suffix),
+                    None,
+                )
+                # A single matching word at the very start is accepted; a lone word
+                # further in is too likely to be a coincidence
+                if match is not None and (size > 1 or match == 0):
+                    drop = match + size
+                    break
+            incoming = incoming[drop:]
+        words.extend(incoming)
+    return " ".join(words)
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import struct
+
+SAMPLE_RATE = 16000
+CHANNELS = 1
+SAMPLE_WIDTH = 2  # bytes, s16le
+PIPE_CHUNK_SIZE = 64 * 1024
+
+# Containers whose index may sit at the end of the file cannot be demuxed from a pipe
+_SEEKABLE_ONLY = {".mp4", ".m4a", ".mov", ".3gp", ".3g2"}
+
+
+class TranscodingError(Exception):
+    """Raised when ffmpeg fails, times out or produces no audio"""
+
+
+def wav_header(data_length, sample_rate=SAMPLE_RATE, channels=CHANNELS, sample_width=SAMPLE_WIDTH) -> bytes:
+    """Build a canonical 44-byte PCM WAV header for data_length bytes of samples"""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_length, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b"data", data_length,
+    )
+
+
+class AudioTranscoder:
+    """
+    Non-blocking ffmpeg wrapper that normalizes audio to 16kHz mono s16 PCM.
+
+    Input is streamed to ffmpeg over stdin (MP4-family containers are opened by
+    path, since they need seeking) and PCM is read back from stdout, so nothing
+    is written next to the source file. A shared semaphore caps how many ffmpeg
+    processes run at once.
+    """
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = AudioTranscoder(
+                max_concurrent=int(os.getenv("FFMPEG_MAX_CONCURRENCY", str(os.cpu_count() or 2))),
+                timeout=float(os.getenv("FFMPEG_TIMEOUT_SECONDS", "300")),
+            )
+        return cls._instance
+
+    def __init__(self, max_concurrent=2, timeout=300.0, ffmpeg="ffmpeg"):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.ffmpeg = ffmpeg
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def to_pcm(self, input_path) -> bytes:
+        """Return the raw s16le PCM samples of input_path"""
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(self._run(input_path), self.timeout)
+            except asyncio.TimeoutError:
+                raise TranscodingError(f"ffmpeg timed out after {self.timeout}s on {input_path}")
+
+    async def to_wav(self, input_path) -> bytes:
+        """Return input_path as an in-memory 16kHz mono PCM WAV file"""
+        pcm = await self.to_pcm(input_path)
+        return wav_header(len(pcm)) + pcm
+
+    async def _run(self, input_path):
+        from_pipe = os.path.splitext(input_path)[1].lower() not in _SEEKABLE_ONLY
+        args = [self.ffmpeg, "-hide_banner", "-loglevel", "error"]
+        args += ["-i", "pipe:0"] if from_pipe else ["-nostdin", "-i", input_path]
+        args += [
+            "-ac", str(CHANNELS),    # mono
+            "-ar", str(SAMPLE_RATE),  # 16 kHz
+            "-f", "s16le",            # raw 16-bit PCM; the WAV header is added in Python
+            "pipe:1",
+        ]
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE if from_pipe else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        feeder = asyncio.create_task(self._feed(process, input_path)) if from_pipe else None
+        try:
+            stdout, stderr = await asyncio.gather(process.stdout.read(), process.stderr.read())
+            returncode = await process.wait()
+            if feeder:
+                await feeder
+        except BaseException:
+            # Timeout or cancellation: never leave an orphaned ffmpeg behind
+            if feeder:
+                feeder.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+        if returncode != 0:
+            message = stderr.decode(errors="replace").strip()[-500:]
+            raise TranscodingError(f"ffmpeg exited with code {returncode}: {message}")
+        if not stdout:
+            raise TranscodingError(f"ffmpeg produced no audio for {input_path}")
+        return stdout
+
+    async def _feed(self, process, input_path):
+        f = await asyncio.to_thread(open, input_path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, PIPE_CHUNK_SIZE):
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg stopped reading (bad input); its exit code and stderr explain why
+            pass
+        finally:
+            await asyncio.to_thread(f.close)
+            if not process.stdin.is_closing():
+                process.stdin.close()
@@ -0,0 +1,207 @@
+import asyncio
+import csv
+import datetime
+import io
+import json
+import time
+
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+
+
+class RowValidationError(ValueError):
+    """Raised when an import row is missing fields or has malformed values"""
+
+
+def detect_format(filename=None, content_type=None, explicit=None) -> str:
+    """Work out whether an upload is CSV or NDJSON"""
+    if explicit:
+        fmt = explicit.lower()
+    elif filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        fmt = "ndjson"
+    elif content_type and "ndjson" in content_type:
+        fmt = "ndjson"
+    else:
+        fmt = "csv"
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Unsupported import format: {fmt}")
+    return fmt
+
+
+def iter_records(binary_stream, fmt):
+    """
+    Yield (row_number, record) pairs from a binary CSV or NDJSON stream.
+
+    Lines are decoded incrementally so memory stays bounded by the batch size,
+    not the file size. Undecodable NDJSON lines are yielded as RowValidationError.
+    """
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            for row_number, record in enumerate(csv.DictReader(text), start=1):
+                yield row_number, record
+        else:
+            row_number = 0
+            for line in text:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as e:
+                    record = RowValidationError(f"Invalid JSON: {e}")
+                yield row_number, record
+    finally:
+        text.detach()
+
+
+def _text(record, field, required=False):
+    value = record.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    if value in (None, ""):
+        if required:
+            raise RowValidationError(f"Missing required field '{field}'")
+        return None
+    return str(value)
+
+
+def _int(record, field, required=False, default=None):
+    value = _text(record, field, required=required)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise RowValidationError(f"Field '{field}' must be an integer, got {value!r}")
+
+
+def validate_patient(record) -> tuple:
+    """Validate a patient record (same field names as POST /api/patients)"""
+    dob = _text(record, "dob", required=True)
+    try:
+        dob = datetime.date.fromisoformat(dob)
+    except ValueError:
+        raise RowValidationError(f"Field 'dob' must be YYYY-MM-DD, got {dob!r}")
+    return (
+        _text(record, "first_name", required=True),
+        _text(record, "last_name", required=True),
+        dob,
+        _text(record, "gender"),
+        _text(record, "address"),
+        _text(record, "phone"),
+        _text(record, "email"),
+        _text(record, "insurance_provider"),
+        _text(record, "insurance_number"),
+    )
+
+
+def validate_visit(record) -> tuple:
+    """Validate a visit record (same field names as POST /api/visits)"""
+    visit_date = _text(record, "visit_date", required=True)
+    try:
+        visit_date = datetime.datetime.fromisoformat(visit_date)
+    except ValueError:
+        raise RowValidationError(f"Field 'visit_date' must be an ISO date/time, got {visit_date!r}")
+    return (
+        _int(record, "patient_id", required=True),
+        _int(record, "provider_id", default=1),
+        visit_date,
+        _text(record, "visit_type", required=True),
+        _text(record, "status", required=True),
+        _text(record, "reason_for_visit", required=True),
+    )
+
+
+class BulkImporter:
+    """Validates streamed rows and inserts them in batches, one transaction per batch"""
+
+    ENTITIES = {
+        "patients": (validate_patient, "insert_patients_batch"),
+        "visits": (validate_visit, "insert_visits_batch"),
+    }
+
+    def __init__(self, database_service, batch_size=DEFAULT_BATCH_SIZE):
+        self.db = database_service
+        self.batch_size = max(1, min(int(batch_size), MAX_BATCH_SIZE))
+
+    async def run(self, entity, records) -> dict:
+        """
+        Import an iterable of (row_number, record) pairs.
+
+        The iterable is consumed in a worker thread one batch at a time, so a
+        blocking file read never stalls the event loop.
+        """
+        if entity not in self.ENTITIES:
+            raise ValueError(f"Unknown import entity: {entity}")
+        validate, insert_method = self.ENTITIES[entity]
+        insert = getattr(self.db, insert_method)
+
+        iterator = iter(records)
+        ids, errors = [], []
+        total = 0
+        started = time.perf_counter()
+
+        while True:
+            batch = await asyncio.to_thread(self._next_batch, iterator)
+            if not batch:
+                break
+            total += len(batch)
+
+            valid = []
+            for row_number, record in batch:
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    valid.append((row_number, validate(record)))
+                except RowValidationError as e:
+                    errors.append({"row": row_number, "error": str(e)})
+
+            if valid:
+                await self._insert_valid(insert, valid, ids, errors)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "entity": entity,
+            "rows": total,
+            "inserted": len(ids),
+            "failed": len(errors),
+            "ids": ids,
+            "errors": sorted(errors, key=lambda error: error["row"]),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(len(ids) / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    def _next_batch(self, iterator):
+        batch = []
+        for item in iterator:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+        return batch
+
+    async def _insert_valid(self, insert, valid, ids, errors):
+        try:
+            async with self.db.transaction() as conn:
+                new_ids = await insert(conn, [values for _, values in valid])
+        except Exception as e:
+            log.warning("Bulk import batch failed, retrying row by row", rows=len(valid), error=str(e))
+        else:
+            ids.extend({"row": row_number, "id": new_id}
+                       for (row_number, _), new_id in zip(valid, new_ids))
+            return
+
+        # The batch was rolled back; insert rows individually to find the bad ones
+        for row_number, values in valid:
+            try:
+                async with self.db.transaction() as conn:
+                    (new_id,) = await insert(conn, [values])
+                ids.append({"row": row_number, "id": new_id})
+            except Exception as e:
+                errors.append({"row": row_number, "error": str(e)})
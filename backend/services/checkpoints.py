@@ -0,0 +1,82 @@
+import contextvars
+
+# Stages in the order a documentation run completes them
+TRANSCRIPT = "transcript"
+SOAP_NOTE = "soap_note"
+VERIFICATION = "verification"
+
+# The agent whose finished turn completes each stage
+STAGE_AGENTS = {
+    TRANSCRIPT: "TranscriptionAgent",
+    SOAP_NOTE: "DocumentationAgent",
+    VERIFICATION: "VerificationAgent",
+}
+
+_current = contextvars.ContextVar("conversation_checkpoint", default=None)
+
+
+class ConversationCheckpoint:
+    """
+    Outputs of the stages a documentation run has already finished.
+
+    AgentService records each agent's completed message here, and the plugins
+    record what they wrote (transcript text, saved SOAP note ID) through
+    current_checkpoint(). A retry, or a background job resumed after a restart,
+    starts from the first unfinished stage instead of replaying the whole
+    conversation. `on_change`, if given, is awaited with to_dict() after every
+    update so the state can be persisted.
+    """
+
+    def __init__(self, state=None, on_change=None):
+        state = state or {}
+        self.stages = dict(state.get("stages", {}))
+        self.responses = list(state.get("responses", []))
+        self.on_change = on_change
+
+    def done(self, stage) -> bool:
+        return stage in self.stages
+
+    def get(self, stage, key, default=None):
+        return self.stages.get(stage, {}).get(key, default)
+
+    def delivered(self, agent_name) -> bool:
+        """Whether this agent's response was already handed to the caller"""
+        return any(response["agent"] == agent_name for response in self.responses)
+
+    @property
+    def next_stage(self):
+        return next((stage for stage in STAGE_AGENTS if not self.done(stage)), None)
+
+    async def record(self, stage, **data):
+        """Mark a stage finished (merging with anything recorded for it earlier)"""
+        self.stages[stage] = {**self.stages.get(stage, {}), **data}
+        await self._changed()
+
+    async def add_response(self, response):
+        self.responses.append(response)
+        await self._changed()
+
+    def to_dict(self) -> dict:
+        return {"stages": self.stages, "responses": self.responses}
+
+    async def _changed(self):
+        if self.on_change:
+            await self.on_change(self.to_dict())
+
+
+def current_checkpoint():
+    """The checkpoint of the run executing in this context, or None"""
+    return _current.get()
+
+
+def activate(checkpoint):
+    """Make checkpoint current for this context; returns a token for deactivate()"""
+    return _current.set(checkpoint)
+
+
+def deactivate(token):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # An abandoned generator finalized from another context; nothing to restore
+        pass
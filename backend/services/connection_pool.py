@@ -0,0 +1,300 @@
+import asyncio
+import collections
+import time
+from contextlib import asynccontextmanager
+
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
+
+try:
+    import pyodbc
+except ImportError:  # SQLite-only installs have no ODBC driver manager
+    pyodbc = None
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be acquired within the acquire timeout"""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+def is_disconnect_error(exc) -> bool:
+    """Return True if the exception means the underlying connection is unusable"""
+    if pyodbc is not None and isinstance(exc, pyodbc.Error) and exc.args:
+        # SQLSTATE class 08 is "connection exception"; 01002 is a disconnect warning
+        sqlstate = str(exc.args[0])
+        return sqlstate.startswith("08") or sqlstate == "01002"
+    return isinstance(exc, (ConnectionError, OSError))
+
+
+class ConnectionPool:
+    """
+    A managed pool of aioodbc connections.
+
+    Connections are handed out LIFO so the hottest ones stay warm, are checked
+    with a cheap ping after sitting idle, recycled after `recycle` seconds and
+    trimmed back to `min_size` once they have been idle for `max_idle` seconds.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, acquire_timeout=10.0,
+                 recycle=1800.0, max_idle=300.0, ping_after=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.recycle = recycle
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+
+        self._idle = collections.deque()
+        self._size = 0  # open connections plus ones being created
+        self._in_use = 0
+        self._waiting = 0
+        self._cond = asyncio.Condition()
+        self._closed = True
+        self._reaper = None
+
+        self._acquired = 0
+        self._created = 0
+        self._closed_count = 0
+        self._broken = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+
+    @property
+    def closed(self):
+        return self._closed
+
+    async def open(self):
+        """Open the pool and warm it up to min_size connections"""
+        if not self._closed:
+            return
+        self._closed = False
+        self._size += self.min_size
+        results = await asyncio.gather(
+            *(self._connect() for _ in range(self.min_size)), return_exceptions=True
+        )
+        async with self._cond:
+            for result in results:
+                if isinstance(result, BaseException):
+                    self._size -= 1
+                    log.warning("Connection pool warm-up failed", error=str(result))
+                else:
+                    self._idle.append(result)
+            self._cond.notify_all()
+        self._reaper = asyncio.create_task(self._reap_forever())
+
+    async def close(self):
+        """Close all idle connections and stop handing out new ones"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._reaper:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        async with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        await asyncio.gather(*(self._close_conn(pc) for pc in idle))
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a connection, returning it (or discarding it if broken) afterwards"""
+        pc = await self._acquire()
+        broken = False
+        try:
+            yield pc.conn
+        except BaseException as e:
+            broken = is_disconnect_error(e)
+            raise
+        finally:
+            await self._release(pc, broken)
+
+    def stats(self) -> dict:
+        """Snapshot of the pool counters"""
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "acquired_total": self._acquired,
+            "created_total": self._created,
+            "closed_total": self._closed_count,
+            "broken_total": self._broken,
+            "timeouts_total": self._timeouts,
+            "avg_wait_ms": round(self._wait_time / self._acquired * 1000, 3) if self._acquired else 0.0,
+        }
+
+    async def _acquire(self):
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.acquire_timeout
+
+        while True:
+            pc = None
+            async with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    stale = []
+                    while self._idle:
+                        candidate = self._idle.pop()
+                        if self._is_expired(candidate):
+                            stale.append(candidate)
+                            self._size -= 1
+                            continue
+                        pc = candidate
+                        break
+                    if stale:
+                        asyncio.create_task(self._close_many(stale))
+                    if pc is not None or self._size < self.max_size:
+                        break
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+                        )
+                    self._waiting += 1
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    finally:
+                        self._waiting -= 1
+                if pc is None:
+                    self._size += 1
+
+            if pc is None:
+                try:
+                    pc = await self._connect()
+                except BaseException:
+                    async with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif time.monotonic() - pc.last_used > self.ping_after and not await self._ping(pc):
+                await self._discard(pc)
+                continue
+
+            self._in_use += 1
+            self._acquired += 1
+            self._wait_time += loop.time() - started
+            return pc
+
+    async def _release(self, pc, broken=False):
+        self._in_use -= 1
+        if not broken and not pc.conn.closed:
+            try:
+                if not pc.conn.autocommit:
+                    # A caller left a transaction open; never hand it to the next borrower
+                    await pc.conn.rollback()
+                    pc.conn.autocommit = True
+            except Exception:
+                broken = True
+        if broken or pc.conn.closed or self._closed:
+            if broken:
+                self._broken += 1
+            await self._discard(pc)
+            return
+        pc.last_used = time.monotonic()
+        async with self._cond:
+            self._idle.append(pc)
+            self._cond.notify()
+
+    async def _connect(self):
+        import aioodbc
+
+        conn = await aioodbc.connect(dsn=self.dsn, autocommit=True)
+        self._created += 1
+        return _PooledConnection(conn)
+
+    async def _ping(self, pc):
+        try:
+            async with pc.conn.cursor() as cursor:
+                await cursor.execute("SELECT 1")
+                await cursor.fetchone()
+            return True
+        except Exception as e:
+            log.warning("Discarding dead pooled connection", error=str(e))
+            self._broken += 1
+            return False
+
+    def _is_expired(self, pc):
+        return pc.conn.closed or (self.recycle and time.monotonic() - pc.created_at > self.recycle)
+
+    async def _discard(self, pc):
+        async with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        await self._close_conn(pc)
+
+    async def _close_conn(self, pc):
+        try:
+            await pc.conn.close()
+        except Exception as e:
+            log.warning("Error closing pooled connection", error=str(e))
+        self._closed_count += 1
+
+    async def _close_many(self, pcs):
+        await asyncio.gather(*(self._close_conn(pc) for pc in pcs))
+
+    async def _reap_forever(self):
+        interval = max(1.0, min(self.max_idle, self.ping_after, 30.0))
+        while not self._closed:
+            await asyncio.sleep(interval)
+            try:
+                await self._reap()
+            except Exception as e:
+                log.warning("Connection pool maintenance failed", error=str(e))
+
+    async def _reap(self):
+        """Drop expired or long-idle connections and top the pool back up to min_size"""
+        now = time.monotonic()
+        async with self._cond:
+            keep, drop = collections.deque(), []
+            # Oldest idle connections sit at the left of the deque
+            for pc in self._idle:
+                surplus = self._size - len(drop) > self.min_size
+                if self._is_expired(pc) or (surplus and now - pc.last_used > self.max_idle):
+                    drop.append(pc)
+                else:
+                    keep.append(pc)
+            self._idle = keep
+            self._size -= len(drop)
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+        await self._close_many(drop)
+
+        for _ in range(missing):
+            try:
+                pc = await self._connect()
+            except Exception as e:
+                log.warning("Connection pool refill failed", error=str(e))
+                async with self._cond:
+                    self._size -= 1
+                continue
+            async with self._cond:
+                self._idle.appendleft(pc)
+                self._cond.notify()
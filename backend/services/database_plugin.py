@@ -1,4 +1,5 @@
 from semantic_kernel.functions import kernel_function
+from services.checkpoints import SOAP_NOTE, TRANSCRIPT, current_checkpoint
 from services.database_service import DatabaseService
 
 class DatabasePlugin:
@@ -10,6 +11,9 @@ class DatabasePlugin:
         """Saves a transcript to the database"""
         try:
             result = await self.db_service.save_transcript(visit_id, transcript_text)
+            checkpoint = current_checkpoint()
+            if checkpoint:
+                await checkpoint.record(TRANSCRIPT, text=transcript_text, transcript_id=result)
             return f"Transcript saved successfully with ID: {result}"
         except Exception as e:
             return f"Error saving transcript: {str(e)}"
@@ -17,8 +21,17 @@ class DatabasePlugin:
     @kernel_function(description="Saves a SOAP note to the database")
     async def save_soap_note(self, visit_id: str, subjective: str, objective: str, assessment: str, treatment_plan: str) -> str:
         """Saves a SOAP note to the database"""
+        checkpoint = current_checkpoint()
+        if checkpoint and checkpoint.get(SOAP_NOTE, "note_id"):
+            # A resumed run already saved this visit's note; don't insert a second one
+            return f"SOAP note saved successfully with ID: {checkpoint.get(SOAP_NOTE, 'note_id')}"
         try:
             result = await self.db_service.save_soap_note(visit_id, subjective, objective, assessment, treatment_plan)
+            if checkpoint:
+                await checkpoint.record(SOAP_NOTE, note_id=result, sections={
+                    "subjective": subjective, "objective": objective,
+                    "assessment": assessment, "treatment_plan": treatment_plan,
+                })
             return f"SOAP note saved successfully with ID: {result}"
         except Exception as e:
             return f"Error saving SOAP note: {str(e)}"
\ No newline at end of file
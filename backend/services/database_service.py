@@ -1,10 +1,16 @@
-import aioodbc
 import os
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import datetime
 import asyncio
 
+from services.db_backends import create_backend
+from services.db_schema import schema_statements
+from services.etag_cache import ETagCache
+from services.metrics import DB_QUERY_ERRORS, DB_QUERY_SECONDS, timed
+from services.pagination import clamp_page_size, decode_cursor, encode_cursor, like_prefix
+from services.row_mapping import fetch_all, fetch_one
+
 class DatabaseService:
     _instance = None
     current_organization_id = 1
@@ -21,50 +27,131 @@ class DatabaseService:
 
     def initialize(self):
 
-        """Initialize database connection pool"""
+        """Initialize the database backend (SQL Server or SQLite, see DB_BACKEND)"""
         load_dotenv()
         self.connection_string = (
         os.getenv('AZURE_SQL_CONNECTIONSTRING')
     )
-        # In a production app, you would set up connection pooling here
+        self.backend = create_backend(self.connection_string)
+        # Read routes answer conditional GETs from here; every write below invalidates what it changes
+        self.etags = ETagCache.get_instance()
+
+    async def open(self):
+        """Open the backend's connection pool (called from the application lifespan)"""
+        if not self.backend.closed:
+            return
+        await self.backend.open()
+        if self.backend.bootstrap:
+            await self.create_schema()
+
+    async def close(self):
+        """Close the connection pool"""
+        await self.backend.close()
+
+    async def create_schema(self):
+        """Create any missing tables and indexes"""
+        async with self.backend.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for statement in schema_statements(self.backend):
+                    await cursor.execute(statement)
+
+    def pool_stats(self) -> dict:
+        """Return connection pool statistics"""
+        return self.backend.stats()
 
     @asynccontextmanager
     async def get_connection(self):
         """Get a database connection from the pool"""
-        dsn = self.connection_string
-        conn = await aioodbc.connect(dsn=dsn, autocommit=True)
-        try:
+        if self.backend.closed:
+            # Used outside the FastAPI lifespan (scripts, plugins in isolation)
+            await self.open()
+        async with self.backend.acquire() as conn:
             yield conn
-        finally:
-            await conn.close()
 
+    @asynccontextmanager
+    async def transaction(self):
+        """Borrow a connection with autocommit off; commit on success, roll back on error"""
+        async with self.get_connection() as conn:
+            conn.autocommit = False
+            try:
+                yield conn
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def get_all_patients(self) -> list[dict]:
         """Get all patients from the database"""
         async with self.get_connection() as conn:
-            print("conn is:", type(conn))
             async with conn.cursor() as cursor:
-                print("cursor is:", type(cursor))
-                await cursor.execute("SELECT PatientID, FirstName, LastName, DOB FROM Patients")
-                columns = [col[0] for col in cursor.description]
-                rows = await cursor.fetchall()
-                return [dict(zip(columns, row)) for row in rows]
+                query = "SELECT PatientID, FirstName, LastName, DOB FROM Patients"
+                await cursor.execute(query)
+                return await fetch_all(cursor)
+
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
+    async def get_counts(self) -> dict:
+        """Totals for the dashboard: patients, visits, and visits by status"""
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT COUNT(*) FROM Patients")
+                patients = (await cursor.fetchone())[0]
+                await cursor.execute("SELECT Status, COUNT(*) FROM Visits GROUP BY Status")
+                by_status = {status: count for status, count in await cursor.fetchall()}
+        return {"patients": patients, "visits": sum(by_status.values()), "visits_by_status": by_status}
 
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
+    async def list_patients(self, limit=None, cursor=None, name_prefix=None):
+        """
+        Get one page of patients ordered by PatientID.
+
+        Returns (patients, next_cursor); next_cursor is None on the last page.
+        """
+        page_size = clamp_page_size(limit)
+        conditions, params = [], []
+        if cursor:
+            position = decode_cursor(cursor, "id")
+            conditions.append("PatientID > ?")
+            params.append(position["id"])
+        if name_prefix:
+            pattern = like_prefix(name_prefix)
+            conditions.append("(LastName LIKE ? ESCAPE '\\' OR FirstName LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+
+        query = "SELECT PatientID, FirstName, LastName, DOB FROM Patients"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY PatientID"
+        query, params = self.backend.limit(query, params, page_size + 1)
+
+        async with self.get_connection() as conn:
+            async with conn.cursor() as db_cursor:
+                await db_cursor.execute(query, params)
+                rows = await fetch_all(db_cursor)
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(id=rows[-1]["PatientID"])
+        return rows, next_cursor
+
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def get_patient(self, patient_id):
         """Get patient information by ID"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
                 query = "SELECT * FROM Patients WHERE PatientID = ?"
                 await cursor.execute(query, (patient_id,))
-                result = await cursor.fetchone()
-                if result:
-                    return dict(zip([column[0] for column in cursor.description], result))
-                return None
+                return await fetch_one(cursor)
    
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def update_visit(self, visit_id, patient_id, provider_id, visit_date, visit_type, status, reason):
         """Update a visit in the database"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                query = """
+                query = f"""
                 UPDATE Visits 
                 SET PatientID = ?, 
                     ProviderID = ?,
@@ -72,7 +159,7 @@ class DatabaseService:
                     VisitType = ?, 
                     Status = ?, 
                     Reason = ?,
-                    UpdatedDate = GETDATE()
+                    UpdatedDate = {self.backend.now}
                 WHERE VisitID = ?
                 """
                 await cursor.execute(query, (
@@ -84,18 +171,18 @@ class DatabaseService:
                     reason,
                     visit_id
                 ))
+        self.etags.invalidate("visit", visit_id)
             
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def get_provider(self, provider_id):
         """Get provider information by ID"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
                 query = "SELECT * FROM Providers WHERE ProviderID = ?"
                 await cursor.execute(query, (provider_id,))
-                result = await cursor.fetchone()
-                if result:
-                    return dict(zip([column[0] for column in cursor.description], result))
-                return None
+                return await fetch_one(cursor)
 
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def get_active_visits(self, provider_id=None):
         """Get list of active visits (with optional provider filter)"""
         async with self.get_connection() as conn:
@@ -115,9 +202,8 @@ class DatabaseService:
                     """
                     await cursor.execute(query)
 
-                columns = [column[0] for column in cursor.description]
-                rows = await cursor.fetchall()
-                return [dict(zip(columns, row)) for row in rows]
+                return await fetch_all(cursor)
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def get_all_visits(self):
         """Get all visits with patient information"""
         async with self.get_connection() as conn:
@@ -128,10 +214,68 @@ class DatabaseService:
                 ORDER BY v.VisitDate DESC
                 """
                 await cursor.execute(query)
-                columns = [column[0] for column in cursor.description]
-                rows = await cursor.fetchall()
-                return [dict(zip(columns, row)) for row in rows]
+                return await fetch_all(cursor)
         
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
+    async def list_visits(self, limit=None, cursor=None, date_from=None, date_to=None,
+                          status=None, provider_id=None, name_prefix=None):
+        """
+        Get one page of visits with patient names, newest first.
+
+        Pages are keyed on (VisitDate, VisitID) so every page costs the same
+        regardless of table size. A plain date for date_to includes that whole day.
+        Returns (visits, next_cursor); next_cursor is None on the last page.
+        """
+        page_size = clamp_page_size(limit)
+        conditions, params = [], []
+        if cursor:
+            position = decode_cursor(cursor, "date", "id")
+            last_date = position["date"]
+            conditions.append("(v.VisitDate < ? OR (v.VisitDate = ? AND v.VisitID < ?))")
+            params.extend([last_date, last_date, position["id"]])
+        if date_from:
+            conditions.append("v.VisitDate >= ?")
+            params.append(date_from)
+        if date_to:
+            if isinstance(date_to, datetime.datetime):
+                conditions.append("v.VisitDate <= ?")
+                params.append(date_to)
+            else:
+                conditions.append("v.VisitDate < ?")
+                params.append(date_to + datetime.timedelta(days=1))
+        if status:
+            conditions.append("v.Status = ?")
+            params.append(status)
+        if provider_id:
+            conditions.append("v.ProviderID = ?")
+            params.append(provider_id)
+        if name_prefix:
+            pattern = like_prefix(name_prefix)
+            conditions.append("(p.LastName LIKE ? ESCAPE '\\' OR p.FirstName LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+
+        query = """
+        SELECT v.*, p.FirstName, p.LastName 
+        FROM Visits v JOIN Patients p ON v.PatientID = p.PatientID 
+        """
+        if conditions:
+            query += "WHERE " + " AND ".join(conditions)
+        query += " ORDER BY v.VisitDate DESC, v.VisitID DESC"
+        query, params = self.backend.limit(query, params, page_size + 1)
+
+        async with self.get_connection() as conn:
+            async with conn.cursor() as db_cursor:
+                await db_cursor.execute(query, params)
+                rows = await fetch_all(db_cursor)
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor(date=last["VisitDate"], id=last["VisitID"])
+        return rows, next_cursor
+
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def get_visit(self, visit_id):
         """Get a single visit by ID, regardless of status"""
         async with self.get_connection() as conn:
@@ -142,135 +286,168 @@ class DatabaseService:
                 WHERE v.VisitID = ?
                 """
                 await cursor.execute(query, (visit_id,))
-                result = await cursor.fetchone()
-                
-                if result:
-                    return dict(zip([column[0] for column in cursor.description], result))
-                return None
+                return await fetch_one(cursor)
             
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def create_visit(self, patient_id, provider_id, visit_date, visit_type, status, reason):
         """Create a new visit in the database"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                # First, execute the INSERT
-                insert_query = """
-                INSERT INTO Visits (PatientID, ProviderID, VisitDate, VisitType, Status, Reason,
-                                CreatedDate, UpdatedDate)
-                VALUES (?, ?, ?, ?, ?, ?, GETDATE(), GETDATE());
-                """
+                # The backend returns the new identity in the same round trip
+                # (OUTPUT INSERTED on SQL Server, RETURNING on SQLite)
+                now = self.backend.now
+                insert_query = self.backend.insert_returning(
+                    "Visits", "VisitID",
+                    "PatientID, ProviderID, VisitDate, VisitType, Status, Reason, CreatedDate, UpdatedDate",
+                    f"?, ?, ?, ?, ?, ?, {now}, {now}",
+                )
                 await cursor.execute(insert_query, (patient_id, provider_id, visit_date, 
                                     visit_type, status, reason))
-                
-                # Then query for the most recently created visit for this patient
-                get_id_query = """
-                SELECT TOP 1 VisitID FROM Visits 
-                WHERE PatientID = ? 
-                ORDER BY CreatedDate DESC
-                """
-                await cursor.execute(get_id_query, (patient_id,))
                 result = await cursor.fetchone()
-                print(f"Query returned most recent visit ID: {result}")
-                if result:
-                    return result[0]
-                else:
-                    print("WARNING: Could not retrieve visit ID")
-                    return None
+                return result[0]
     
     
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def create_patient(self, first_name, last_name, dob, gender=None, address=None, phone=None, 
                         email=None, insurance_provider=None, insurance_number=None):
         """Create a new patient in the database"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                # First, execute only the INSERT statement
-                insert_query = """
-                INSERT INTO Patients (FirstName, LastName, DOB, Gender, Address, Phone, Email, 
-                                InsuranceProvider, InsuranceNumber, CreatedDate, UpdatedDate)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, GETDATE(), GETDATE());
-                """
+                now = self.backend.now
+                insert_query = self.backend.insert_returning(
+                    "Patients", "PatientID",
+                    "FirstName, LastName, DOB, Gender, Address, Phone, Email, "
+                    "InsuranceProvider, InsuranceNumber, CreatedDate, UpdatedDate",
+                    f"?, ?, ?, ?, ?, ?, ?, ?, ?, {now}, {now}",
+                )
                 await cursor.execute(insert_query, (first_name, last_name, dob, gender, address, phone, 
                                         email, insurance_provider, insurance_number))
-                
-                # Then, as a separate step, get the ID of the inserted record
-                await cursor.execute("SELECT SCOPE_IDENTITY()")
                 result = await cursor.fetchone()
                 return result[0]
 
 
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def get_transcript_for_visit(self, visit_id):
         """Get the most recent transcript for a specific visit"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                query = """
-                SELECT TOP 1 TranscriptID, VisitID, TranscriptText, RecordedDate
+                query, params = self.backend.limit("""
+                SELECT TranscriptID, VisitID, TranscriptText, RecordedDate
                 FROM Transcripts
                 WHERE VisitID = ?
                 ORDER BY RecordedDate DESC
-                """
-                await cursor.execute(query, (visit_id,))
-                result = await cursor.fetchone()
-                
-                if result:
-                    columns = [column[0] for column in cursor.description]
-                    return dict(zip(columns, result))
-                return None
+                """, [visit_id], 1)
+                await cursor.execute(query, params)
+                return await fetch_one(cursor)
 
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def get_soap_note_for_visit(self, visit_id):
         """Get the most recent SOAP note for a specific visit"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                query = """
-                SELECT TOP 1 NoteID, VisitID, Subjective, Objective, Assessment, Plans
+                query, params = self.backend.limit("""
+                SELECT NoteID, VisitID, Subjective, Objective, Assessment, Plans
                 FROM SOAPNotes
                 WHERE VisitID = ?
                 ORDER BY CreatedDate DESC
-                """
-                await cursor.execute(query, (visit_id,))
-                result = await cursor.fetchone()
-                
-                if result:
-                    columns = [column[0] for column in cursor.description]
-                    return dict(zip(columns, result))
-                return None
+                """, [visit_id], 1)
+                await cursor.execute(query, params)
+                return await fetch_one(cursor)
         
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def save_transcript(self, visit_id, transcript_text):
         """Save a transcript to the database"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                # First, execute the INSERT statement
-                insert_query = """
-                INSERT INTO Transcripts (VisitID, TranscriptText, RecordedDate)
-                VALUES (?, ?, ?);
-                """
+                insert_query = self.backend.insert_returning(
+                    "Transcripts", "TranscriptID", "VisitID, TranscriptText, RecordedDate", "?, ?, ?"
+                )
                 await cursor.execute(insert_query, (visit_id, transcript_text, datetime.datetime.now()))
-                
-                # Then, get the ID of the inserted record
-                await cursor.execute("SELECT SCOPE_IDENTITY()")
                 result = await cursor.fetchone()
-                return result[0]  # Return the new transcript ID
+        self.etags.invalidate("transcript", visit_id)
+        return result[0]  # Return the new transcript ID
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def update_visit_status(self, visit_id, status):
         """Update visit status in the database"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                query = """
+                query = f"""
                 UPDATE Visits 
-                SET Status = ?, UpdatedDate = GETDATE()
+                SET Status = ?, UpdatedDate = {self.backend.now}
                 WHERE VisitID = ?
                 """
                 await cursor.execute(query, (status, visit_id))
+        self.etags.invalidate("visit", visit_id)
 
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
     async def save_soap_note(self, visit_id, subjective, objective, assessment, treatment_plan):
         """Save a SOAP note to the database"""
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                # First, execute the INSERT statement
-                insert_query = """
-                INSERT INTO SOAPNotes (VisitID, Subjective, Objective, Assessment, Plans)
-                VALUES (?, ?, ?, ?, ?);
-                """
+                insert_query = self.backend.insert_returning(
+                    "SOAPNotes", "NoteID", "VisitID, Subjective, Objective, Assessment, Plans", "?, ?, ?, ?, ?"
+                )
                 await cursor.execute(insert_query, (visit_id, subjective, objective, assessment, treatment_plan))
-                
-                # Then, get the ID of the inserted record
-                await cursor.execute("SELECT SCOPE_IDENTITY()")
                 result = await cursor.fetchone()
-                return result[0]  # Return the new note ID
+        self.etags.invalidate("soap", visit_id)
+        return result[0]  # Return the new note ID
+
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
+    async def save_documentation(self, visit_id, subjective, objective, assessment, treatment_plan,
+                                 transcript_text=None):
+        """
+        Save a visit's SOAP note, and its transcript if given, in one transaction.
+        Returns (transcript_id or None, note_id).
+        """
+        async with self.transaction() as conn:
+            async with conn.cursor() as cursor:
+                transcript_id = None
+                if transcript_text is not None:
+                    await cursor.execute(
+                        self.backend.insert_returning(
+                            "Transcripts", "TranscriptID", "VisitID, TranscriptText, RecordedDate", "?, ?, ?"
+                        ),
+                        (visit_id, transcript_text, datetime.datetime.now())
+                    )
+                    transcript_id = (await cursor.fetchone())[0]
+                await cursor.execute(
+                    self.backend.insert_returning(
+                        "SOAPNotes", "NoteID", "VisitID, Subjective, Objective, Assessment, Plans", "?, ?, ?, ?, ?"
+                    ),
+                    (visit_id, subjective, objective, assessment, treatment_plan)
+                )
+                note_id = (await cursor.fetchone())[0]
+        if transcript_id is not None:
+            self.etags.invalidate("transcript", visit_id)
+        self.etags.invalidate("soap", visit_id)
+        return transcript_id, note_id
+
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
+    async def insert_patients_batch(self, conn, rows):
+        """
+        Insert many patients on a connection inside a transaction.
+
+        rows are tuples of (first_name, last_name, dob, gender, address, phone,
+        email, insurance_provider, insurance_number). Returns the new PatientIDs
+        in the same order as rows.
+        """
+        return await self.backend.insert_batch(
+            conn, "Patients", "PatientID",
+            ["FirstName", "LastName", "DOB", "Gender", "Address", "Phone", "Email",
+             "InsuranceProvider", "InsuranceNumber"],
+            rows,
+        )
+
+    @timed(DB_QUERY_SECONDS, DB_QUERY_ERRORS)
+    async def insert_visits_batch(self, conn, rows):
+        """
+        Insert many visits on a connection inside a transaction.
+
+        rows are tuples of (patient_id, provider_id, visit_date, visit_type,
+        status, reason). Returns the new VisitIDs in the same order as rows.
+        """
+        return await self.backend.insert_batch(
+            conn, "Visits", "VisitID",
+            ["PatientID", "ProviderID", "VisitDate", "VisitType", "Status", "Reason"],
+            rows,
+        )
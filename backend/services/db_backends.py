@@ -0,0 +1,212 @@
+import abc
+import os
+import re
+
+from services.connection_pool import ConnectionPool
+
+_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+class DatabaseBackend(abc.ABC):
+    """
+    A database engine behind DatabaseService: its connection pool plus the
+    SQL that differs between engines. Everything else DatabaseService runs is
+    written in the subset both engines accept, with ? placeholders. A backend
+    missing any of the abstract methods fails when it is created.
+    """
+    name = None
+    # Portable column types used by services.db_schema
+    TYPES = {}
+    # The current local time, in a query and as a column DEFAULT
+    now = None
+    now_default = None
+
+    def __init__(self, pool, bootstrap=False):
+        self.pool = pool
+        self.bootstrap = bootstrap
+
+    @property
+    def closed(self):
+        return self.pool.closed
+
+    async def open(self):
+        await self.pool.open()
+
+    async def close(self):
+        await self.pool.close()
+
+    def acquire(self):
+        return self.pool.acquire()
+
+    def stats(self) -> dict:
+        return {"backend": self.name, **self.pool.stats()}
+
+    @abc.abstractmethod
+    def limit(self, query, params, count):
+        """Limit a SELECT to its first count rows; returns (query, params)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def insert_returning(self, table, id_column, columns, values) -> str:
+        """An INSERT that returns the new row's id_column in the same round trip"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def insert_batch(self, conn, table, id_column, columns, rows) -> list:
+        """Insert rows (stamping CreatedDate/UpdatedDate); returns their new ids in row order"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def create_table(self, table, definitions) -> str:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def create_index(self, name, table, columns) -> str:
+        raise NotImplementedError
+
+
+class SqlServerBackend(DatabaseBackend):
+    """Azure SQL / SQL Server over aioodbc"""
+    name = "sqlserver"
+    TYPES = {
+        "id": "INT IDENTITY(1,1) PRIMARY KEY",
+        "int": "INT",
+        "short": "NVARCHAR(50)",
+        "name": "NVARCHAR(100)",
+        "string": "NVARCHAR(255)",
+        "text": "NVARCHAR(MAX)",
+        "date": "DATE",
+        "datetime": "DATETIME2",
+    }
+    now = "GETDATE()"
+    now_default = "GETDATE()"
+
+    def limit(self, query, params, count):
+        return _SELECT.sub("SELECT TOP (?)", query, count=1), [count, *params]
+
+    def insert_returning(self, table, id_column, columns, values):
+        return f"INSERT INTO {table} ({columns}) OUTPUT INSERTED.{id_column} VALUES ({values});"
+
+    async def insert_batch(self, conn, table, id_column, columns, rows):
+        # SQL Server allows 2100 parameters per statement; each row also carries its ordinal
+        per_statement = max(1, 2000 // (len(columns) + 1))
+        column_list = ", ".join(columns)
+        source_list = ", ".join(f"s.{column}" for column in columns)
+        row_placeholder = "(" + ", ".join("?" for _ in range(len(columns) + 1)) + ")"
+
+        ids = [None] * len(rows)
+        async with conn.cursor() as cursor:
+            for start in range(0, len(rows), per_statement):
+                chunk = rows[start:start + per_statement]
+                # MERGE ... ON 1 = 0 is an INSERT that can OUTPUT source columns, which
+                # lets us map each generated identity back to its input row
+                query = f"""
+                MERGE INTO {table} AS t
+                USING (VALUES {", ".join(row_placeholder for _ in chunk)})
+                    AS s({column_list}, RowNum)
+                ON 1 = 0
+                WHEN NOT MATCHED THEN
+                    INSERT ({column_list}, CreatedDate, UpdatedDate)
+                    VALUES ({source_list}, GETDATE(), GETDATE())
+                OUTPUT s.RowNum, INSERTED.{id_column};
+                """
+                params = []
+                for offset, row in enumerate(chunk):
+                    params.extend(row)
+                    params.append(start + offset)
+                await cursor.execute(query, params)
+                for row_num, new_id in await cursor.fetchall():
+                    ids[row_num] = new_id
+        return ids
+
+    def create_table(self, table, definitions):
+        body = ",\n    ".join(definitions)
+        return f"IF OBJECT_ID(N'{table}', N'U') IS NULL\nCREATE TABLE {table} (\n    {body}\n);"
+
+    def create_index(self, name, table, columns):
+        return (f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = N'{name}' "
+                f"AND object_id = OBJECT_ID(N'{table}'))\nCREATE INDEX {name} ON {table} ({columns});")
+
+
+class SqliteBackend(DatabaseBackend):
+    """An embedded SQLite database file in WAL mode, for single-site clinics"""
+    name = "sqlite"
+    TYPES = {
+        "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "int": "INTEGER",
+        "short": "TEXT",
+        "name": "TEXT",
+        "string": "TEXT",
+        "text": "TEXT",
+        # Declared types select the converters registered in services.sqlite_pool
+        "date": "DATE",
+        "datetime": "TIMESTAMP",
+    }
+    now = "datetime('now', 'localtime')"
+    now_default = "(datetime('now', 'localtime'))"
+    # SQLite's default SQLITE_MAX_VARIABLE_NUMBER is 32766
+    MAX_PARAMETERS = 32000
+
+    def limit(self, query, params, count):
+        return f"{query.rstrip().rstrip(';')} LIMIT ?", [*params, count]
+
+    def insert_returning(self, table, id_column, columns, values):
+        return f"INSERT INTO {table} ({columns}) VALUES ({values}) RETURNING {id_column};"
+
+    async def insert_batch(self, conn, table, id_column, columns, rows):
+        per_statement = max(1, self.MAX_PARAMETERS // len(columns))
+        row_placeholder = "(" + ", ".join(["?"] * len(columns) + [self.now, self.now]) + ")"
+
+        ids = []
+        async with conn.cursor() as cursor:
+            for start in range(0, len(rows), per_statement):
+                chunk = rows[start:start + per_statement]
+                query = (f"INSERT INTO {table} ({', '.join(columns)}, CreatedDate, UpdatedDate) "
+                         f"VALUES {', '.join(row_placeholder for _ in chunk)} RETURNING {id_column}")
+                params = [value for row in chunk for value in row]
+                await cursor.execute(query, params)
+                # RETURNING rows come back in no guaranteed order, but AUTOINCREMENT ids
+                # rise in VALUES order, so sorting them maps each id to its row
+                ids.extend(sorted(new_id for (new_id,) in await cursor.fetchall()))
+        return ids
+
+    def create_table(self, table, definitions):
+        body = ",\n    ".join(definitions)
+        return f"CREATE TABLE IF NOT EXISTS {table} (\n    {body}\n);"
+
+    def create_index(self, name, table, columns):
+        return f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns});"
+
+
+BACKENDS = {backend.name: backend for backend in (SqlServerBackend, SqliteBackend)}
+
+
+def create_backend(connection_string=None):
+    """
+    Build the backend selected by DB_BACKEND ("sqlserver", the default, or
+    "sqlite"), with its pool sized from the DB_POOL_* settings.
+    """
+    name = os.getenv("DB_BACKEND", SqlServerBackend.name).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    pool_options = dict(
+        min_size=int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        acquire_timeout=float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10")),
+        recycle=float(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+        max_idle=float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300")),
+        ping_after=float(os.getenv("DB_POOL_PING_AFTER_SECONDS", "30")),
+    )
+    # An embedded database starts empty, so it creates its schema by default
+    bootstrap = os.getenv("DB_BOOTSTRAP_SCHEMA", "true" if name == SqliteBackend.name else "false").lower() == "true"
+
+    if name == SqliteBackend.name:
+        from services.sqlite_pool import SqlitePool
+
+        pool = SqlitePool(
+            os.getenv("SQLITE_DATABASE_PATH", os.path.join("data", "medscribeai.sqlite3")),
+            busy_timeout=float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "5")),
+            **pool_options,
+        )
+        return SqliteBackend(pool, bootstrap=bootstrap)
+    return SqlServerBackend(ConnectionPool(connection_string, **pool_options), bootstrap=bootstrap)
@@ -0,0 +1,78 @@
+"""
+The application schema, declared once and rendered by each database backend.
+
+Column types are portable names that each backend maps to its own (see
+DatabaseBackend.TYPES), and "{now}" in a column's constraints becomes the
+backend's current-time default. Statements only create what is missing, so
+bootstrapping an existing database is a no-op.
+"""
+
+TABLES = {
+    "Patients": [
+        ("PatientID", "id", ""),
+        ("FirstName", "name", "NOT NULL"),
+        ("LastName", "name", "NOT NULL"),
+        ("DOB", "date", ""),
+        ("Gender", "short", ""),
+        ("Address", "string", ""),
+        ("Phone", "short", ""),
+        ("Email", "string", ""),
+        ("InsuranceProvider", "string", ""),
+        ("InsuranceNumber", "short", ""),
+        ("CreatedDate", "datetime", "DEFAULT {now}"),
+        ("UpdatedDate", "datetime", "DEFAULT {now}"),
+    ],
+    "Providers": [
+        ("ProviderID", "id", ""),
+        ("FirstName", "name", ""),
+        ("LastName", "name", ""),
+        ("Specialty", "string", ""),
+        ("Email", "string", ""),
+    ],
+    "Visits": [
+        ("VisitID", "id", ""),
+        ("PatientID", "int", "NOT NULL REFERENCES Patients(PatientID)"),
+        ("ProviderID", "int", "REFERENCES Providers(ProviderID)"),
+        ("VisitDate", "datetime", ""),
+        ("VisitType", "short", ""),
+        ("Status", "short", ""),
+        ("Reason", "text", ""),
+        ("CreatedDate", "datetime", "DEFAULT {now}"),
+        ("UpdatedDate", "datetime", "DEFAULT {now}"),
+    ],
+    "Transcripts": [
+        ("TranscriptID", "id", ""),
+        ("VisitID", "int", "NOT NULL REFERENCES Visits(VisitID)"),
+        ("TranscriptText", "text", ""),
+        ("RecordedDate", "datetime", "DEFAULT {now}"),
+    ],
+    "SOAPNotes": [
+        ("NoteID", "id", ""),
+        ("VisitID", "int", "NOT NULL REFERENCES Visits(VisitID)"),
+        ("Subjective", "text", ""),
+        ("Objective", "text", ""),
+        ("Assessment", "text", ""),
+        ("Plans", "text", ""),
+        ("CreatedDate", "datetime", "DEFAULT {now}"),
+    ],
+}
+
+# Supports the keyset-paginated visit list and the latest-transcript/note lookups
+INDEXES = [
+    ("IX_Visits_VisitDate", "Visits", "VisitDate DESC, VisitID DESC"),
+    ("IX_Transcripts_VisitID", "Transcripts", "VisitID, RecordedDate"),
+    ("IX_SOAPNotes_VisitID", "SOAPNotes", "VisitID, CreatedDate"),
+]
+
+
+def schema_statements(backend) -> list[str]:
+    """CREATE statements for every table and index, in the backend's dialect"""
+    statements = []
+    for table, columns in TABLES.items():
+        definitions = [
+            " ".join(part for part in (name, backend.TYPES[kind], constraints.format(now=backend.now_default)) if part)
+            for name, kind, constraints in columns
+        ]
+        statements.append(backend.create_table(table, definitions))
+    statements += [backend.create_index(name, table, columns) for name, table, columns in INDEXES]
+    return statements
@@ -0,0 +1,131 @@
+import collections
+import hashlib
+import os
+import time
+
+from fastapi.responses import Response
+
+from services.fast_json import dumps
+
+# Revalidate on every use, and keep PHI out of shared caches
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag for a serialized representation"""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag) -> bool:
+    """If-None-Match comparison: weak, against a list of tags or "*\""""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ETagCache:
+    """
+    The current ETag of each cacheable resource, keyed by (kind, id), e.g.
+    ("visit", 42) or ("soap", 42) for visit 42's latest SOAP note.
+
+    A conditional GET whose If-None-Match matches the cached ETag is answered
+    with 304 without touching the database. DatabaseService invalidates a
+    resource whenever it writes it. Entries also expire after `ttl` seconds,
+    which bounds how long a write made outside this process (another worker,
+    import_data.py) can go unnoticed.
+    """
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = ETagCache(
+                max_entries=int(os.getenv("ETAG_CACHE_MAX_ENTRIES", "10000")),
+                ttl=float(os.getenv("ETAG_CACHE_TTL_SECONDS", "60")),
+                enabled=os.getenv("ETAG_CACHE_ENABLED", "true").lower() != "false",
+            )
+        return cls._instance
+
+    def __init__(self, max_entries=10000, ttl=60.0, enabled=True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = collections.OrderedDict()  # (kind, id) -> (etag, stored_at)
+        # Bumped by every invalidation, so a read that raced a write can't store a stale ETag
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, kind, key):
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            return None
+        etag, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[(kind, key)]
+            return None
+        self._entries.move_to_end((kind, key))
+        return etag
+
+    def generation(self) -> int:
+        """Taken before reading a resource; pass it to put() with the result"""
+        return self._generation
+
+    def put(self, kind, key, etag, generation):
+        if not self.enabled or generation != self._generation:
+            return
+        self._entries[(kind, key)] = (etag, time.monotonic())
+        self._entries.move_to_end((kind, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, kind, key):
+        self._generation += 1
+        self.invalidations += 1
+        self._entries.pop((kind, key), None)
+
+    async def respond(self, request, kind, key, load):
+        """
+        Answer a GET for one resource: 304 if the client's If-None-Match is
+        current, otherwise the JSON from load() with its ETag. Returns None,
+        for the caller to turn into a 404, when load() finds nothing.
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self.enabled:
+            etag = self.get(kind, key)
+            if etag is not None and etag_matches(if_none_match, etag):
+                self.hits += 1
+                self.not_modified += 1
+                return self._not_modified(etag)
+
+        self.misses += 1
+        generation = self.generation()
+        content = await load()
+        if content is None:
+            return None
+        body = dumps(content)
+        etag = etag_for(body)
+        self.put(kind, key, etag, generation)
+        if if_none_match and etag_matches(if_none_match, etag):
+            # Unchanged, but evicted or expired here: still spare the client the body
+            self.not_modified += 1
+            return self._not_modified(etag)
+        return Response(body, media_type="application/json", headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+    def _not_modified(self, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from services.uploads import remove_file
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join("data", "documentation_jobs.sqlite3"))
+JOB_AUDIO_DIR = os.getenv("JOB_AUDIO_DIR", os.path.join("data", "job_audio"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documentation_jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    visit_id INTEGER NOT NULL,
+    thread_id TEXT,
+    audio_path TEXT,
+    transcript TEXT,
+    pipeline TEXT,
+    instructions TEXT,
+    checkpoint TEXT,
+    progress TEXT NOT NULL DEFAULT '[]',
+    responses TEXT NOT NULL DEFAULT '[]',
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_documentation_jobs_status ON documentation_jobs (status, created_at);
+"""
+
+# Columns added after the first release: name -> type
+_ADDED_COLUMNS = {"pipeline": "TEXT", "instructions": "TEXT", "checkpoint": "TEXT"}
+
+
+class JobStore:
+    """SQLite persistence for documentation jobs; every call runs in a worker thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+        return self._conn
+
+    def _migrate(self):
+        # Stores created before a column existed get it added in place
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(documentation_jobs)")}
+        for name, column_type in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE documentation_jobs ADD COLUMN {name} {column_type}")
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            return self._connect().execute(query, params).fetchall()
+
+    async def execute(self, query, params=()):
+        return await asyncio.to_thread(self._execute, query, params)
+
+    async def close(self):
+        def _close():
+            with self._lock:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+        await asyncio.to_thread(_close)
+
+
+class DocumentationJobQueue:
+    """
+    Runs AgentService.process_conversation in the background.
+
+    Jobs are persisted before they are acknowledged, so anything queued or
+    interrupted mid-run is picked up again when the server restarts. A fixed
+    pool of worker tasks bounds how many agent conversations run at once.
+    """
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = DocumentationJobQueue(
+                JobStore(JOB_STORE_PATH),
+                workers=int(os.getenv("JOB_WORKERS", "2")),
+                max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+                retention=float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600))),
+            )
+        return cls._instance
+
+    def __init__(self, store, workers=2, max_attempts=3, retention=7 * 24 * 3600):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._queue = asyncio.Queue()
+        self._tasks = []
+        self._handler = None
+
+    async def start(self, handler):
+        """Start the worker pool and re-enqueue jobs left over from a previous run"""
+        self._handler = handler
+        await self.store.execute(
+            "DELETE FROM documentation_jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (SUCCEEDED, FAILED, time.time() - self.retention),
+        )
+        # Jobs still marked running were interrupted by a shutdown or crash
+        await self.store.execute(
+            "UPDATE documentation_jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)
+        )
+        pending = await self.store.execute(
+            "SELECT job_id FROM documentation_jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+        )
+        for row in pending:
+            self._queue.put_nowait(row["job_id"])
+        if pending:
+            log.info("Resuming documentation jobs", jobs=len(pending))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs stay persisted and resume on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.store.close()
+
+    async def submit(self, visit_id, thread_id=None, audio_path=None, transcript=None, pipeline=None,
+                     instructions=None) -> str:
+        """Persist a new job and queue it; returns the job ID"""
+        job_id = uuid.uuid4().hex
+        await self.store.execute(
+            """
+            INSERT INTO documentation_jobs
+                (job_id, status, visit_id, thread_id, audio_path, transcript, pipeline, instructions, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (job_id, QUEUED, visit_id, thread_id, audio_path, transcript, pipeline, instructions, time.time()),
+        )
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id):
+        """Return the public view of a job, or None"""
+        rows = await self.store.execute("SELECT * FROM documentation_jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        job = rows[0]
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "visit_id": job["visit_id"],
+            "pipeline": job["pipeline"],
+            "attempts": job["attempts"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "progress": json.loads(job["progress"]),
+            "responses": json.loads(job["responses"]),
+            "error": job["error"],
+            "queue_depth": self._queue.qsize(),
+        }
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("Documentation job crashed", job_id=job_id, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        rows = await self.store.execute("SELECT * FROM documentation_jobs WHERE job_id = ?", (job_id,))
+        if not rows or rows[0]["status"] != QUEUED:
+            return
+        job = rows[0]
+        if job["attempts"] >= self.max_attempts:
+            await self._finish(job, FAILED, error=f"Gave up after {job['attempts']} interrupted attempts")
+            return
+
+        await self.store.execute(
+            """
+            UPDATE documentation_jobs
+            SET status = ?, attempts = attempts + 1, started_at = ?
+            WHERE job_id = ?
+            """,
+            (RUNNING, time.time(), job_id),
+        )
+        # An interrupted job keeps what its finished stages already produced
+        progress, responses = json.loads(job["progress"]), json.loads(job["responses"])
+        started = time.monotonic()
+
+        async def on_response(response):
+            progress.append({
+                "agent": response["agent"],
+                "elapsed_seconds": round(time.monotonic() - started, 3),
+            })
+            responses.append(response)
+            await self.store.execute(
+                "UPDATE documentation_jobs SET progress = ?, responses = ? WHERE job_id = ?",
+                (json.dumps(progress), json.dumps(responses), job_id),
+            )
+
+        async def on_checkpoint(state):
+            await self.store.execute(
+                "UPDATE documentation_jobs SET checkpoint = ? WHERE job_id = ?", (json.dumps(state), job_id)
+            )
+
+        try:
+            result = await self._handler(
+                thread_id=job["thread_id"],
+                visit_id=job["visit_id"],
+                audio_file=job["audio_path"],
+                transcript=job["transcript"],
+                on_response=on_response,
+                pipeline=job["pipeline"],
+                instructions=job["instructions"],
+                checkpoint=json.loads(job["checkpoint"]) if job["checkpoint"] else None,
+                on_checkpoint=on_checkpoint,
+            )
+        except asyncio.CancelledError:
+            # Shutting down: leave the job as running so it is resumed on restart
+            raise
+        except Exception as e:
+            await self._finish(job, FAILED, error=str(e))
+        else:
+            if result:
+                await self._finish(job, SUCCEEDED)
+            else:
+                await self._finish(job, FAILED, error="Agent conversation produced no responses")
+
+    async def _finish(self, job, status, error=None):
+        await self.store.execute(
+            "UPDATE documentation_jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+            (status, error, time.time(), job["job_id"]),
+        )
+        await remove_file(job["audio_path"])
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import time
+from array import array
+
+from services.audio_transcoder import SAMPLE_RATE, SAMPLE_WIDTH, wav_header
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
+
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH
+FRAME_BYTES = BYTES_PER_SECOND * 30 // 1000  # 30 ms analysis frames
+
+LIVE_MIN_SEGMENT_SECONDS = float(os.getenv("LIVE_MIN_SEGMENT_SECONDS", "4"))
+LIVE_MAX_SEGMENT_SECONDS = float(os.getenv("LIVE_MAX_SEGMENT_SECONDS", "30"))
+LIVE_SILENCE_MS = int(os.getenv("LIVE_SILENCE_MS", "700"))
+LIVE_SILENCE_THRESHOLD = int(os.getenv("LIVE_SILENCE_THRESHOLD", "500"))
+# Partials send each segment's audio to Whisper a second time; 0 turns them off
+LIVE_PARTIAL_INTERVAL_SECONDS = float(os.getenv("LIVE_PARTIAL_INTERVAL_SECONDS", "4"))
+LIVE_SEGMENT_FANOUT = int(os.getenv("LIVE_SEGMENT_FANOUT", "2"))
+LIVE_SEGMENT_ATTEMPTS = int(os.getenv("LIVE_SEGMENT_ATTEMPTS", "3"))
+MAX_LIVE_FRAME_BYTES = BYTES_PER_SECOND * 5  # clients should send ~100-500 ms frames
+
+
+def _loudness(pcm) -> float:
+    """Mean absolute amplitude of a s16le buffer"""
+    samples = array("h")
+    samples.frombytes(bytes(pcm[:len(pcm) - len(pcm) % SAMPLE_WIDTH]))
+    return sum(map(abs, samples)) / len(samples) if samples else 0.0
+
+
+class SegmentBuffer:
+    """
+    Fixed-capacity buffer for the segment currently being recorded.
+
+    Capacity is the maximum segment length, so a session can never hold more
+    than one segment of unsent audio regardless of how long the visit runs.
+    """
+
+    def __init__(self, capacity_bytes):
+        self.capacity = capacity_bytes
+        self._data = bytearray()
+        self._scanned = 0  # bytes already classified as silent or voiced
+        self.silent_bytes = 0  # length of the trailing run of silence
+        self.voiced_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def full(self):
+        return len(self._data) >= self.capacity
+
+    def append(self, pcm, silence_threshold) -> bytes:
+        """Add PCM up to capacity; returns whatever did not fit"""
+        room = self.capacity - len(self._data)
+        self._data += pcm[:room]
+        while self._scanned + FRAME_BYTES <= len(self._data):
+            frame = self._data[self._scanned:self._scanned + FRAME_BYTES]
+            if _loudness(frame) < silence_threshold:
+                self.silent_bytes += FRAME_BYTES
+            else:
+                self.silent_bytes = 0
+                self.voiced_bytes += FRAME_BYTES
+            self._scanned += FRAME_BYTES
+        return pcm[room:]
+
+    def snapshot(self, start=0) -> bytes:
+        return bytes(self._data[start:])
+
+    def take(self) -> bytes:
+        data = bytes(self._data)
+        self._data.clear()
+        self._scanned = 0
+        self.silent_bytes = 0
+        self.voiced_bytes = 0
+        return data
+
+
+class LiveTranscriptionSession:
+    """
+    Turns a stream of 16kHz mono s16le frames into transcript segments.
+
+    Audio accumulates in a SegmentBuffer until a pause of LIVE_SILENCE_MS follows
+    at least LIVE_MIN_SEGMENT_SECONDS of audio, or the buffer fills up. Each cut
+    segment is transcribed in the background and pushed to the client as a
+    "final" message; while a segment is still being recorded, interim "partial"
+    messages are sent every LIVE_PARTIAL_INTERVAL_SECONDS.
+
+    Each partial transcribes only the audio recorded since the previous one and
+    appends its text, so a segment is sent to Whisper about twice in all (once
+    in partials, once as the final), rather than once per partial interval.
+    Partials can split words at their boundaries; the final replaces them.
+    Set LIVE_PARTIAL_INTERVAL_SECONDS=0 to bill each segment once.
+
+    A segment whose transcription fails is retried up to LIVE_SEGMENT_ATTEMPTS
+    times. One that still fails is reported with an "error" message and listed
+    in failed_segments, so the caller knows the joined transcript has a gap.
+    """
+
+    def __init__(self, transcriber, send):
+        self.transcriber = transcriber  # coroutine function: wav bytes -> text
+        self.send = send  # coroutine function: dict -> None
+        self.buffer = SegmentBuffer(int(LIVE_MAX_SEGMENT_SECONDS * BYTES_PER_SECOND) // FRAME_BYTES * FRAME_BYTES)
+        self.min_segment_bytes = int(LIVE_MIN_SEGMENT_SECONDS * BYTES_PER_SECOND)
+        self.silence_bytes = LIVE_SILENCE_MS * BYTES_PER_SECOND // 1000
+        self.segments = {}  # index -> final text
+        self.failed_segments = set()  # indexes whose audio could not be transcribed
+        self._segment_index = 0
+        self._segment_start = 0
+        self._slots = asyncio.Semaphore(LIVE_SEGMENT_FANOUT)
+        self._tasks = set()
+        self._partial_task = None
+        self._last_partial = time.monotonic()
+        self._partial_offset = 0  # bytes of the current segment already in partial_text
+        self._partial_text = []
+
+    async def feed(self, pcm: bytes):
+        """Accept a frame of PCM from the client"""
+        pcm = pcm[:len(pcm) - len(pcm) % SAMPLE_WIDTH]
+        while pcm:
+            pcm = self.buffer.append(pcm, LIVE_SILENCE_THRESHOLD)
+            at_pause = len(self.buffer) >= self.min_segment_bytes and self.buffer.silent_bytes >= self.silence_bytes
+            if self.buffer.full or at_pause:
+                self._cut()
+        self._maybe_send_partial()
+
+    async def finish(self) -> str:
+        """
+        Flush the last segment, wait for every transcription and return the full
+        text. Check failed_segments afterwards: the text omits those segments.
+        """
+        if len(self.buffer):
+            self._cut()
+        if self._partial_task:
+            self._partial_task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Segments are cut back to back without overlap, so they join as-is
+        return " ".join(text for index, text in sorted(self.segments.items()) if text)
+
+    async def close(self):
+        """Cancel outstanding work (client went away)"""
+        for task in list(self._tasks) + ([self._partial_task] if self._partial_task else []):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _cut(self):
+        index = self._segment_index
+        voiced = self.buffer.voiced_bytes
+        start_ms = self._segment_start * 1000 // BYTES_PER_SECOND
+        pcm = self.buffer.take()
+        self._segment_index += 1
+        self._segment_start += len(pcm)
+        if self._partial_task:
+            self._partial_task.cancel()
+            self._partial_task = None
+        self._last_partial = time.monotonic()
+        self._partial_offset = 0
+        self._partial_text = []
+        end_ms = self._segment_start * 1000 // BYTES_PER_SECOND
+        if voiced < FRAME_BYTES * 10:
+            # Under 300 ms of sound: nothing worth paying Whisper for
+            self.segments[index] = ""
+            return
+        task = asyncio.create_task(self._transcribe_segment(index, pcm, start_ms, end_ms))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _transcribe_segment(self, index, pcm, start_ms, end_ms):
+        for attempt in range(1, LIVE_SEGMENT_ATTEMPTS + 1):
+            try:
+                async with self._slots:
+                    text = (await self.transcriber(wav_header(len(pcm)) + pcm)).strip()
+                break
+            except Exception as e:
+                log.warning("Live segment transcription failed", segment=index, attempt=attempt, error=str(e))
+                if attempt == LIVE_SEGMENT_ATTEMPTS:
+                    self.segments[index] = ""
+                    self.failed_segments.add(index)
+                    await self._safe_send({"type": "error", "segment": index, "error": str(e)})
+                    return
+                await asyncio.sleep(2 ** (attempt - 1))
+        self.segments[index] = text
+        await self._safe_send({
+            "type": "final", "segment": index, "text": text, "start_ms": start_ms, "end_ms": end_ms
+        })
+
+    def _maybe_send_partial(self):
+        if LIVE_PARTIAL_INTERVAL_SECONDS <= 0 or self._partial_task:
+            return
+        if time.monotonic() - self._last_partial < LIVE_PARTIAL_INTERVAL_SECONDS:
+            return
+        if self.buffer.voiced_bytes < BYTES_PER_SECOND or len(self.buffer) - self._partial_offset < BYTES_PER_SECOND:
+            return
+        self._last_partial = time.monotonic()
+        pcm = self.buffer.snapshot(self._partial_offset)
+        self._partial_task = asyncio.create_task(
+            self._send_partial(self._segment_index, pcm, self._partial_offset + len(pcm))
+        )
+
+    async def _send_partial(self, index, pcm, end):
+        try:
+            text = (await self.transcriber(wav_header(len(pcm)) + pcm)).strip()
+            if index == self._segment_index:  # still recording this segment
+                self._partial_offset = end
+                if text:
+                    self._partial_text.append(text)
+                await self._safe_send({"type": "partial", "segment": index, "text": " ".join(self._partial_text)})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("Live partial transcription failed", error=str(e))
+        finally:
+            if self._partial_task is asyncio.current_task():
+                self._partial_task = None
+
+    async def _safe_send(self, message):
+        try:
+            await self.send(message)
+        except Exception:
+            # The socket closed; finish() still collects the text
+            pass
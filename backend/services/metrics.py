@@ -0,0 +1,259 @@
+"""
+In-process counters and histograms, exposed in the Prometheus text format.
+
+Metrics are updated on the event loop thread only, so recording one is a dict
+lookup and a couple of additions with no locking. Histograms keep one count
+per bucket and are made cumulative when rendered.
+"""
+import bisect
+import functools
+import math
+import time
+
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; from sub-millisecond SQLite reads to multi-minute agent runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_metrics = []
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        # Bucket upper bounds are inclusive
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *labels):
+        """Context manager that observes the time spent in its block"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        bounds = self.buckets + (math.inf,)
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labelnames, labels, ("le", _format_value(bound))), cumulative)
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), count
+
+
+class Gauge:
+    """A value read when the metrics are rendered; collect() returns {label values tuple: value}"""
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in (self.collect() or {}).items():
+            if value is not None:
+                yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    metric = Counter(name, documentation, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    metric = Histogram(name, documentation, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def gauge(name, documentation, labelnames=(), collect=None) -> Gauge:
+    metric = Gauge(name, documentation, labelnames, collect)
+    _metrics.append(metric)
+    return metric
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        try:
+            samples = list(metric.samples())
+        except Exception as e:
+            # A failing gauge callback must not take the whole endpoint down
+            log.warning("Metrics collection failed", metric=metric.name, error=str(e))
+            continue
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = histogram(
+    "medscribeai_http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response, by route",
+    ("method", "route"),
+)
+HTTP_REQUESTS = counter(
+    "medscribeai_http_requests_total", "Requests handled, by route and response status",
+    ("method", "route", "status"),
+)
+DB_QUERY_SECONDS = histogram(
+    "medscribeai_db_query_duration_seconds", "DatabaseService call duration, including the pool wait",
+    ("method",),
+)
+DB_QUERY_ERRORS = counter("medscribeai_db_query_errors_total", "DatabaseService calls that raised", ("method",))
+STAGE_SECONDS = histogram(
+    "medscribeai_stage_duration_seconds",
+    "Duration of one processing stage: upload spooling, ffmpeg transcoding or a Whisper request",
+    ("stage",),
+)
+STAGE_ERRORS = counter("medscribeai_stage_errors_total", "Processing stages that raised", ("stage",))
+AGENT_TURN_SECONDS = histogram(
+    "medscribeai_agent_turn_duration_seconds", "Duration of one agent's turn in a group chat, including tool calls",
+    ("agent",),
+)
+RETRIES = counter(
+    "medscribeai_retries_total", "Operations retried after a failure, by operation and reason",
+    ("operation", "reason"),
+)
+RATE_LIMIT_WAIT_SECONDS = histogram(
+    "medscribeai_rate_limit_wait_seconds", "Time a request queued for quota in a shared rate limiter",
+    ("quota",),
+)
+RATE_LIMITED = counter("medscribeai_rate_limited_total", "429 responses received, by quota", ("quota",))
+
+
+def timed(histogram, errors=None, label=None):
+    """
+    Decorator recording an async function's duration in histogram, and its
+    exceptions in errors, under one label (by default the function's name).
+    """
+    def decorator(func):
+        name = label or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(name)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, name)
+
+        return wrapper
+
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request and WebSocket session.
+
+    Requests are labelled with the matched route's path template, not the raw
+    path, so /api/visits/1 and /api/visits/2 share one series; anything that
+    matched no route is "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "websocket.accept":
+                status = "101"
+            elif message["type"] == "websocket.close" and status == "500":
+                status = "403"  # closed before accepting
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "WEBSOCKET")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method, path)
+            HTTP_REQUESTS.inc(method, path, status)
@@ -0,0 +1,71 @@
+import base64
+import datetime
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(**keys) -> str:
+    """Encode the keyset position of the last row on a page into an opaque token"""
+    payload = {
+        name: value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+        for name, value in keys.items()
+    }
+    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _parse_id(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f"cursor id must be an integer, not {value!r}")
+    return value
+
+
+def _parse_date(value):
+    if not isinstance(value, str):
+        raise TypeError(f"cursor date must be a string, not {value!r}")
+    return datetime.datetime.fromisoformat(value)
+
+
+# How each cursor key is read back into the value encode_cursor was given
+CURSOR_FIELDS = {"id": _parse_id, "date": _parse_date}
+
+
+def decode_cursor(token: str, *required: str) -> dict:
+    """
+    Decode a token produced by encode_cursor, checking the expected keys are
+    present and hold values of the right type. Returns the parsed values.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {token}") from e
+    if not isinstance(payload, dict) or any(key not in payload for key in required):
+        raise InvalidCursorError(f"Invalid cursor: {token}")
+    try:
+        return {key: CURSOR_FIELDS[key](payload[key]) for key in required}
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {token}") from e
+
+
+def like_prefix(prefix: str) -> str:
+    """Turn user input into a LIKE pattern matching values that start with it (ESCAPE '\\')"""
+    escaped = (
+        prefix.replace("\\", "\\\\")
+        .replace("%", "\\%")
+        .replace("_", "\\_")
+        .replace("[", "\\[")
+    )
+    return escaped + "%"
+
+
+def clamp_page_size(limit) -> int:
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
@@ -0,0 +1,221 @@
+import asyncio
+import email.utils
+import os
+import random
+import re
+import time
+
+from services.metrics import RATE_LIMIT_WAIT_SECONDS, RATE_LIMITED, RETRIES
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
+
+# Azure enforces quotas over short windows (roughly RPM/6 per 10 seconds), so a
+# bucket never holds more than 10 seconds' worth of quota
+BURST_SECONDS = 10
+BACKOFF_BASE_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_BASE_SECONDS", "2"))
+BACKOFF_MAX_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF_MAX_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("RATE_LIMIT_MAX_ATTEMPTS", "4"))
+
+_RETRY_TEXT = re.compile(r"(?:try again|retry after) (?:in )?(\d+(?:\.\d+)?) seconds?", re.IGNORECASE)
+
+
+def estimate_tokens(text) -> int:
+    """Rough token count for quota accounting (about four characters per token)"""
+    return len(text or "") // 4 + 1
+
+
+def is_rate_limit_error(exc) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    message = str(exc).lower()
+    return "rate limit is exceeded" in message or "rate_limit_exceeded" in message
+
+
+def _headers(exc):
+    return getattr(getattr(exc, "response", None), "headers", None) or {}
+
+
+def retry_after_seconds(exc):
+    """Server-suggested wait from Retry-After headers or the error text, or None"""
+    headers = _headers(exc)
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    match = _RETRY_TEXT.search(str(exc))
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second, up to BURST_SECONDS of quota"""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount) -> float:
+        self._refill()
+        # A request larger than the bucket is let through once the bucket is full
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+    def limit_to(self, remaining):
+        """Never assume more quota than the server says is left"""
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """
+    Process-wide limiter for one Azure quota (requests and tokens per minute).
+
+    Callers queue in FIFO order until both buckets can cover their request. A
+    429 anywhere in the process blocks every caller of the same quota until the
+    server's Retry-After has passed (with jitter), so concurrent visits back
+    off together instead of each retrying into the limit. `rpm` / `tpm` of 0
+    disable that bucket.
+    """
+    _instances = {}
+
+    # name -> environment prefix; e.g. RATE_LIMIT_AGENTS_RPM, RATE_LIMIT_AGENTS_TPM
+    QUOTAS = {
+        "agents": "RATE_LIMIT_AGENTS",
+        "whisper": "RATE_LIMIT_WHISPER",
+        "management": "RATE_LIMIT_MANAGEMENT",
+    }
+
+    @classmethod
+    def get(cls, name):
+        if name not in cls._instances:
+            prefix = cls.QUOTAS[name]
+            cls._instances[name] = RateLimiter(
+                name,
+                rpm=float(os.getenv(f"{prefix}_RPM", "0")),
+                tpm=float(os.getenv(f"{prefix}_TPM", "0")),
+            )
+        return cls._instances[name]
+
+    @classmethod
+    def all_stats(cls) -> dict:
+        return {name: cls.get(name).stats() for name in cls.QUOTAS}
+
+    def __init__(self, name, rpm=0, tpm=0):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+        self.waiting = 0
+        self.admitted = 0
+        self.throttled_requests = 0
+        self.throttled_seconds = 0.0
+        self.rate_limited = 0
+
+    async def acquire(self, tokens=0):
+        """Wait until the quota allows one request of about `tokens` tokens"""
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            # asyncio.Lock wakes waiters in arrival order
+            async with self._lock:
+                while True:
+                    delay = max(
+                        self.blocked_until - time.monotonic(),
+                        self.requests.wait_time(1) if self.requests else 0.0,
+                        self.tokens.wait_time(tokens) if self.tokens and tokens else 0.0,
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens and tokens:
+                    self.tokens.take(tokens)
+                self.admitted += 1
+        finally:
+            self.waiting -= 1
+            waited = time.monotonic() - started
+            RATE_LIMIT_WAIT_SECONDS.observe(waited, self.name)
+            if waited >= 0.01:
+                self.throttled_requests += 1
+                self.throttled_seconds += waited
+
+    def backoff(self, attempt, hint=None) -> float:
+        """Jittered delay before retry `attempt` (1-based), honoring a server hint"""
+        if hint is not None:
+            # Spread the herd over the quarter-window after the server's hint
+            return hint + random.uniform(0, max(1.0, hint * 0.25))
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    def penalize(self, seconds):
+        """Hold every caller of this quota for `seconds`"""
+        self.rate_limited += 1
+        RATE_LIMITED.inc(self.name)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def on_rate_limit(self, exc, attempt) -> float:
+        """Record a 429 and return how long this quota is now blocked for"""
+        delay = self.backoff(attempt, retry_after_seconds(exc))
+        self.penalize(delay)
+        return delay
+
+    def observe(self, headers):
+        """Adjust to the remaining-quota headers of a successful response"""
+        for header, bucket in (("x-ratelimit-remaining-requests", self.requests),
+                               ("x-ratelimit-remaining-tokens", self.tokens)):
+            value = headers.get(header) if headers else None
+            if bucket and value is not None:
+                try:
+                    bucket.limit_to(float(value))
+                except ValueError:
+                    pass
+
+    async def call(self, make_request, tokens=0, max_attempts=MAX_ATTEMPTS):
+        """Await make_request() under the quota, retrying rate-limit errors"""
+        for attempt in range(1, max_attempts + 1):
+            await self.acquire(tokens)
+            try:
+                return await make_request()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == max_attempts:
+                    raise
+                delay = self.on_rate_limit(e, attempt)
+                RETRIES.inc(self.name, "rate_limit")
+                log.warning("Quota rate limited", quota=self.name, hold_seconds=round(delay, 1))
+
+    def stats(self) -> dict:
+        return {
+            "rpm": self.requests.rate * 60 if self.requests else None,
+            "tpm": self.tokens.rate * 60 if self.tokens else None,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "throttled_requests": self.throttled_requests,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "rate_limited": self.rate_limited,
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - time.monotonic()), 3),
+        }
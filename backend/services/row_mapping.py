@@ -0,0 +1,29 @@
+"""
+Materializing cursor results as dicts.
+
+The column names are read from cursor.description once per result, not per
+row, so a result costs one dict(zip(...)) per row. They're never cached
+across executions, so a renamed or added column shows up immediately.
+"""
+
+
+def columns(cursor) -> tuple:
+    """The column names of the executed query"""
+    return tuple(column[0] for column in cursor.description)
+
+
+async def fetch_all(cursor) -> list[dict]:
+    """Every remaining row of the executed query, as dicts"""
+    rows = await cursor.fetchall()
+    if not rows:
+        return []
+    names = columns(cursor)
+    return [dict(zip(names, row)) for row in rows]
+
+
+async def fetch_one(cursor):
+    """The next row of the executed query as a dict, or None"""
+    row = await cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip(columns(cursor), row))
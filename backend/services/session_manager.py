@@ -0,0 +1,188 @@
+import asyncio
+import collections
+import os
+import time
+
+from semantic_kernel.agents import AzureAIAgentThread
+
+from .rate_limiter import RateLimiter
+from .structured_logging import get_logger
+
+log = get_logger(__name__)
+
+
+class SessionMismatchError(ValueError):
+    """Raised when a thread is used for a different visit than the one it was opened for"""
+
+
+class DocumentationSession:
+    """Live state of one documentation thread between requests"""
+
+    def __init__(self, thread_id, visit_id, thread, owned=True):
+        now = time.monotonic()
+        self.thread_id = thread_id
+        self.visit_id = visit_id
+        self.thread = thread  # AzureAIAgentThread for the session's remote thread
+        self.owned = owned  # False when another process created the thread
+        self.chat = None  # AgentGroupChat of the last successful run, reused by follow-ups
+        self.transcript = ""  # everything transcribed in this session so far
+        self.soap_note = None  # last DocumentationAgent output
+        self.runs = 0
+        self.lock = asyncio.Lock()  # one conversation at a time per session
+        self.created_at = now
+        self.last_used = now
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+
+class SessionManager:
+    """
+    Maps thread_id to a live DocumentationSession.
+
+    Sessions are kept in LRU order, capped at `max_sessions` and dropped once
+    idle for `ttl` seconds. Evicting a session deletes its remote thread and the
+    threads its group chat opened, so abandoned visits don't leave threads
+    behind in the Azure AI project. A thread_id this process has not seen (e.g.
+    created before a restart or by another worker) is wrapped on first use but
+    never deleted by us.
+    """
+
+    def __init__(self, client, ttl=None, max_sessions=None):
+        self.client = client
+        self.ttl = ttl if ttl is not None else float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+        self.max_sessions = max_sessions if max_sessions is not None else int(os.getenv("SESSION_MAX_ENTRIES", "256"))
+        self.limiter = RateLimiter.get("management")
+        self._sessions = collections.OrderedDict()
+        self._reaper = None
+
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    async def start(self):
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_forever())
+
+    async def close(self):
+        """Stop the reaper and clean up every session we own"""
+        if self._reaper:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        await asyncio.gather(*(self._dispose(session) for session in sessions))
+
+    async def create(self, visit_id) -> DocumentationSession:
+        """Open a remote thread for a new documentation session"""
+        remote = await self.limiter.call(self.client.agents.create_thread)
+        session = DocumentationSession(
+            remote.id, visit_id, AzureAIAgentThread(client=self.client, thread_id=remote.id)
+        )
+        self.created += 1
+        await self._remember(session)
+        return session
+
+    def peek(self, thread_id):
+        """The live session for thread_id, or None; unlike get(), changes nothing"""
+        session = self._sessions.get(thread_id)
+        if session is None or self._expired(session):
+            return None
+        return session
+
+    async def get(self, thread_id, visit_id) -> DocumentationSession:
+        """Return the live session for thread_id, wrapping an unknown remote thread if needed"""
+        session = self._sessions.get(thread_id)
+        if session is not None and not self._expired(session):
+            if session.visit_id != visit_id:
+                raise SessionMismatchError(f"Thread {thread_id} belongs to visit {session.visit_id}, not {visit_id}")
+            self._sessions.move_to_end(thread_id)
+            session.touch()
+            self.hits += 1
+            return session
+        if session is not None:
+            await self._evict(thread_id)
+
+        self.misses += 1
+        session = DocumentationSession(
+            thread_id, visit_id, AzureAIAgentThread(client=self.client, thread_id=thread_id), owned=False
+        )
+        await self._remember(session)
+        return session
+
+    async def finish_run(self, session, chat, transcript, follow_up, soap_note):
+        """Keep the state of a completed run for the session's next request"""
+        if follow_up:
+            transcript = "\n".join(part for part in (session.transcript, transcript) if part)
+        session.transcript = transcript
+        session.soap_note = soap_note or session.soap_note
+        session.runs += 1
+        if chat is not session.chat:
+            await self.discard_chat(session)
+            session.chat = chat
+        session.touch()
+
+    async def discard_chat(self, session):
+        """Drop a chat whose state can't be trusted (e.g. a run failed part-way)"""
+        chat, session.chat = session.chat, None
+        if chat is not None:
+            try:
+                await chat.reset()
+            except Exception as e:
+                log.warning("Could not reset documentation chat", thread_id=session.thread_id, error=str(e))
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "created": self.created,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
+
+    def _expired(self, session):
+        return self.ttl > 0 and time.monotonic() - session.last_used > self.ttl
+
+    async def _remember(self, session):
+        self._sessions[session.thread_id] = session
+        self._sessions.move_to_end(session.thread_id)
+        # Least recently used first, skipping sessions with a conversation running
+        for thread_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if thread_id != session.thread_id and not self._sessions[thread_id].lock.locked():
+                await self._evict(thread_id)
+
+    async def _evict(self, thread_id):
+        session = self._sessions.pop(thread_id, None)
+        if session is not None:
+            self.evicted += 1
+            await self._dispose(session)
+
+    async def _dispose(self, session):
+        try:
+            if session.chat is not None:
+                # Deletes the per-agent threads the group chat created
+                await session.chat.reset()
+            if session.owned:
+                await self.limiter.call(session.thread.delete)
+        except Exception as e:
+            log.warning("Could not clean up documentation thread", thread_id=session.thread_id, error=str(e))
+
+    async def _reap_forever(self):
+        interval = max(1.0, min(self.ttl / 4, 60.0)) if self.ttl > 0 else 60.0
+        while True:
+            await asyncio.sleep(interval)
+            expired = [
+                thread_id for thread_id, session in self._sessions.items()
+                if self._expired(session) and not session.lock.locked()
+            ]
+            for thread_id in expired:
+                await self._evict(thread_id)
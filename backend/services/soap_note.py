@@ -0,0 +1,49 @@
+import json
+import re
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+# Markdown headings used when a structured note is shown as an agent message
+SECTION_TITLES = {
+    "subjective": "Subjective",
+    "objective": "Objective",
+    "assessment": "Assessment",
+    "plan": "Plan",
+}
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+class SoapNoteValidationError(ValueError):
+    """Raised when an agent's structured SOAP output does not match the schema"""
+
+
+class SoapNote(BaseModel):
+    """The JSON object DocumentationAgent returns in structured-output mode"""
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
+    subjective: str
+    objective: str
+    assessment: str
+    plan: str
+
+    def to_markdown(self) -> str:
+        return "\n\n".join(f"**{title}:**\n{getattr(self, key)}" for key, title in SECTION_TITLES.items())
+
+
+SOAP_NOTE_SCHEMA = json.dumps(SoapNote.model_json_schema())
+
+
+def parse_soap_note(text) -> SoapNote:
+    """Validate an agent response as a SoapNote, tolerating a code fence or text around the object"""
+    body = _FENCE.sub("", (text or "").strip())
+    start, end = body.find("{"), body.rfind("}")
+    if start == -1 or end < start:
+        raise SoapNoteValidationError("DocumentationAgent did not return a JSON object")
+    try:
+        note = SoapNote.model_validate_json(body[start:end + 1])
+    except ValidationError as e:
+        raise SoapNoteValidationError(f"Invalid SOAP note: {e}") from e
+    if not any((note.subjective, note.objective, note.assessment, note.plan)):
+        raise SoapNoteValidationError("Invalid SOAP note: every section is empty")
+    return note
@@ -0,0 +1,218 @@
+import os
+import re
+
+SECTIONS = ("subjective", "objective", "assessment", "plan")
+
+# "**Subjective:**", "Subjective:", "## Plan" ... at the start of a line
+_HEADING = re.compile(r"^[ \t]*(?:#+[ \t]*)?\**[ \t]*(subjective|objective|assessment|plan)[ \t]*:?[ \t]*\**[ \t]*:?",
+                      re.IGNORECASE | re.MULTILINE)
+
+# Spelled-out medications that the suffix rule below misses
+_MEDICATIONS = {
+    "acetaminophen", "tylenol", "advil", "aspirin", "ibuprofen", "naproxen", "motrin", "insulin",
+    "warfarin", "heparin", "morphine", "oxycodone", "hydrocodone", "tramadol", "codeine", "albuterol",
+    "levothyroxine", "gabapentin", "furosemide", "hydrochlorothiazide", "nitroglycerin", "sertraline",
+    "fluoxetine", "citalopram", "escitalopram", "bupropion", "trazodone", "clopidogrel", "digoxin",
+    "amiodarone", "benadryl", "diphenhydramine", "loratadine", "cetirizine", "epinephrine", "montelukast",
+}
+_MEDICATION_SUFFIXES = (
+    "pril", "sartan", "olol", "dipine", "statin", "cillin", "mycin", "cycline", "floxacin", "prazole",
+    "conazole", "tidine", "formin", "gliptin", "oxetine", "zepam", "zolam", "profen", "sone", "solone",
+    "parin", "xaban", "mab", "tinib",
+)
+_WORD = re.compile(r"[a-z]+")
+
+_BLOOD_PRESSURE = re.compile(r"\b(\d{2,3}\s*/\s*\d{2,3})\b")
+_VITAL = re.compile(
+    r"\b(?:temp(?:erature)?|heart rate|pulse|hr|respirat\w*|rr|o2|oxygen|spo2|sat\w*|weight|weighs|bmi)"
+    r"\D{0,20}?(\d{1,3}(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+_NUMBER = re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)(?![\w.]*\d)")
+# "1." / "2)" list markers at the start of a line are numbering, not figures
+_LIST_MARKER = re.compile(r"^[ \t]*(?:[-*][ \t]*)?\d+[.)][ \t]", re.MULTILINE)
+
+# Notes this short can't cover a visit; this long are likely a pasted transcript
+MIN_SECTION_CHARS = int(os.getenv("LOCAL_VERIFICATION_MIN_SECTION_CHARS", "10"))
+MAX_SECTION_CHARS = int(os.getenv("LOCAL_VERIFICATION_MAX_SECTION_CHARS", "4000"))
+MIN_TRANSCRIPT_CHARS = 40
+SKIP_CONFIDENCE = float(os.getenv("LOCAL_VERIFICATION_CONFIDENCE", "0.9"))
+
+
+def split_sections(note) -> dict:
+    """Section name -> text for each SOAP heading found, in order of appearance"""
+    headings = list(_HEADING.finditer(note or ""))
+    sections = {}
+    for index, match in enumerate(headings):
+        end = headings[index + 1].start() if index + 1 < len(headings) else len(note)
+        sections.setdefault(match.group(1).lower(), note[match.end():end].strip())
+    return sections
+
+
+def extract_medications(text) -> set:
+    return {
+        word for word in _WORD.findall((text or "").lower())
+        if word in _MEDICATIONS or (len(word) >= 7 and word.endswith(_MEDICATION_SUFFIXES))
+    }
+
+
+def extract_vitals(text) -> set:
+    text = text or ""
+    values = {re.sub(r"\s+", "", value) for value in _BLOOD_PRESSURE.findall(text)}
+    return values | set(_VITAL.findall(text))
+
+
+def extract_numbers(text) -> set:
+    return set(_NUMBER.findall(_LIST_MARKER.sub("", text or "")))
+
+
+def _contains_number(note, value):
+    # "120/80" may be written "120 / 80"; "7" must not match inside "17"
+    pattern = r"\s*/\s*".join(re.escape(part) for part in value.split("/"))
+    return re.search(rf"(?<![\d.]){pattern}(?![\d]|\.\d)", note) is not None
+
+
+def _coverage(found, covered):
+    return len(covered) / len(found) if found else 1.0
+
+
+def _mentions_medication(text, name):
+    return re.search(rf"\b{name}\b", text) is not None
+
+
+class VerificationResult:
+    """Outcome of the local checks; confidence is the weakest check's score"""
+
+    def __init__(self, checks, issues, threshold):
+        self.checks = checks
+        self.issues = issues
+        self.confidence = min(checks.values())
+        self.skip = self.confidence >= threshold
+
+    def report(self) -> str:
+        """Message shown in place of VerificationAgent's when its turn is skipped"""
+        lines = ["Verified locally: all SOAP sections are present, cover the transcript's "
+                 "medications, vitals and figures, and add none the transcript doesn't mention."]
+        if self.issues:
+            lines.append("Minor gaps:")
+            lines += [f"- {issue}" for issue in self.issues]
+        lines.append("Documentation complete.")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "confidence": round(self.confidence, 3),
+            "skip": self.skip,
+            "checks": {name: round(score, 3) for name, score in self.checks.items()},
+            "issues": self.issues,
+        }
+
+
+class SoapVerifier:
+    """
+    Rule-based pre-check of a SOAP note against its transcript.
+
+    Scores section structure, section length, and how many of the medications,
+    vitals and numbers mentioned in the transcript appear in the note. The note
+    must not add any medication, vital or number the transcript lacks, and a
+    transcript with none of them gives the checks nothing to go on; either
+    scores 0. A note whose weakest score reaches `threshold` doesn't need
+    VerificationAgent's turn; anything below is escalated to the model.
+    """
+
+    def __init__(self, threshold=SKIP_CONFIDENCE):
+        self.threshold = threshold
+        self.checked = 0
+        self.skipped = 0
+        self.escalated = 0
+
+    def check(self, note, transcript) -> VerificationResult:
+        note = note or ""
+        transcript = transcript or ""
+        issues = []
+        checks = {}
+
+        sections = split_sections(note)
+        missing = [name for name in SECTIONS if name not in sections]
+        in_order = [name for name in sections if name in SECTIONS] == [name for name in SECTIONS if name in sections]
+        checks["structure"] = 1.0 if not missing and in_order else 0.0
+        if missing:
+            issues.append(f"Missing sections: {', '.join(missing)}")
+        elif not in_order:
+            issues.append("Sections are out of SOAP order")
+
+        bad_length = [
+            name for name in SECTIONS
+            if not MIN_SECTION_CHARS <= len(sections.get(name, "")) <= MAX_SECTION_CHARS
+        ]
+        checks["length"] = 1 - len(bad_length) / len(SECTIONS)
+        if bad_length:
+            issues.append(f"Sections too short or too long: {', '.join(bad_length)}")
+
+        # Without the transcript there is nothing to check coverage against
+        checks["transcript"] = 1.0 if len(transcript.strip()) >= MIN_TRANSCRIPT_CHARS else 0.0
+        if not checks["transcript"]:
+            issues.append("Transcript unavailable for coverage checks")
+
+        lowered = note.lower()
+        medications = extract_medications(transcript)
+        missed = sorted(name for name in medications if not _mentions_medication(lowered, name))
+        checks["medications"] = _coverage(medications, medications - set(missed))
+        if missed:
+            issues.append(f"Medications not in note: {', '.join(missed)}")
+
+        vitals = extract_vitals(transcript)
+        missed = sorted(value for value in vitals if not _contains_number(note, value))
+        checks["vitals"] = _coverage(vitals, vitals - set(missed))
+        if missed:
+            issues.append(f"Vitals not in note: {', '.join(missed)}")
+
+        # Remaining figures (doses, durations, counts); in a long visit one or two may be summarized away
+        numbers = extract_numbers(transcript) - {part for value in vitals for part in value.split("/")}
+        missed = sorted(value for value in numbers if not _contains_number(note, value))
+        checks["numbers"] = _coverage(numbers, numbers - set(missed))
+        if missed:
+            issues.append(f"Numbers not in note: {', '.join(missed)}")
+
+        # Coverage above scores 1.0 for a category the transcript never mentions
+        checks["evidence"] = 1.0 if medications or vitals or numbers else 0.0
+        if not checks["evidence"]:
+            issues.append("Transcript has no medications, vitals or figures to check the note against")
+
+        # The reverse direction: anything clinical in the note must come from the transcript
+        transcript_lowered = transcript.lower()
+        added = sorted(
+            name for name in extract_medications(note) if not _mentions_medication(transcript_lowered, name)
+        )
+        checks["unsupported_medications"] = 0.0 if added else 1.0
+        if added:
+            issues.append(f"Medications not in transcript: {', '.join(added)}")
+
+        note_vitals = extract_vitals(note)
+        added = sorted(value for value in note_vitals if not _contains_number(transcript, value))
+        checks["unsupported_vitals"] = 0.0 if added else 1.0
+        if added:
+            issues.append(f"Vitals not in transcript: {', '.join(added)}")
+
+        note_numbers = extract_numbers(note) - {part for value in note_vitals for part in value.split("/")}
+        added = sorted(value for value in note_numbers if not _contains_number(transcript, value))
+        checks["unsupported_numbers"] = 0.0 if added else 1.0
+        if added:
+            issues.append(f"Numbers not in transcript: {', '.join(added)}")
+
+        result = VerificationResult(checks, issues, self.threshold)
+        self.checked += 1
+        if result.skip:
+            self.skipped += 1
+        else:
+            self.escalated += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "escalated": self.escalated,
+            "skip_rate": round(self.skipped / self.checked, 3) if self.checked else None,
+        }
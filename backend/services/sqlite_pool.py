@@ -0,0 +1,166 @@
+import asyncio
+import concurrent.futures
+import datetime
+import os
+import sqlite3
+
+from services.connection_pool import ConnectionPool, _PooledConnection
+
+# Store timestamps as ISO text and read them back as datetime/date, like pyodbc does
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: datetime.date.fromisoformat(raw.decode()[:10]))
+
+
+class SqliteCursor:
+    """Rows are fetched when the statement runs, so fetchone/fetchall never block"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self._rows = []
+        self._next = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def execute(self, query, params=()):
+        self.description, self._rows = await self.connection.execute(query, params)
+        self._next = 0
+        return self
+
+    async def fetchone(self):
+        if self._next >= len(self._rows):
+            return None
+        self._next += 1
+        return self._rows[self._next - 1]
+
+    async def fetchall(self):
+        rows = self._rows[self._next:]
+        self._next = len(self._rows)
+        return rows
+
+    async def close(self):
+        self._rows = []
+
+
+class SqliteConnection:
+    """
+    The subset of an aioodbc connection that DatabaseService and ConnectionPool
+    use, over one sqlite3 connection with its own worker thread.
+
+    With autocommit off, the first statement opens a BEGIN IMMEDIATE
+    transaction, so a writer waits for the database lock (up to the busy
+    timeout) before doing any work instead of failing at its first write.
+    The wait blocks only this connection's thread; on the shared default
+    executor, waiting writers could take every thread and starve the
+    transaction holding the lock.
+    """
+
+    def __init__(self, raw, executor):
+        self.raw = raw
+        self.closed = False
+        self._executor = executor
+        self._autocommit = True
+        self._in_transaction = False
+
+    @classmethod
+    async def connect(cls, path, busy_timeout=5.0):
+        def _open():
+            # timeout is SQLite's busy timeout: how long to wait for another connection's lock
+            raw = sqlite3.connect(path, timeout=busy_timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+                                  isolation_level=None, check_same_thread=False)
+            raw.execute("PRAGMA journal_mode=WAL")
+            # NORMAL is durable across application crashes in WAL mode and avoids an fsync per commit
+            raw.execute("PRAGMA synchronous=NORMAL")
+            raw.execute("PRAGMA foreign_keys=ON")
+            return raw
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        try:
+            raw = await asyncio.get_running_loop().run_in_executor(executor, _open)
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        return cls(raw, executor)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @property
+    def autocommit(self):
+        return self._autocommit
+
+    @autocommit.setter
+    def autocommit(self, value):
+        if value and self._in_transaction:
+            raise sqlite3.ProgrammingError("Commit or roll back before enabling autocommit")
+        self._autocommit = value
+
+    def cursor(self):
+        return SqliteCursor(self)
+
+    def _execute(self, query, params):
+        if not self._autocommit and not self._in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE")
+            self._in_transaction = True
+        cursor = self.raw.execute(query, params or ())
+        try:
+            description = cursor.description
+            return description, cursor.fetchall() if description else []
+        finally:
+            cursor.close()
+
+    async def execute(self, query, params=()):
+        """Run one statement; returns (description, rows)"""
+        return await self._run(self._execute, query, params)
+
+    async def commit(self):
+        await self._end("COMMIT")
+
+    async def rollback(self):
+        await self._end("ROLLBACK")
+
+    async def _end(self, command):
+        if self._in_transaction:
+            try:
+                # Some errors (disk full, interrupts) already rolled the transaction back
+                if self.raw.in_transaction:
+                    await self._run(self.raw.execute, command)
+            finally:
+                self._in_transaction = False
+
+    async def close(self):
+        if self.closed:
+            return
+        try:
+            await self.rollback()
+        finally:
+            self.closed = True
+            await self._run(self.raw.close)
+            self._executor.shutdown(wait=False)
+
+
+class SqlitePool(ConnectionPool):
+    """ConnectionPool over SqliteConnections to one database file"""
+    connection_class = SqliteConnection
+
+    def __init__(self, path, busy_timeout=5.0, **kwargs):
+        super().__init__(dsn=f"sqlite:///{os.path.abspath(path)}", **kwargs)
+        self.path = path
+        self.busy_timeout = busy_timeout
+
+    async def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        await super().open()
+
+    async def _connect(self):
+        conn = await self.connection_class.connect(self.path, self.busy_timeout)
+        self._created += 1
+        return _PooledConnection(conn)
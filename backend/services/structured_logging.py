@@ -0,0 +1,174 @@
+"""
+Structured, non-blocking logging for the API process.
+
+Loggers from get_logger() take fields as keyword arguments:
+
+    log.info("Documentation request received", visit_id=visit_id, transcript=transcript)
+
+Records are queued on the calling thread and written to stdout, as JSON lines
+or plain text, by a background listener thread, so a slow terminal or log
+collector never stalls the event loop. When the queue is full, records are
+dropped and counted instead of blocking.
+
+Fields that can carry PHI (transcripts, SOAP sections, agent messages) are
+replaced by their length before the record is queued, unless LOG_PHI=true
+(local debugging only).
+"""
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_PHI = os.getenv("LOG_PHI", "false").lower() == "true"
+# Fraction of per-turn DEBUG events (agent selection, chunk handling) that are kept
+LOG_TURN_SAMPLE_RATE = float(os.getenv("LOG_TURN_SAMPLE_RATE", "0.1"))
+
+# Loggers whose level LOG_LEVEL sets; everything else (SDKs, uvicorn) stays at WARNING
+APP_LOGGERS = ("main", "services", "strategies")
+
+REDACTED_FIELDS = frozenset({
+    "transcript", "transcript_text", "text", "content", "message", "responses", "instructions",
+    "soap_note", "note", "subjective", "objective", "assessment", "plan", "treatment_plan",
+})
+
+_LOGGING_KWARGS = frozenset({"exc_info", "stack_info", "stacklevel", "extra"})
+
+_listener = None
+_handler = None
+
+
+def redact(value):
+    """Stand-in for a PHI value: its size, never its content"""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, dict)):
+        return f"[redacted {len(value)} items]"
+    return f"[redacted {len(str(value))} chars]"
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Moves keyword arguments other than logging's own into the record's fields"""
+
+    def __init__(self, logger):
+        super().__init__(logger, {})
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOGGING_KWARGS}
+        if fields:
+            kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+
+def get_logger(name) -> StructuredLogger:
+    return StructuredLogger(logging.getLogger(name))
+
+
+def debug_sampled(log, message, **fields):
+    """A DEBUG event emitted for LOG_TURN_SAMPLE_RATE of calls, for per-turn noise"""
+    if log.isEnabledFor(logging.DEBUG) and random.random() < LOG_TURN_SAMPLE_RATE:
+        log.debug(message, sample_rate=LOG_TURN_SAMPLE_RATE, **fields)
+
+
+class RedactionFilter(logging.Filter):
+    def filter(self, record):
+        fields = getattr(record, "fields", None)
+        if fields and not LOG_PHI:
+            record.fields = {
+                key: redact(value) if key in REDACTED_FIELDS else value for key, value in fields.items()
+            }
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        created = datetime.datetime.fromtimestamp(record.created).isoformat(sep=" ", timespec="milliseconds")
+        line = f"{created} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the traceback now: exc_info can't outlive this thread's frame safely
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging():
+    """Route application logging through the queue to a background writer; idempotent"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+    _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _handler.addFilter(RedactionFilter())
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+    logging.getLogger().addHandler(_handler)
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(LOG_LEVEL)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_handler)
+    _listener.stop()
+    _listener = None
+
+
+def stats() -> dict:
+    return {
+        "level": LOG_LEVEL,
+        "format": LOG_FORMAT,
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+        "redaction": not LOG_PHI,
+        "turn_sample_rate": LOG_TURN_SAMPLE_RATE,
+    }
@@ -0,0 +1,233 @@
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import time
+
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Longest gap between sweeps of expired files off the disk tier
+PURGE_INTERVAL = 3600
+
+
+def audio_key(pcm: bytes, deployment: str) -> str:
+    """Cache key for normalized PCM audio transcribed by a given Whisper deployment"""
+    digest = hashlib.sha256()
+    digest.update(deployment.encode())
+    digest.update(b"\0pcm\0")
+    digest.update(pcm)
+    return digest.hexdigest()
+
+
+def file_key(path: str, deployment: str) -> str:
+    """Cache key for an uploaded file's exact bytes (lets an identical retry skip ffmpeg)"""
+    digest = hashlib.sha256()
+    digest.update(deployment.encode())
+    digest.update(b"\0file\0")
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Two-tier content-addressed transcript cache.
+
+    An in-memory LRU holds the most recent transcripts; every entry is also
+    written to disk so it survives restarts. Transcripts are PHI: files are
+    readable by the owner only, and entries older than `ttl` seconds (default
+    a day; 0 keeps them until evicted) are deleted, on lookup and by a sweep
+    of the disk tier at most every PURGE_INTERVAL seconds. The disk tier is
+    also trimmed least recently used first once it grows past `max_disk_bytes`.
+
+    On disk, a file's mtime is its entry's creation time and its atime the
+    entry's last use.
+    """
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            ttl = float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(24 * 3600)))
+            cls._instance = TranscriptionCache(
+                directory=os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join("cache", "transcripts")),
+                max_memory_entries=int(os.getenv("TRANSCRIPT_CACHE_MEMORY_ENTRIES", "256")),
+                max_disk_bytes=int(os.getenv("TRANSCRIPT_CACHE_DISK_BYTES", str(256 * 1024 * 1024))),
+                ttl=ttl or None,
+                enabled=os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() != "false",
+            )
+        return cls._instance
+
+    def __init__(self, directory, max_memory_entries=256, max_disk_bytes=256 * 1024 * 1024,
+                 ttl=None, enabled=True):
+        self.directory = directory
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self._memory = collections.OrderedDict()  # key -> (created_at, text)
+        self._disk_bytes = None  # computed lazily on first write
+        self._disk_lock = asyncio.Lock()
+        self._last_purge = 0.0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.disk_evictions = 0
+        self.expired = 0
+
+    async def get(self, key, record_miss=True):
+        """Return the cached transcript for key, or None"""
+        if not self.enabled:
+            return None
+        await self._maybe_purge()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            del self._memory[key]
+
+        entry = await asyncio.to_thread(self._read_disk, key)
+        if entry is not None:
+            if not self._expired(entry[0]):
+                self._remember(key, entry)
+                self.disk_hits += 1
+                return entry[1]
+            async with self._disk_lock:
+                await asyncio.to_thread(self._remove_expired, self._path(key))
+
+        if record_miss:
+            self.misses += 1
+        return None
+
+    async def set(self, key, text):
+        """Store a transcript in both tiers"""
+        if not self.enabled:
+            return
+        entry = (time.time(), text)
+        self._remember(key, entry)
+        self.stores += 1
+        await self._maybe_purge()
+        async with self._disk_lock:
+            try:
+                await asyncio.to_thread(self._write_disk, key, entry)
+            except OSError as e:
+                log.warning("Could not persist transcript cache entry", error=str(e))
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "disk_evictions": self.disk_evictions,
+            "expired": self.expired,
+            "ttl_seconds": self.ttl,
+        }
+
+    async def _maybe_purge(self):
+        if self.ttl is None or time.monotonic() - self._last_purge < min(self.ttl, PURGE_INTERVAL):
+            return
+        self._last_purge = time.monotonic()
+        for key in [key for key, (created_at, _) in self._memory.items() if self._expired(created_at)]:
+            del self._memory[key]
+        async with self._disk_lock:
+            try:
+                await asyncio.to_thread(self._purge_disk)
+            except OSError as e:
+                log.warning("Could not purge expired transcript cache entries", error=str(e))
+
+    def _expired(self, created_at):
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # Mark as recently used for eviction, keeping the creation time
+            os.utime(path, (time.time(), data["created_at"]))
+            return data["created_at"], data["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, size, _, _ in self._disk_entries())
+        tmp_path = f"{path}.tmp"
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            json.dump({"created_at": entry[0], "text": entry[1]}, f)
+        os.utime(tmp_path, (entry[0], entry[0]))
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        self._disk_bytes += os.path.getsize(path) - previous
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_atime, stat.st_mtime
+
+    def _remove_expired(self, path):
+        """Delete an entry's file, unless it was rewritten since it expired"""
+        try:
+            stat = os.stat(path)
+            if not self._expired(stat.st_mtime):
+                return
+            os.remove(path)
+        except OSError:
+            return
+        if self._disk_bytes is not None:
+            self._disk_bytes -= stat.st_size
+        self.expired += 1
+
+    def _purge_disk(self):
+        for path, _, _, created_at in list(self._disk_entries()):
+            if self._expired(created_at):
+                self._remove_expired(path)
+
+    def _evict_disk(self):
+        # Trim to 90% of the cap so we don't evict again on the very next write
+        goal = self.max_disk_bytes * 0.9
+        for path, size, _, _ in sorted(self._disk_entries(), key=lambda entry: entry[2]):
+            if self._disk_bytes <= goal:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+            self.disk_evictions += 1
@@ -9,21 +9,39 @@ import wave
 import io
 import os
 import pyodbc
-import subprocess
 import datetime
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 from semantic_kernel.agents.strategies import TerminationStrategy, SequentialSelectionStrategy
 import tempfile
 import time
 from services.database_plugin import DatabasePlugin  
+from services.audio_transcoder import AudioTranscoder, TranscodingError, wav_header
+from services.audio_chunker import split_pcm, stitch_transcripts
+from services.transcription_cache import TranscriptionCache, audio_key, file_key
+from services.checkpoints import TRANSCRIPT, current_checkpoint
+from services.rate_limiter import RateLimiter
+from services.metrics import STAGE_ERRORS, STAGE_SECONDS, timed
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
 
 load_dotenv()
 
+# Shared across plugin instances so the whole process respects one in-flight cap
+WHISPER_MAX_CONCURRENCY = int(os.getenv("WHISPER_MAX_CONCURRENCY", "4"))
+WHISPER_TIMEOUT_SECONDS = float(os.getenv("WHISPER_TIMEOUT_SECONDS", "120"))
+_whisper_slots = asyncio.Semaphore(WHISPER_MAX_CONCURRENCY)
+
+# Long recordings are split at pauses and the segments transcribed in parallel
+CHUNK_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", "60"))
+CHUNK_MAX_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_MAX_SECONDS", "90"))
+CHUNK_OVERLAP_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_OVERLAP_SECONDS", "1.5"))
+CHUNK_FANOUT = int(os.getenv("TRANSCRIPTION_CHUNK_FANOUT", "4"))
 
 
 class TranscriptionPlugin:
-    def __init__(self):
+    def __init__(self, client=None, whisper_client=None):
         # Initialize connection to your speech-to-text model
         api_key = os.getenv("AZURE_OPENAI_API_KEY")
         endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -33,64 +51,140 @@ class TranscriptionPlugin:
         whisper_endpoint = os.getenv("AZURE_OPENAI_WHISPER_ENDPOINT")
         whisper_version  = os.getenv("AZURE_OPENAI_WHISPER_API_VERSION")
         whisper_deploy   = os.getenv("AZURE_OPENAI_WHISPER_DEPLOYMENT")
-        # Initialize the client
-        self.client = AzureOpenAI(
+        # Initialize the client (callers may pass their own, e.g. offline stand-ins)
+        self.client = client or AsyncAzureOpenAI(
             azure_endpoint=endpoint,
             api_version=api_version,
             api_key=api_key
         )
         
-        self.whisper_client = AzureOpenAI(
+        self.whisper_client = whisper_client or AsyncAzureOpenAI(
             azure_endpoint=whisper_endpoint,
             api_version=whisper_version,
-            api_key=whisper_key
+            api_key=whisper_key,
+            timeout=WHISPER_TIMEOUT_SECONDS
         )
         self.whisper_deployment = whisper_deploy
+        self.transcoder = AudioTranscoder.get_instance()
+        self.cache = TranscriptionCache.get_instance()
     
             
-    def _convert_to_pcm_wav(self, input_path: str) -> str:
+    @timed(STAGE_SECONDS, STAGE_ERRORS, label="transcode")
+    async def _convert_to_pcm_wav(self, input_path: str) -> bytes:
         """
-        Convert any audio file into 16kHz, 16-bit, mono PCM WAV.
+        Convert any audio file into 16kHz, 16-bit, mono PCM samples.
+        WAV headers are added per segment when the audio is sent to Whisper.
+        """
+        return await self.transcoder.to_pcm(input_path)
+
+    async def _transcribe_pcm(self, pcm: bytes) -> str:
         """
-        base, _ = os.path.splitext(input_path)
-        out_path = f"{base}_pcm16k_mono.wav"
-        subprocess.run([
-            "ffmpeg", "-y",
-            "-i", input_path,
-            "-ac", "1",        # mono
-            "-ar", "16000",    # 16 kHz
-            "-sample_fmt", "s16",
-            out_path
-        ], check=True)
-        return out_path
+        Transcribe normalized PCM. Recordings longer than CHUNK_MAX_SECONDS are cut
+        at pauses into overlapping segments, transcribed with at most CHUNK_FANOUT
+        requests in flight, and stitched back together in order.
+        """
+        # Scanning a long recording for pauses takes a noticeable fraction of a second
+        segments = await asyncio.to_thread(
+            split_pcm,
+            pcm,
+            target_seconds=CHUNK_SECONDS,
+            max_seconds=CHUNK_MAX_SECONDS,
+            overlap_seconds=CHUNK_OVERLAP_SECONDS
+        )
+        if len(segments) == 1:
+            return await self.transcribe_wav(wav_header(len(pcm)) + pcm)
+
+        log.debug("Transcribing segments in parallel", segments=len(segments))
+        view = memoryview(pcm)
+        fanout = asyncio.Semaphore(CHUNK_FANOUT)
+
+        async def transcribe_segment(start, end):
+            async with fanout:
+                return await self.transcribe_wav(wav_header(end - start) + view[start:end])
+
+        parts = await asyncio.gather(*(transcribe_segment(start, end) for start, end in segments))
+        return stitch_transcripts(parts)
+
+    async def transcribe_wav(self, wav: bytes) -> str:
+        """
+        Send WAV bytes to the Whisper deployment without blocking the event loop.
+        Waits for a free slot under WHISPER_MAX_CONCURRENCY and for the shared
+        Whisper quota before calling out; rate-limit errors are retried there.
+        """
+        limiter = RateLimiter.get("whisper")
+
+        # Timed per attempt, so a rate-limited request shows up as a fast error plus the retry
+        @timed(STAGE_SECONDS, STAGE_ERRORS, label="whisper")
+        async def request():
+            raw = await asyncio.wait_for(
+                self.whisper_client.audio.transcriptions.with_raw_response.create(
+                    file=("audio.wav", wav, "audio/wav"),
+                    model=self.whisper_deployment,
+                    response_format="text"
+                ),
+                timeout=WHISPER_TIMEOUT_SECONDS
+            )
+            limiter.observe(raw.headers)
+            return raw.parse()
+
+        async with _whisper_slots:
+            return await limiter.call(request)
+
+    async def close(self):
+        """Close the underlying HTTP clients"""
+        await self.client.close()
+        await self.whisper_client.close()
     
+    async def _checkpoint(self, transcript):
+        """Record the transcript against the documentation run calling us, if any"""
+        checkpoint = current_checkpoint()
+        if checkpoint:
+            await checkpoint.record(TRANSCRIPT, text=transcript)
+
     @kernel_function( name="transcribe_file", description="Transcribes an audio file via Whisper")
     async def listen_and_transcribe(self, audio_path: str) -> str:
         """
+        0. Return a cached transcript if this audio was seen before  
         1. Normalize audio to PCM WAV  
-        2. Send to your Whisper deployment for transcription  
+        2. Send to your Whisper deployment for transcription, split into
+           overlapping segments when the recording is long  
         """
-        print("🎤 listen_and_transcribe() called.")
-
-        # 1) convert to the exact format Whisper expects
-        pcm_path = self._convert_to_pcm_wav(audio_path)
+        log.debug("Transcribing audio file", audio_path=audio_path)
 
-        # 2) invoke Azure OpenAI Whisper
         try:
-            with open(pcm_path, "rb") as f:
-                result =  self.whisper_client.audio.transcriptions.create(
-                    file=f,
-                    model=self.whisper_deployment,
-                    response_format="text"
-                )
-            return result
+            # 0) an identical upload (e.g. a retry after an agent error) skips everything
+            deployment = self.whisper_deployment or ""
+            upload_key = await asyncio.to_thread(file_key, audio_path, deployment)
+            cached = await self.cache.get(upload_key, record_miss=False)
+            if cached is not None:
+                log.info("Transcript served from cache", audio_path=audio_path)
+                await self._checkpoint(cached)
+                return cached
+
+            # 1) convert to the exact format Whisper expects
+            pcm = await self._convert_to_pcm_wav(audio_path)
+
+            # 2) invoke Azure OpenAI Whisper, in parallel segments for long recordings,
+            #    unless the same audio was already transcribed from a different file
+            pcm_key = await asyncio.to_thread(audio_key, pcm, deployment)
+            transcript = await self.cache.get(pcm_key)
+            if transcript is None:
+                transcript = await self._transcribe_pcm(pcm)
+                await self.cache.set(pcm_key, transcript)
+            await self.cache.set(upload_key, transcript)
+            await self._checkpoint(transcript)
+            return transcript
+
+        except TranscodingError as conv_err:
+            log.error("Audio conversion failed", audio_path=audio_path, error=str(conv_err))
+            raise
 
-        except subprocess.CalledProcessError as conv_err:
-            print(f"Audio conversion failed: {conv_err}")
+        except asyncio.TimeoutError:
+            log.error("Whisper transcription timed out", timeout_seconds=WHISPER_TIMEOUT_SECONDS)
             raise
 
         except Exception as e:
-            print(f"Whisper transcription error: {e}")
+            log.error("Whisper transcription failed", error=str(e))
             raise
             
 
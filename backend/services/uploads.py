@@ -0,0 +1,69 @@
+import asyncio
+import os
+import re
+import uuid
+
+from services.metrics import STAGE_ERRORS, STAGE_SECONDS, timed
+from services.structured_logging import get_logger
+
+log = get_logger(__name__)
+
+UPLOAD_DIR = os.getenv("UPLOAD_TEMP_DIR", "temp")
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_AUDIO_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+
+_SAFE_EXTENSION = re.compile(r"^\.[A-Za-z0-9]{1,8}$")
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size cap"""
+
+
+def unique_upload_path(filename, directory=UPLOAD_DIR) -> str:
+    """Build a per-request path that keeps the original extension so ffmpeg can probe it"""
+    _, ext = os.path.splitext(filename or "")
+    if not _SAFE_EXTENSION.match(ext):
+        ext = ".bin"
+    return os.path.join(directory, f"{uuid.uuid4().hex}{ext.lower()}")
+
+
+@timed(STAGE_SECONDS, STAGE_ERRORS, label="upload")
+async def spool_upload(upload, directory=UPLOAD_DIR, max_bytes=MAX_UPLOAD_BYTES,
+                       chunk_size=UPLOAD_CHUNK_SIZE) -> str:
+    """
+    Copy an UploadFile to a unique file on disk in fixed-size chunks.
+
+    Disk writes run in a worker thread so the event loop never blocks, and at
+    most one chunk is held in memory regardless of the recording length. The
+    partial file is removed if the copy fails or the size cap is exceeded.
+    """
+    await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+    path = unique_upload_path(upload.filename, directory)
+    written = 0
+    f = await asyncio.to_thread(open, path, "wb")
+    try:
+        while chunk := await upload.read(chunk_size):
+            written += len(chunk)
+            if written > max_bytes:
+                raise UploadTooLargeError(
+                    f"Upload exceeds the {max_bytes // (1024 * 1024)} MiB limit"
+                )
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await remove_file(path)
+        raise
+    await asyncio.to_thread(f.close)
+    return path
+
+
+async def remove_file(path):
+    """Delete a temporary file, ignoring files that are already gone"""
+    if not path:
+        return
+    try:
+        await asyncio.to_thread(os.remove, path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log.warning("Could not remove temporary file", path=path, error=str(e))
@@ -15,19 +15,37 @@ from openai import AzureOpenAI
 from semantic_kernel.agents.strategies import TerminationStrategy, SequentialSelectionStrategy
 import tempfile
 import time
+from typing import Callable, Optional
+from services.rate_limiter import RateLimiter, estimate_tokens
+from services.structured_logging import debug_sampled, get_logger
+
+log = get_logger(__name__)
 
 load_dotenv()
 
+# Completion tokens budgeted for each agent turn on top of its prompt
+AGENT_TURN_OUTPUT_TOKENS = int(os.getenv("AGENT_TURN_OUTPUT_TOKENS", "1000"))
+
 ## a selection strategy for multi agent conversations
 class MedicalSelectionStrategy(SequentialSelectionStrategy):
     """A strategy for determining which agent should take the next turn in the chat."""
     
     async def select_agent(self, agents, history):
         """Determine which agent should respond next based on the conversation flow."""
+        # Every turn is one model run over the thread so far; wait for the shared quota
+        prompt_tokens = sum(estimate_tokens(str(message.content)) for message in history or [])
+        await RateLimiter.get("agents").acquire(prompt_tokens + AGENT_TURN_OUTPUT_TOKENS)
+
         if not history or history[-1].name not in [agent.name for agent in agents]:
-            return next((agent for agent in agents if agent.name == "TranscriptionAgent"), None)
+            # Start with transcription unless this chat already has a transcript (a
+            # follow-up request) or earlier stages were completed outside the chat
+            transcribed = any(message.name == "TranscriptionAgent" for message in history or [])
+            documentation = next((agent for agent in agents if agent.name == "DocumentationAgent"), agents[0])
+            if transcribed:
+                return documentation
+            return next((agent for agent in agents if agent.name == "TranscriptionAgent"), documentation)
 
-        print(f"History: {[msg.name for msg in history]}")
+        debug_sampled(log, "Selecting next agent", history=[msg.name for msg in history])
 
         last_agent = history[-1].name
         
@@ -39,13 +57,18 @@ class MedicalSelectionStrategy(SequentialSelectionStrategy):
             # After documentation, verification agent should check
             return next((agent for agent in agents if agent.name == "VerificationAgent"), None)
         
-        # Default to documentation agent
-        return next((agent for agent in agents if agent.name == "DocumentationAgent"), None)
+        # Default to documentation agent (a verification-only resume has just the one agent)
+        return next((agent for agent in agents if agent.name == "DocumentationAgent"), agents[0])
 
 # Define termination strategy with inheritance
 class MedicalTerminationStrategy(TerminationStrategy):
+    # Called with DocumentationAgent's note; True ends the chat without a verification turn
+    precheck: Optional[Callable[[str], bool]] = None
+
     async def should_agent_terminate(self, agent, history):
         """Determine if the conversation should end."""
+        if history and history[-1].name == "DocumentationAgent" and self.precheck:
+            return self.precheck(str(history[-1].content))
         if history and history[-1].name == "VerificationAgent":
             return "complete" in history[-1].content.lower()
         return False
\ No newline at end of file
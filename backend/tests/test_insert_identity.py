@@ -0,0 +1,86 @@
+"""
+Concurrent inserts must each get back the identity of their own row.
+
+Runs on the embedded SQLite backend, so no Azure resources are needed.
+"""
+import asyncio
+import datetime
+
+import pytest
+
+from services.database_service import DatabaseService
+
+CONCURRENT_INSERTS = 50
+
+
+@pytest.fixture
+def database_service(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(tmp_path / "identity.sqlite3"))
+    monkeypatch.setenv("DB_POOL_MAX_SIZE", "8")
+    service = DatabaseService()
+    service.initialize()
+    return service
+
+
+async def _create_provider(database_service):
+    async with database_service.get_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                database_service.backend.insert_returning(
+                    "Providers", "ProviderID", "FirstName, LastName, Specialty", "?, ?, ?"
+                ),
+                ("Test", "Provider", "Family Medicine"),
+            )
+            return (await cursor.fetchone())[0]
+
+
+async def _concurrent_inserts(database_service):
+    await database_service.open()
+    try:
+        provider_id = await _create_provider(database_service)
+        patient_ids = await asyncio.gather(*(
+            database_service.create_patient(f"Patient{n}", f"Family{n}", "1980-01-01")
+            for n in range(CONCURRENT_INSERTS)
+        ))
+        visit_date = datetime.datetime(2024, 1, 1, 9, 0)
+        visit_ids = await asyncio.gather(*(
+            database_service.create_visit(patient_id, provider_id, visit_date, "Follow-up", "In Progress",
+                                          f"Reason {n}")
+            for n, patient_id in enumerate(patient_ids)
+        ))
+        transcript_ids = await asyncio.gather(*(
+            database_service.save_transcript(visit_id, f"Transcript {n}") for n, visit_id in enumerate(visit_ids)
+        ))
+        note_ids = await asyncio.gather(*(
+            database_service.save_soap_note(visit_id, f"S {n}", f"O {n}", f"A {n}", f"P {n}")
+            for n, visit_id in enumerate(visit_ids)
+        ))
+
+        patients = [await database_service.get_patient(patient_id) for patient_id in patient_ids]
+        visits = [await database_service.get_visit(visit_id) for visit_id in visit_ids]
+        transcripts = [await database_service.get_transcript_for_visit(visit_id) for visit_id in visit_ids]
+        notes = [await database_service.get_soap_note_for_visit(visit_id) for visit_id in visit_ids]
+        return (patient_ids, visit_ids, transcript_ids, note_ids), (patients, visits, transcripts, notes)
+    finally:
+        await database_service.close()
+
+
+def test_concurrent_inserts_return_their_own_ids(database_service):
+    ids, rows = asyncio.run(_concurrent_inserts(database_service))
+    patient_ids, visit_ids, transcript_ids, note_ids = ids
+    patients, visits, transcripts, notes = rows
+
+    for returned in ids:
+        assert len(set(returned)) == CONCURRENT_INSERTS
+
+    for n in range(CONCURRENT_INSERTS):
+        assert patients[n]["PatientID"] == patient_ids[n]
+        assert patients[n]["FirstName"] == f"Patient{n}"
+        assert visits[n]["VisitID"] == visit_ids[n]
+        assert visits[n]["Reason"] == f"Reason {n}"
+        assert visits[n]["PatientID"] == patient_ids[n]
+        assert transcripts[n]["TranscriptID"] == transcript_ids[n]
+        assert transcripts[n]["TranscriptText"] == f"Transcript {n}"
+        assert notes[n]["NoteID"] == note_ids[n]
+        assert notes[n]["Subjective"] == f"S {n}"
@@ -0,0 +1,177 @@
+"""
+The local SOAP checks that decide when VerificationAgent's turn can be skipped.
+
+A note may only skip when it is complete, covers the transcript's medications,
+vitals and figures, and adds none of its own; everything else must escalate.
+"""
+import pytest
+
+from services.soap_verifier import SoapVerifier, extract_numbers, extract_vitals, split_sections
+
+TRANSCRIPT = (
+    "Doctor: How has the blood pressure been? Patient: Fine, I take lisinopril 10 mg every morning. "
+    "Doctor: Your blood pressure today is 128/82 and your pulse is 72. Any headaches in the last 3 weeks? "
+    "Patient: No."
+)
+
+NOTE = """**Subjective:**
+Patient reports no headaches in the last 3 weeks. Takes lisinopril 10 mg every morning.
+
+**Objective:**
+BP 128/82, pulse 72.
+
+**Assessment:**
+Hypertension, well controlled.
+
+**Plan:**
+1. Continue lisinopril 10 mg daily.
+2) Recheck blood pressure at the next routine visit.
+"""
+
+
+def check(note, transcript=TRANSCRIPT):
+    return SoapVerifier(threshold=0.9).check(note, transcript)
+
+
+def test_complete_note_skips_verification():
+    result = check(NOTE)
+    assert result.skip
+    assert result.confidence == 1.0
+    assert result.issues == []
+
+
+@pytest.mark.parametrize("headings", [
+    ("**Subjective:**", "**Objective:**", "**Assessment:**", "**Plan:**"),
+    ("**Subjective**:", "**Objective**:", "**Assessment**:", "**Plan**:"),
+    ("## Subjective", "## Objective", "## Assessment", "## Plan"),
+    ("Subjective:", "Objective:", "Assessment:", "Plan:"),
+    ("SUBJECTIVE", "OBJECTIVE", "ASSESSMENT", "PLAN"),
+])
+def test_heading_variants_are_recognized(headings):
+    note = NOTE
+    for default, heading in zip(("**Subjective:**", "**Objective:**", "**Assessment:**", "**Plan:**"), headings):
+        note = note.replace(default, heading)
+    assert list(split_sections(note)) == ["subjective", "objective", "assessment", "plan"]
+    assert check(note).skip
+
+
+def test_missing_section_escalates():
+    note = NOTE.split("**Plan:**")[0]
+    result = check(note)
+    assert not result.skip
+    assert result.checks["structure"] == 0.0
+    assert "Missing sections: plan" in result.issues
+
+
+def test_sections_out_of_order_escalate():
+    subjective, rest = NOTE.split("**Objective:**")
+    objective, rest = rest.split("**Assessment:**")
+    result = check("**Objective:**" + objective + subjective + "**Assessment:**" + rest)
+    assert not result.skip
+    assert "Sections are out of SOAP order" in result.issues
+
+
+@pytest.mark.parametrize("transcript_bp, note_bp", [("128/82", "128 / 82"), ("128 / 82", "128/82")])
+def test_blood_pressure_matches_with_or_without_spaces(transcript_bp, note_bp):
+    result = check(NOTE.replace("128/82", note_bp), TRANSCRIPT.replace("128/82", transcript_bp))
+    assert result.checks["vitals"] == 1.0
+    assert result.checks["unsupported_vitals"] == 1.0
+    assert result.skip
+
+
+def test_number_does_not_match_inside_a_longer_number():
+    result = check(NOTE.replace("pulse 72", "pulse 172"))
+    assert not result.skip
+    assert result.checks["vitals"] < 1.0
+
+
+def test_list_markers_are_not_figures():
+    assert extract_numbers("1. Continue lisinopril\n2) Recheck\n - 3. Labs") == set()
+    assert extract_numbers("Continue for 1. Then stop") == {"1"}
+
+
+def test_vitals_are_extracted_from_text():
+    assert extract_vitals("BP 120 / 80, temperature 98.6, heart rate of 64") == {"120/80", "98.6", "64"}
+
+
+def test_medication_missing_from_note_escalates():
+    result = check(NOTE.replace("lisinopril", "her usual medication"))
+    assert not result.skip
+    assert "Medications not in note: lisinopril" in result.issues
+
+
+def test_figure_missing_from_note_escalates():
+    result = check(NOTE.replace(" in the last 3 weeks", ""))
+    assert not result.skip
+    assert "Numbers not in note: 3" in result.issues
+
+
+def test_medication_not_in_transcript_escalates():
+    result = check(NOTE.replace("2) Recheck", "2) Start atorvastatin. Recheck"))
+    assert not result.skip
+    assert result.checks["unsupported_medications"] == 0.0
+    assert "Medications not in transcript: atorvastatin" in result.issues
+
+
+def test_vital_not_in_transcript_escalates():
+    result = check(NOTE.replace("pulse 72.", "pulse 72, temperature 101.2."))
+    assert not result.skip
+    assert "Vitals not in transcript: 101.2" in result.issues
+
+
+def test_number_not_in_transcript_escalates():
+    result = check(NOTE.replace("Recheck blood pressure", "Recheck blood pressure in 6 weeks"))
+    assert not result.skip
+    assert result.checks["unsupported_numbers"] == 0.0
+    assert "Numbers not in transcript: 6" in result.issues
+
+
+def test_hallucinated_findings_escalate():
+    transcript = "Doctor: Are you still taking lisinopril 10 mg every morning? Patient: Yes, no problems."
+    note = """**Subjective:**
+Patient takes lisinopril 10 mg daily.
+
+**Objective:**
+BP 190/120, appears unwell.
+
+**Assessment:**
+Acute stroke suspected.
+
+**Plan:**
+Start warfarin 5 mg and admit to ICU.
+"""
+    result = check(note, transcript)
+    assert not result.skip
+    assert result.confidence == 0.0
+
+
+def test_transcript_without_figures_escalates():
+    transcript = "Doctor: How are you feeling today? Patient: Fine, thanks, nothing new to report."
+    note = """**Subjective:**
+Patient feels well, nothing new to report.
+
+**Objective:**
+No findings discussed during the visit.
+
+**Assessment:**
+Well visit, no concerns.
+
+**Plan:**
+Routine follow-up as scheduled.
+"""
+    result = check(note, transcript)
+    assert not result.skip
+    assert result.checks["evidence"] == 0.0
+
+
+def test_missing_transcript_escalates():
+    result = check(NOTE, "")
+    assert not result.skip
+    assert "Transcript unavailable for coverage checks" in result.issues
+
+
+def test_stats_count_skips_and_escalations():
+    verifier = SoapVerifier(threshold=0.9)
+    verifier.check(NOTE, TRANSCRIPT)
+    verifier.check(NOTE, "")
+    assert verifier.stats() == {"threshold": 0.9, "checked": 2, "skipped": 1, "escalated": 1, "skip_rate": 0.5}
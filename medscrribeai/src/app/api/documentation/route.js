@@ -1,14 +1,24 @@
 const API_BASE_URL = 'http://localhost:8000/api';
 
-export async function fetchPatients() {
-  const timestamp = Date.now();
-  const response = await fetch(`${API_BASE_URL}/patients?t=${timestamp}`);
+function toQueryString(params = {}) {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== '') {
+      query.append(key, value);
+    }
+  });
+  const text = query.toString();
+  return text ? `?${text}` : '';
+}
+
+// Returns one page: { patients, next_cursor }. Pass next_cursor back as `cursor` for the next page.
+export async function fetchPatients(params = {}) {
+  const response = await fetch(`${API_BASE_URL}/patients${toQueryString(params)}`, { cache: 'no-store' });
   if (!response.ok) {
     console.log('couildnt get patients')
     throw new Error(`Failed to fetch patients: ${response.statusText}`);
   }
-  const data  =  await response.json();
-  return data.patients;
+  return await response.json();
 }
 
 export async function fetchActiveVisits(providerId) {
@@ -27,8 +37,9 @@ export async function fetchVisit(visitId) {
   return await response.json();
 }
 
-export async function fetchAllVisits() {
-  const response = await fetch(`${API_BASE_URL}/visits`);
+// Returns one page: { visits, next_cursor }. Supports date_from, date_to, status, provider_id and name filters.
+export async function fetchAllVisits(params = {}) {
+  const response = await fetch(`${API_BASE_URL}/visits${toQueryString(params)}`);
   if (!response.ok) {
     throw new Error(`Failed to fetch visits: ${response.statusText}`);
   }
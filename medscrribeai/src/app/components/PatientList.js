@@ -5,23 +5,30 @@ import { fetchPatients } from '../api/documentation/route';
 
 export default function PatientList() {
   const [patients, setPatients] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  
+  const loadPatients = async (cursor = null) => {
+    try {
+      const data = await fetchPatients({ cursor });
+      setPatients(previous => cursor ? [...previous, ...data.patients] : data.patients);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error loading patients:', error);
+    }
+  };
   
   useEffect(() => {
-    const loadPatients = async () => {
-      try {
-        const data = await fetchPatients();
-        setPatients(data);
-      } catch (error) {
-        console.error('Error loading patients:', error);
-      } finally {
-        setLoading(false);
-      }
-    };
-    
-    loadPatients();
+    loadPatients().finally(() => setLoading(false));
   }, []);
   
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await loadPatients(nextCursor);
+    setLoadingMore(false);
+  };
+  
   if (loading) {
     return <div className="text-center p-4">Loading patients...</div>;
   }
@@ -66,6 +73,17 @@ export default function PatientList() {
           ))}
         </tbody>
       </table>
+      {nextCursor && (
+        <div className="p-4 text-center border-t border-gray-200">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="text-blue-500 hover:underline disabled:text-gray-400"
+          >
+            {loadingMore ? 'Loading...' : 'Load more patients'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
@@ -1,9 +1,37 @@
 'use client'
 import { useState, useRef } from "react";
+import { streamDocumentation } from "../lib/api";
+import { startLiveTranscription } from "../lib/liveTranscription";
+
+const AGENT_LABELS = {
+  TranscriptionAgent: "Transcript ready",
+  DocumentationAgent: "SOAP note drafted",
+  VerificationAgent: "Verification finished",
+};
+
+// Fold a streamed delta or complete message into the responses list
+function applyAgentEvent(previous, event) {
+  const last = previous[previous.length - 1];
+  const open = last && last.agent === event.agent && last.streaming;
+  if (event.type === "delta") {
+    if (open) {
+      return [...previous.slice(0, -1), { ...last, content: last.content + event.content }];
+    }
+    return [...previous, { agent: event.agent, content: event.content, streaming: true }];
+  }
+  // A complete message replaces the streamed draft for that agent
+  const entry = { agent: event.agent, content: event.content };
+  return open ? [...previous.slice(0, -1), entry] : [...previous, entry];
+}
 
 export function RecordingSection({ visitId, threadId, step, setStep, setAudioBlob, setResponses, setError, processDocumentation }) {
   const [recording, setRecording] = useState(false);
+  const [progress, setProgress] = useState([]);
+  const [liveSegments, setLiveSegments] = useState({});
+  const [livePartial, setLivePartial] = useState(null);
   const mediaRecorderRef = useRef(null);
+  const liveSessionRef = useRef(null);
+  const liveFailedRef = useRef(false);
   const streamRef = useRef(null);
   const audioChunksRef = useRef([]);
   
@@ -30,6 +58,28 @@ export function RecordingSection({ visitId, threadId, step, setStep, setAudioBlo
 
       mediaRecorderRef.current = mediaRecorder;
 
+      // Transcribe while recording; the upload is only a fallback if this fails
+      setLiveSegments({});
+      setLivePartial(null);
+      liveSessionRef.current = null;
+      liveFailedRef.current = false;
+      try {
+        liveSessionRef.current = await startLiveTranscription(stream, {
+          // A failed segment leaves a gap in the live transcript, so upload the recording instead
+          onError: (message) => {
+            console.warn("Live segment transcription failed:", message.error);
+            if (message.segment !== undefined) liveFailedRef.current = true;
+          },
+          onPartial: (message) => setLivePartial(message),
+          onFinal: (message) => {
+            setLiveSegments((previous) => ({ ...previous, [message.segment]: message.text }));
+            setLivePartial((previous) => (previous && previous.segment === message.segment ? null : previous));
+          },
+        });
+      } catch (error) {
+        console.warn("Live transcription unavailable, will upload the recording instead:", error);
+      }
+
       // Set up data handler
       mediaRecorder.ondataavailable = (event) => {
         if (event.data.size > 0) {
@@ -47,11 +97,23 @@ export function RecordingSection({ visitId, threadId, step, setStep, setAudioBlo
         setAudioBlob(audioBlob);
         setStep("transcribing");
 
+        // Collect the live transcript before releasing the microphone
+        let liveTranscript = null;
+        if (liveSessionRef.current) {
+          try {
+            liveTranscript = await liveSessionRef.current.stop();
+            if (liveFailedRef.current) liveTranscript = null;
+          } catch (error) {
+            console.warn("Live transcription failed, uploading the recording instead:", error);
+          }
+          liveSessionRef.current = null;
+        }
+
         // Stop tracks
         stream.getTracks().forEach((track) => track.stop());
 
         // Process the recording
-        await processRecording(audioBlob);
+        await processRecording(audioBlob, liveTranscript);
       };
 
       // Start recording - request data every 1 second
@@ -77,17 +139,43 @@ export function RecordingSection({ visitId, threadId, step, setStep, setAudioBlo
     }
   };
 
-  const processRecording = async (blob) => {
+  const processRecording = async (blob, liveTranscript) => {
     try {
       const formData = new FormData();
       formData.append("thread_id", threadId);
       formData.append("visit_id", visitId);
-      formData.append("audio", blob, "recording.wav");
+      if (liveTranscript && liveTranscript.trim()) {
+        formData.append("transcript", liveTranscript);
+        // Already transcribed: skip the transcription agent's turn
+        formData.append("pipeline", "direct");
+      } else {
+        formData.append("audio", blob, "recording.wav");
+      }
 
-      const result = await processDocumentation(formData);
-      console.log("Process result:", result);
+      // Stream agent output so each section appears as soon as its agent finishes
+      setProgress([]);
+      setResponses([]);
+      await streamDocumentation(formData, (event) => {
+        if (event.type === "delta" || event.type === "message") {
+          setResponses((previous) => applyAgentEvent(previous, event));
+        }
+        if (event.type === "message") {
+          setProgress((previous) => [
+            ...previous,
+            { agent: event.agent, elapsed_seconds: event.elapsed_ms / 1000 },
+          ]);
+        }
+        if (event.type === "retry") {
+          // The retry resumes after the last finished stage; drop only the interrupted draft
+          const completed = event.completed || [];
+          setResponses((previous) => previous.filter((entry) => !entry.streaming && completed.includes(entry.agent)));
+          setProgress((previous) => previous.filter((item) => completed.includes(item.agent)));
+        }
+        if (event.type === "error") {
+          throw new Error(event.error);
+        }
+      });
 
-      setResponses(result.responses);
       setStep("complete");
     } catch (error) {
       console.error("Failed to process recording:", error);
@@ -123,6 +211,16 @@ export function RecordingSection({ visitId, threadId, step, setStep, setAudioBlo
         <p className="my-4">
           Recording the doctor-patient conversation. Press stop when finished.
         </p>
+        {(Object.keys(liveSegments).length > 0 || livePartial) && (
+          <div className="bg-gray-50 border rounded p-3 mb-4 text-sm max-h-48 overflow-y-auto">
+            {Object.keys(liveSegments)
+              .sort((a, b) => a - b)
+              .map((segment) => liveSegments[segment])
+              .filter(Boolean)
+              .join(" ")}
+            {livePartial && <span className="text-gray-400"> {livePartial.text}</span>}
+          </div>
+        )}
         <div className="flex justify-center">
           <button
             className="bg-red-500 hover:bg-red-700 text-white font-bold py-2 px-4 rounded"
@@ -145,6 +243,15 @@ export function RecordingSection({ visitId, threadId, step, setStep, setAudioBlo
             Our AI Agents are transcribing your recording and creating
             documentation. This may take a minute.
           </p>
+          {progress.length > 0 && (
+            <ul className="text-sm text-gray-600 mt-4">
+              {progress.map((item, index) => (
+                <li key={index}>
+                  {AGENT_LABELS[item.agent] || item.agent} ({item.elapsed_seconds.toFixed(1)}s)
+                </li>
+              ))}
+            </ul>
+          )}
         </div>
       </div>
     );
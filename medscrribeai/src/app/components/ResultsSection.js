@@ -91,7 +91,9 @@ export function ResultsSection({
     );
   };
 
-  if (step !== 'complete') return null;
+  // While agents are still streaming, show partial results without the actions
+  if (step !== 'complete' && step !== 'transcribing') return null;
+  const isStreaming = step === 'transcribing';
 
   return (
     <div className="space-y-8">
@@ -123,6 +125,7 @@ export function ResultsSection({
       {findAgentResponse("DocumentationAgent") && (
         <SoapNoteSection 
           content={findAgentResponse("DocumentationAgent").content}
+          note={findAgentResponse("DocumentationAgent").soap_note}
           isEditing={isEditing}
           setIsEditing={setIsEditing}
           editableSoapNote={editableSoapNote}
@@ -145,6 +148,7 @@ export function ResultsSection({
       )}
 
       {/* Actions */}
+      {!isStreaming && (
       <div className="flex justify-between mt-6">
         <button
           onClick={() => setStep("ready")}
@@ -165,6 +169,7 @@ export function ResultsSection({
           </button>
         )}
       </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
@@ -1,6 +1,7 @@
 'use client'
 export function SoapNoteSection({ 
     content, 
+    note,
     isEditing, 
     setIsEditing, 
     editableSoapNote, 
@@ -13,7 +14,10 @@ export function SoapNoteSection({
       // If not editing, extract SOAP sections using regex
       let subjective = "", objective = "", assessment = "", plan = "";
       
-      if (!isEditing) {
+      if (!isEditing && note) {
+        // Structured notes arrive already split into sections
+        ({ subjective, objective, assessment, plan } = note);
+      } else if (!isEditing) {
         // Extract SOAP sections using regex
         const subjectiveMatch = content.match(/\*\*Subjective:\*\*(.*?)(?=\*\*|$)/s);
         const objectiveMatch = content.match(/\*\*Objective:\*\*(.*?)(?=\*\*|$)/s);
@@ -176,7 +176,9 @@ export default function DocumentationPage() {
       let plan = "No plan available";
       
       // Extract SOAP data if documentation response exists
-      if (documentationResponse && documentationResponse.content) {
+      if (documentationResponse && documentationResponse.soap_note) {
+        ({ subjective, objective, assessment, plan } = documentationResponse.soap_note);
+      } else if (documentationResponse && documentationResponse.content) {
         const content = documentationResponse.content;
         
         const subjectiveMatch = content.match(/\*\*Subjective:\*\*(.*?)(?=\*\*Objective:|$)/s);
@@ -28,8 +28,8 @@ export default function DocumentationHomePage() {
         const recentData = await recentRes.json();
         const pendingData = await pendingRes.json();
         
-        setRecentVisits(recentData);
-        setPendingDocumentation(pendingData);
+        setRecentVisits(recentData.visits);
+        setPendingDocumentation(pendingData.visits);
       } catch (error) {
         console.error("Error fetching visits:", error);
       } finally {
@@ -26,4 +26,75 @@ export async function processDocumentation(formData) {
   }
   
   return await response.json();
-}
\ No newline at end of file
+}
+
+// Queue documentation processing in the background; resolves to { job_id, status }
+export async function startDocumentationJob(formData) {
+  formData.append('background', 'true');
+  const response = await fetch(`${API_BASE_URL}/documentation/process`, {
+    method: 'POST',
+    body: formData,
+  });
+  
+  if (!response.ok) {
+    throw new Error(`Failed to queue documentation: ${response.statusText}`);
+  }
+  
+  return await response.json();
+}
+
+export async function fetchDocumentationJob(jobId) {
+  const response = await fetch(`${API_BASE_URL}/documentation/jobs/${jobId}`, { cache: 'no-store' });
+  
+  if (!response.ok) {
+    throw new Error(`Failed to fetch job status: ${response.statusText}`);
+  }
+  
+  return await response.json();
+}
+
+// Poll a background job until it finishes, reporting progress along the way
+export async function waitForDocumentationJob(jobId, onProgress, intervalMs = 2000) {
+  while (true) {
+    const job = await fetchDocumentationJob(jobId);
+    if (onProgress) onProgress(job);
+    if (job.status === 'succeeded') return job;
+    if (job.status === 'failed') throw new Error(job.error || 'Documentation job failed');
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
+
+// Stream documentation processing over Server-Sent Events, calling onEvent for
+// each stage, delta, message, retry, error and done event as it arrives
+export async function streamDocumentation(formData, onEvent) {
+  const response = await fetch(`${API_BASE_URL}/documentation/process/stream`, {
+    method: 'POST',
+    body: formData,
+  });
+  
+  if (!response.ok || !response.body) {
+    throw new Error(`Failed to stream documentation: ${response.statusText}`);
+  }
+  
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    
+    // Frames are separated by a blank line; keep any partial frame for the next read
+    const frames = buffer.split('\n\n');
+    buffer = frames.pop();
+    for (const frame of frames) {
+      const data = frame
+        .split('\n')
+        .filter((line) => line.startsWith('data: '))
+        .map((line) => line.slice(6))
+        .join('\n');
+      if (data) onEvent(JSON.parse(data));
+    }
+  }
+}
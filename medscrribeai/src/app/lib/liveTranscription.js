@@ -0,0 +1,89 @@
+const LIVE_URL = 'ws://localhost:8000/api/documentation/live';
+const TARGET_SAMPLE_RATE = 16000;
+
+// Average blocks of input samples down to 16 kHz and convert to 16-bit PCM
+function downsampleToInt16(input, inputRate) {
+  const ratio = inputRate / TARGET_SAMPLE_RATE;
+  const length = Math.floor(input.length / ratio);
+  const output = new Int16Array(length);
+  for (let i = 0; i < length; i++) {
+    const start = Math.floor(i * ratio);
+    const end = Math.min(Math.floor((i + 1) * ratio), input.length);
+    let sum = 0;
+    for (let j = start; j < end; j++) sum += input[j];
+    const sample = Math.max(-1, Math.min(1, sum / Math.max(1, end - start)));
+    output[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+  }
+  return output;
+}
+
+// Stream microphone audio to the live transcription socket while recording.
+// Resolves once the socket is open; stop() resolves to the full transcript, or
+// rejects if any segment could not be transcribed (the transcript has gaps).
+export function startLiveTranscription(stream, { onPartial, onFinal, onError } = {}) {
+  return new Promise((resolve, reject) => {
+    const socket = new WebSocket(LIVE_URL);
+    socket.binaryType = 'arraybuffer';
+    let audioContext = null;
+    let processor = null;
+    let source = null;
+    let resolveTranscript = null;
+    let rejectTranscript = null;
+
+    const stopAudio = () => {
+      if (processor) processor.disconnect();
+      if (source) source.disconnect();
+      if (audioContext) audioContext.close();
+      processor = source = audioContext = null;
+    };
+
+    socket.onopen = () => {
+      audioContext = new AudioContext();
+      source = audioContext.createMediaStreamSource(stream);
+      processor = audioContext.createScriptProcessor(4096, 1, 1);
+      processor.onaudioprocess = (event) => {
+        if (socket.readyState !== WebSocket.OPEN) return;
+        const pcm = downsampleToInt16(event.inputBuffer.getChannelData(0), audioContext.sampleRate);
+        socket.send(pcm.buffer);
+      };
+      source.connect(processor);
+      processor.connect(audioContext.destination);
+
+      resolve({
+        stop: () => new Promise((resolveStop, rejectStop) => {
+          resolveTranscript = resolveStop;
+          rejectTranscript = rejectStop;
+          stopAudio();
+          socket.send(JSON.stringify({ type: 'stop' }));
+        }),
+        cancel: () => {
+          stopAudio();
+          socket.close();
+        },
+      });
+    };
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'partial' && onPartial) onPartial(message);
+      if (message.type === 'final' && onFinal) onFinal(message);
+      if (message.type === 'error' && onError) onError(message);
+      if (message.type === 'complete' && message.incomplete && rejectTranscript) {
+        rejectTranscript(new Error(`Live transcription missed segments ${message.failed_segments.join(', ')}`));
+      } else if (message.type === 'complete' && resolveTranscript) {
+        resolveTranscript(message.transcript);
+      }
+    };
+
+    socket.onerror = () => {
+      stopAudio();
+      reject(new Error('Live transcription connection failed'));
+      if (rejectTranscript) rejectTranscript(new Error('Live transcription connection failed'));
+    };
+
+    socket.onclose = () => {
+      stopAudio();
+      if (rejectTranscript) rejectTranscript(new Error('Live transcription closed before completing'));
+    };
+  });
+}
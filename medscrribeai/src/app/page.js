@@ -16,22 +16,16 @@ export default function Home() {
       try {
         setLoading(true);
         
-        // Fetch patients
-        const patientsResponse = await fetch('http://localhost:8000/api/patients');
-        const patientsData = await patientsResponse.json();
+        // Totals are counted server-side; the list endpoints only return one page
+        const statsResponse = await fetch('http://localhost:8000/api/stats');
+        if (!statsResponse.ok) throw new Error('Failed to fetch stats');
+        const statsData = await statsResponse.json();
         
-        // Fetch visits
-        const visitsResponse = await fetch('http://localhost:8000/api/visits');
-        const visitsData = await visitsResponse.json();
-        
-        // Calculate document count (assuming each completed visit has a document)
-        const completedVisits = visitsData.filter(visit => visit.Status === 'Completed').length;
-        
-        // Update stats with real numbers
+        // Update stats with real numbers (assuming each completed visit has a document)
         setStats({
-          patients: patientsData.patients ? patientsData.patients.length : 0,
-          visits: visitsData.length || 0,
-          documents: completedVisits || 0
+          patients: statsData.patients || 0,
+          visits: statsData.visits || 0,
+          documents: (statsData.visits_by_status && statsData.visits_by_status['Completed']) || 0
         });
       } catch (error) {
         console.error('Error fetching stats:', error);
@@ -2,15 +2,20 @@
 
 import { useState, useEffect } from 'react';
 import { useSearchParams, useRouter } from 'next/navigation';
+import { fetchPatients } from '../../api/documentation/route';
+
+const PATIENT_PAGE_SIZE = 50;
 
 export default function NewVisitPage() {
   const searchParams = useSearchParams();
   const router = useRouter();
   const patientId = searchParams.get('patientId');
   
-  const [allPatients, setAllPatients] = useState([]);
+  const [patients, setPatients] = useState([]);
+  const [patientSearch, setPatientSearch] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [patientName, setPatientName] = useState('');
-  const [loading, setLoading] = useState(true);
   
   const [formData, setFormData] = useState({
     patientId: patientId || '',
@@ -20,34 +25,40 @@ export default function NewVisitPage() {
     status: 'Scheduled'
   });
   
-  // Fetch all patients for dropdown if no patientId provided
+  // One page of patients matching the name search; more are loaded on request
+  const loadPatients = async (cursor = null) => {
+    try {
+      const data = await fetchPatients({ name: patientSearch.trim(), limit: PATIENT_PAGE_SIZE, cursor });
+      setPatients(previous => cursor ? [...previous, ...data.patients] : data.patients);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching patients:', error);
+    }
+  };
+
   useEffect(() => {
-    if (!patientId) {
-      const fetchPatients = async () => {
-        try {
-          const response = await fetch('http://localhost:8000/api/patients');
-          if (!response.ok) throw new Error('Failed to fetch patients');
-          const data = await response.json();
-          setAllPatients(data.patients || []);
-        } catch (error) {
-          console.error('Error fetching patients:', error);
-        } finally {
-          setLoading(false);
-        }
-      };
-      
-      fetchPatients();
-    } else {
-        fetch(`http://localhost:8000/api/patients/${patientId}`)
+    if (patientId) return;
+    // Wait for typing to pause before searching
+    const timer = setTimeout(() => loadPatients(), 300);
+    return () => clearTimeout(timer);
+  }, [patientId, patientSearch]);
+
+  useEffect(() => {
+    if (!patientId) return;
+    fetch(`http://localhost:8000/api/patients/${patientId}`)
       .then(res => res.json())
       .then(data => {
         setPatientName(`${data.FirstName} ${data.LastName}`);
       })
       .catch(err => console.error("Error fetching patient details:", err));
-      setLoading(false);
-    }
   }, [patientId]);
 
+  const loadMorePatients = async () => {
+    setLoadingMore(true);
+    await loadPatients(nextCursor);
+    setLoadingMore(false);
+  };
+
 
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [error, setError] = useState(null);
@@ -130,22 +141,44 @@ export default function NewVisitPage() {
               className="mt-1 block w-full rounded-md border-gray-300 bg-gray-100 shadow-sm p-2 border"
             />
           ) : (
-            /* Otherwise show dropdown */
-            <select
-              id="patientId"
-              name="patientId"
-              value={formData.patientId}
-              onChange={handleChange}
-              required
-              className="mt-1 block w-full rounded-md border-gray-300 shadow-sm p-2 border"
-            >
-              <option value="">Select a patient</option>
-              {allPatients.map(patient => (
-                <option key={patient.PatientID} value={patient.PatientID}>
-                  {patient.FirstName} {patient.LastName}
-                </option>
-              ))}
-            </select>
+            /* Otherwise search by name and pick from the matches */
+            <>
+              <input
+                type="search"
+                placeholder="Search by first or last name"
+                value={patientSearch}
+                onChange={(e) => {
+                  setPatientSearch(e.target.value);
+                  setFormData(prev => ({ ...prev, patientId: '' }));
+                }}
+                className="mt-1 block w-full rounded-md border-gray-300 shadow-sm p-2 border"
+              />
+              <select
+                id="patientId"
+                name="patientId"
+                value={formData.patientId}
+                onChange={handleChange}
+                required
+                className="mt-2 block w-full rounded-md border-gray-300 shadow-sm p-2 border"
+              >
+                <option value="">Select a patient</option>
+                {patients.map(patient => (
+                  <option key={patient.PatientID} value={patient.PatientID}>
+                    {patient.FirstName} {patient.LastName}
+                  </option>
+                ))}
+              </select>
+              {nextCursor && (
+                <button
+                  type="button"
+                  onClick={loadMorePatients}
+                  disabled={loadingMore}
+                  className="mt-1 text-sm text-blue-500 hover:underline disabled:text-gray-400"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more patients'}
+                </button>
+              )}
+            </>
           )}
         </div>
         
@@ -5,22 +5,31 @@ import { fetchAllVisits } from '../api/documentation/route';
 
 export default function Visits() {
   const [visits, setVisits] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [statusFilter, setStatusFilter] = useState('');
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  
+  const loadVisits = async (cursor = null) => {
+    try {
+      const data = await fetchAllVisits({ cursor, status: statusFilter });
+      setVisits(previous => cursor ? [...previous, ...data.visits] : data.visits);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error loading visits:', error);
+    }
+  };
   
   useEffect(() => {
-    const loadVisits = async () => {
-      try {
-        const data = await fetchAllVisits();
-        setVisits(data);
-      } catch (error) {
-        console.error('Error loading visits:', error);
-      } finally {
-        setLoading(false);
-      }
-    };
-    
-    loadVisits();
-  }, []);
+    setLoading(true);
+    loadVisits().finally(() => setLoading(false));
+  }, [statusFilter]);
+  
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await loadVisits(nextCursor);
+    setLoadingMore(false);
+  };
   
   if (loading) {
     return <div className="text-center p-4">Loading visits...</div>;
@@ -30,6 +39,16 @@ export default function Visits() {
     <div className="container mx-auto px-4 py-8">
       <div className="flex justify-between items-center mb-6">
         <h1 className="text-2xl font-bold">All Visits</h1>
+        <select
+          value={statusFilter}
+          onChange={(e) => setStatusFilter(e.target.value)}
+          className="border rounded px-3 py-2 ml-auto mr-4"
+        >
+          <option value="">All statuses</option>
+          <option value="Scheduled">Scheduled</option>
+          <option value="In Progress">In Progress</option>
+          <option value="Completed">Completed</option>
+        </select>
         <Link href="/visits/new" className="bg-blue-500 text-white px-4 py-2 rounded">
           New Visit
         </Link>
@@ -74,6 +93,18 @@ export default function Visits() {
           ))}
         </div>
       )}
+      
+      {nextCursor && (
+        <div className="mt-6 text-center">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="bg-gray-100 text-gray-700 px-4 py-2 rounded hover:bg-gray-200 disabled:text-gray-400"
+          >
+            {loadingMore ? 'Loading...' : 'Load more visits'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file